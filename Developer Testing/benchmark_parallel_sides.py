@@ -0,0 +1,52 @@
+"""
+Compares the wall-clock time of applying expensive operations to both sides
+of an Equation serially and with `parallel=True` (lhs in a worker process).
+Run from the repository root:
+
+    python "Developer Testing/benchmark_parallel_sides.py"
+
+A speedup close to 2 is expected for operations whose cost is similar on the
+two sides when a second core is free; on a single core there is none.
+"""
+import os
+import time
+from algebra_with_sympy import *
+from sympy.core.cache import clear_cache
+
+x, y = symbols('x y')
+
+def big_trig(n, shift):
+    return sum((sin(k*x + shift)**2 + cos(k*x + shift)**2)*(x + k)**2
+               for k in range(1, n))
+
+def big_rational(n, shift):
+    return sum(1/(x + k + shift) - 1/(x + k + shift + 1) for k in range(n))
+
+cases = [
+    ('simplify', Eqn(big_trig(12, 0), big_trig(12, 1)), simplify, ()),
+    ('integrate', Eqn(big_rational(25, 0), big_rational(25, y)), integrate,
+     (x,)),
+    ('series', Eqn(exp(sin(x))*cos(x)**3, exp(cos(x))*sin(x)**3), series,
+     (x, 0, 14)),
+]
+
+def timed(func):
+    clear_cache()
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+if __name__ == '__main__':
+    print('cpus:', os.cpu_count())
+    # start the worker so its start-up time is not measured
+    Eqn(x + 1, x + 2).apply(expand, parallel=True)
+    print('%-10s %10s %10s %8s' % ('operation', 'serial', 'parallel',
+                                   'speedup'))
+    for name, eq, func, args in cases:
+        serial, expected = timed(lambda: eq.apply(func, *args,
+                                                  parallel=False))
+        parallel, result = timed(lambda: eq.apply(func, *args,
+                                                  parallel=True))
+        assert result == expected
+        print('%-10s %9.2fs %9.2fs %8.2f' % (name, serial, parallel,
+                                              serial/parallel))
@@ -0,0 +1,36 @@
+"""
+Compares the wall-clock time of plain `integrate()` with `race_integrate()`
+for simple integrands, with and without the first attempt in the calling
+process (`quick=0` always starts the worker processes). Run from the
+repository root:
+
+    python "Developer Testing/benchmark_race_integrate.py"
+
+With the first attempt the overhead over `integrate()` should be close to
+none; without it every integral pays for starting the processes.
+"""
+import time
+from algebra_with_sympy import *
+from algebra_with_sympy.integration import _integral_cache
+from sympy.core.cache import clear_cache
+
+x = symbols('x')
+
+cases = [x**2, x*sin(x), exp(2*x)*cos(x), 1/(1 + x**2), log(x)**2]
+
+def timed(func):
+    clear_cache()
+    _integral_cache.clear()
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+if __name__ == '__main__':
+    print('%-18s %10s %10s %10s' % ('integrand', 'integrate', 'quick',
+                                    'race only'))
+    for f in cases:
+        plain, expected = timed(lambda: integrate(f, x))
+        quick, result = timed(lambda: race_integrate(f, x))
+        assert result == expected
+        race, result = timed(lambda: race_integrate(f, x, quick=0))
+        print('%-18s %9.3fs %9.3fs %9.3fs' % (f, plain, quick, race))
@@ -35,6 +35,17 @@ if proper_sympy:
             pass
 
     from algebra_with_sympy.preparser import *
+    from algebra_with_sympy.systems import *
+    from algebra_with_sympy.evaluation import *
+    from algebra_with_sympy.dimensions import *
+    from algebra_with_sympy.pipeline import *
+    from algebra_with_sympy.simplification import *
+    from algebra_with_sympy.arrays import *
+    from algebra_with_sympy.matrices import *
+    from algebra_with_sympy.cases import *
+    from algebra_with_sympy.integration import *
+    from algebra_with_sympy.continuation import *
+    from algebra_with_sympy.plotting import *
 
     # Set the output formatting defaults
     algwsym_config.output.show_code = False
@@ -43,6 +54,15 @@ if proper_sympy:
     algwsym_config.output.solve_to_list = False
     algwsym_config.output.latex_as_equations = False
 
+    # Set the numerics defaults
+    algwsym_config.numerics.intern_equations = False
+    algwsym_config.numerics.compile_cache_dir = None
+    algwsym_config.numerics.compile_cache_size = 100*2**20
+    algwsym_config.numerics.parallel_sides = False
+    algwsym_config.numerics.check_numeric = False
+    algwsym_config.numerics.check_confidence = 0.999
+    algwsym_config.numerics.check_seed = None
+
     # Set version number for internal access
     algwsym_version = 'unknown'
     try:
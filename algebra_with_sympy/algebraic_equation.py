@@ -388,6 +388,84 @@ class algwsym_config():
             """
             return self.integers_as_exact
 
+        @property
+        def intern_equations(self):
+            """
+            If `True` Equations are hash-consed: creating an Equation equal
+            to one that still exists returns the existing object, and every
+            subexpression of a new Equation that is equal to a subexpression
+            of an existing one is replaced by that shared copy. This reduces
+            memory use in long stepwise derivations and lets equality tests
+            between steps short-circuit on identity. Shared subexpressions
+            are released when the last Equation using them is garbage
+            collected. Default = `False`.
+            """
+            return self.intern_equations
+
+        @property
+        def compile_cache_dir(self):
+            """
+            Directory in which `lambdify()` stores the numerical functions it
+            compiles from equations, so that later sessions can load them
+            instead of generating them again. Default is `None`, which turns
+            the disk cache off.
+            """
+            return self.compile_cache_dir
+
+        @property
+        def compile_cache_size(self):
+            """
+            Maximum total size in bytes of the files in
+            `compile_cache_dir`. The least recently used entries are removed
+            when this is exceeded. Default is 100 MiB.
+            """
+            return self.compile_cache_size
+
+        @property
+        def parallel_sides(self):
+            """
+            If `True` operations applied to both sides of an Equation (by
+            `.apply()` or `.do.`) transform the lhs in a separate process
+            while the rhs is transformed in this one. This only pays off for
+            expensive operations (e.g. `simplify`, `integrate`, `series`) on
+            large sides and a free processor core. It can also be requested
+            for a single operation by passing `parallel=True` (or turned off
+            with `parallel=False`). Default = `False`.
+            """
+            return self.parallel_sides
+
+        @property
+        def check_numeric(self):
+            """
+            If `True` `Equation.check()` first compares the two sides
+            numerically at random (complex, unless the symbol assumptions say
+            otherwise) points and returns `False` as soon as they clearly
+            differ, doing the symbolic check only when all points agree. It
+            can also be requested for a single check with `numeric=True`.
+            Default = `False`.
+            """
+            return self.check_numeric
+
+        @property
+        def check_confidence(self):
+            """
+            Confidence used by the numeric check of `Equation.check()` to
+            choose the number of random points: enough points that an
+            equation that is not an identity would be caught with this
+            probability even if each point had only an even chance of
+            exposing it. Default = `0.999` (10 points).
+            """
+            return self.check_confidence
+
+        @property
+        def check_seed(self):
+            """
+            Seed for the random points of the numeric check of
+            `Equation.check()`. `None` (the default) draws new points every
+            time; set an integer for reproducible checks.
+            """
+            return self.check_seed
+
 def __get_sympy_expr_name__(expr):
     """
     Tries to find the python string name that refers to a sympy object. In
@@ -571,6 +649,9 @@ if ip and "text/latex" not in formatter.active_types:
                                                 __command_line_printing__)
     # print("For type Equation overriding plain text formatter = " + str(old))
 
+# Symbols declared as units by `units()`.
+_declared_units = set()
+
 def units(names):
     """
     This operation declares the symbols to be positive values, so that sympy
@@ -578,6 +659,9 @@ def units(names):
     Units defined this way are just unit symbols. If you want units that are
     aware of conversions see sympy.physics.units.
 
+    Symbols declared this way whose names match the name or abbreviation of
+    a `sympy.physics.units` quantity (e.g. `m`, `kg`, `atm`) are recognized
+    by the dimensional analysis and unit conversion tools (`UnitTable`).
 
     :param string names: a string containing a space separated list of
     symbols to be treated as units.
@@ -608,6 +692,7 @@ def units(names):
     retstr +='('
     for k in syms:
         user_namespace[k] = symbols(k, positive = True)
+        _declared_units.add(user_namespace[k])
         retstr += k + ','
     retstr = retstr[:-1] + ')'
     return retstr
@@ -654,6 +739,19 @@ def solve(f, *symbols, **flags):
     [[Equation(x, -3), Equation(y, 3)], [Equation(x, -1), Equation(y, -1)], [Equation(x, 1), Equation(y, 1)], [Equation(x, 3), Equation(y, -3)]]
     >>> algwsym_config.output.solve_to_list = False # reset to default
 
+    Passing `check_dimensions=True` (or a dict mapping symbols to their
+    units, see `dimension_mismatches()`) first checks that the equations are
+    dimensionally consistent and raises a `ValueError` describing the
+    problem if they are not, before any solving is attempted.
+
+    Passing `split_cases=True` splits equations containing `Abs` (of real
+    arguments) and `Piecewise` into sub-systems, one per combination of
+    signs or pieces (see `split_cases()`), pruning impossible combinations
+    before solving. The sub-systems are solved separately, in parallel in
+    a pool of `workers` processes if `workers=n` is also given, and only
+    solutions satisfying their branch's conditions are kept. If that cannot
+    be decided for some solution the system is solved without splitting.
+
     `algwsym_config.output.human_text = True` with
     `algwsym_config.output.how_code=True` shows both.
     In Jupyter-like environments `show_code=True` yields the Raw output and
@@ -667,6 +765,19 @@ def solve(f, *symbols, **flags):
     """
     from sympy.solvers.solvers import solve
     from sympy.sets.sets import FiniteSet
+    check_dimensions = flags.pop('check_dimensions', False)
+    split_cases = flags.pop('split_cases', False)
+    workers = flags.pop('workers', None)
+    if check_dimensions is not False:
+        from algebra_with_sympy.dimensions import dimension_mismatches
+        symbol_units = None
+        if isinstance(check_dimensions, dict):
+            symbol_units = check_dimensions
+        mismatches = dimension_mismatches(f, symbol_units)
+        if mismatches:
+            raise ValueError('Dimensions do not match in ' +
+                             ', '.join(str(k[0]) + ' ' + str(k[1]) for k in
+                                       mismatches) + '.')
     newf =[]
     solns = []
     displaysolns = []
@@ -685,7 +796,16 @@ def solve(f, *symbols, **flags):
         else:
             newf.append(f)
     flags['dict'] = True
-    result = solve(newf, *symbols, **flags)
+    result = None
+    if split_cases:
+        from algebra_with_sympy.cases import _solve_split
+        solve_for = symbols
+        if len(solve_for) == 1 and hasattr(solve_for[0], "__iter__"):
+            solve_for = tuple(solve_for[0])
+        result = _solve_split([sympify(k) for k in newf], solve_for, flags,
+                              workers=workers)
+    if result is None:
+        result = solve(newf, *symbols, **flags)
     if len(symbols) == 1 and hasattr(symbols[0], "__iter__"):
         symbols = symbols[0]
     if contains_eqn:
@@ -727,6 +847,182 @@ def solve(f, *symbols, **flags):
                     return k
         return FiniteSet(*solns)
 
+_ode_classification_cache = {}
+_ODE_CACHE_SIZE = 256
+
+def __ode_internals_available__():
+    """`True` if this version of sympy has the private functions used to
+    solve an ODE with a cached classification. `sympy-for-algebra` does
+    not pin them, so without them `dsolve()` is sympy's plain `dsolve()`.
+    """
+    try:
+        from sympy.solvers.deutils import _desolve, _preprocess
+        from sympy.solvers.ode.ode import _helper_simplify
+    except ImportError:
+        return False
+    return True
+
+def __classify_ode_cached__(eq, func, ics, xi, eta, n, x0, complete=False):
+    """Returns the preprocessed ODE, its function and the dictionary of
+    matching hints from `classify_ode()`, computing them once per ODE. Only
+    the default hint is looked for unless `complete` is `True`, in which
+    case all matching hints (and `'ordered_hints'`) are included.
+    """
+    from sympy.solvers.deutils import _preprocess
+    key = (eq, func, None if ics is None else tuple(ics.items()), xi, eta,
+           n, x0)
+    found = _ode_classification_cache.get(key, None)
+    if found is not None and (found[3] or not complete):
+        return found[:3]
+    eq, func = _preprocess(eq, func)
+    hints = classify_ode(eq, func, dict=True, ics=ics, xi=xi, eta=eta, n=n,
+                         x0=x0, hint='all' if complete else 'default',
+                         prep=False)
+    if found is None and \
+            len(_ode_classification_cache) >= _ODE_CACHE_SIZE:
+        del _ode_classification_cache[next(iter(_ode_classification_cache))]
+    _ode_classification_cache[key] = (eq, func, hints, complete)
+    return eq, func, hints
+
+def __dsolve_hint__(eq, func, hint, hints, ics, simplify, xi, eta, n, x0):
+    """Solves the preprocessed ODE `eq` with one matching `hint` without
+    classifying it again.
+    """
+    from sympy.solvers.deutils import _desolve
+    from sympy.solvers.ode.ode import _helper_simplify
+    match = _desolve(eq, func, hint=hint, ics=ics, simplify=simplify,
+                     prep=False, x0=x0, classify=False, order=hints['order'],
+                     match=hints[hint], xi=xi, eta=eta, n=n, type='ode')
+    return _helper_simplify(eq, hint, match, simplify, ics=ics)
+
+def __dsolve_worker__(queue, *args):
+    """Process target reporting `(hint, solution)`, with `None` as solution
+    if the hint failed.
+    """
+    try:
+        result = __dsolve_hint__(*args)
+    except Exception:
+        result = None
+    queue.put((args[2], result))
+
+def __dsolve_race__(eq, func, candidates, hints, ics, simplify, xi, eta, n,
+                    x0):
+    """Tries the `candidates` hints in parallel processes. Returns the first
+    solution free of unevaluated integrals, otherwise the solution from the
+    earliest candidate that succeeded, or `None`.
+    """
+    import multiprocessing
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=__dsolve_worker__,
+                                     args=(results, eq, func, k, hints, ics,
+                                           simplify, xi, eta, n, x0),
+                                     daemon=True) for k in candidates]
+    for proc in procs:
+        proc.start()
+    partial = {}
+    try:
+        for k in range(len(procs)):
+            hint, result = results.get()
+            if result is None:
+                continue
+            if not result.has(Integral):
+                return result
+            partial[hint] = result
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+        results.close()
+    for k in candidates:
+        if k in partial:
+            return partial[k]
+    return None
+
+def __wrap_ode_solutions__(result):
+    if isinstance(result, sympy.core.relational.Equality):
+        return Equation(result.lhs, result.rhs)
+    if isinstance(result, dict):
+        return {k: __wrap_ode_solutions__(v) for k, v in result.items()}
+    if isinstance(result, (list, tuple)):
+        solns = [__wrap_ode_solutions__(k) for k in result]
+        if algwsym_config.output.solve_to_list:
+            return solns
+        return FiniteSet(*solns)
+    return result
+
+def dsolve(eq, func=None, hint='default', simplify=True, ics=None, xi=None,
+           eta=None, x0=0, n=6, workers=None, **kwargs):
+    """
+    Override of sympy `dsolve()` that accepts an `Equation` (or an iterable
+    of them for a system) and returns solutions as `Equation` objects.
+
+    A single solution is returned as an `Equation`, several solutions as a
+    `FiniteSet` of them (a list if `algwsym_config.output.solve_to_list`
+    is `True`). With `hint='all'` the dictionary sympy returns has its
+    solutions converted the same way.
+
+    The classification of each single ODE by `classify_ode()` is cached
+    (per ODE and initial conditions, on which the power series hints
+    depend), so solving the same ODE again, e.g. with another `hint`, does
+    not repeat it. Passing `workers=n` tries the first
+    `n` matching hints in parallel processes and keeps the first solution
+    that contains no unevaluated integrals (falling back to the highest
+    ranked hint that succeeded). This only applies to `hint='default'`.
+
+    Examples
+    --------
+    >>> t = symbols('t')
+    >>> f = Function('f')
+    >>> dsolve(Eqn(f(t).diff(t), t - f(t)))
+    Equation(f(t), C1*exp(-t) + t - 1)
+    >>> dsolve(Eqn(f(t).diff(t), t - f(t)), ics={f(0): 1})
+    Equation(f(t), t - 1 + 2*exp(-t))
+    >>> algwsym_config.output.solve_to_list = False
+    >>> dsolve(Eqn(f(t).diff(t)**2, f(t)**2))
+    FiniteSet(Equation(f(t), C1*exp(t)), Equation(f(t), C1*exp(-t)))
+    """
+    from sympy.solvers.ode import dsolve as _dsolve, allhints
+    if hasattr(eq, '__iter__'):
+        eqs = [k.lhs - k.rhs if isinstance(k, Equation) else k for k in eq]
+        return __wrap_ode_solutions__(_dsolve(eqs, func, hint=hint,
+                                              simplify=simplify, ics=ics,
+                                              xi=xi, eta=eta, x0=x0, n=n,
+                                              **kwargs))
+    if isinstance(eq, (Equation, sympy.core.relational.Equality)):
+        eq = eq.lhs - eq.rhs
+    eq = sympify(eq)
+    if not __ode_internals_available__() or hint != 'default' and not (
+            hint in allhints and hint not in ('all', 'all_Integral',
+                                              'best')):
+        return __wrap_ode_solutions__(_dsolve(eq, func, hint=hint,
+                                              simplify=simplify, ics=ics,
+                                              xi=xi, eta=eta, x0=x0, n=n,
+                                              **kwargs))
+    parallel = hint == 'default' and workers is not None and workers > 1
+    eq, func, hints = __classify_ode_cached__(eq, func, ics, xi, eta, n, x0,
+                                              hint != 'default' or parallel)
+    if not hints['default'] or kwargs:
+        # let sympy raise its usual errors or handle other options
+        return __wrap_ode_solutions__(_dsolve(eq, func, hint=hint,
+                                              simplify=simplify, ics=ics,
+                                              xi=xi, eta=eta, x0=x0, n=n,
+                                              **kwargs))
+    if hint == 'default':
+        hint = hints['default']
+    elif hint not in hints:
+        raise ValueError('ODE ' + str(eq) + ' does not match hint ' + hint)
+    if parallel:
+        candidates = [k for k in hints['ordered_hints']
+                      if not k.endswith('_Integral')][:workers]
+        if len(candidates) > 1:
+            result = __dsolve_race__(eq, func, candidates, hints, ics,
+                                     simplify, xi, eta, n, x0)
+            if result is not None:
+                return __wrap_ode_solutions__(result)
+    return __wrap_ode_solutions__(__dsolve_hint__(eq, func, hint, hints, ics,
+                                                  simplify, xi, eta, n, x0))
+
 def solveset(f, symbols, domain=sympy.Complexes):
     """
     Very experimental override of sympy solveset, which we hope will replace
@@ -818,6 +1114,260 @@ def __Equation__str__override__(self):
 
 sympy.core.Equation.__str__ = __Equation__str__override__
 
+__sympy_Equation_check__ = sympy.core.Equation.check
+
+def __random_point_value__(sym, rng, prec):
+    """Returns a random value for `sym` consistent with its assumptions."""
+    if sym.is_integer:
+        lo, hi = -10**6, 10**6
+        if sym.is_positive:
+            lo = 1
+        elif sym.is_nonnegative:
+            lo = 0
+        elif sym.is_negative:
+            hi = -1
+        elif sym.is_nonpositive:
+            hi = 0
+        return Integer(rng.randint(lo, hi))
+    if sym.is_extended_real:
+        value = rng.uniform(0.1, 3)
+        if sym.is_negative or sym.is_nonpositive:
+            value = -value
+        elif not (sym.is_positive or sym.is_nonnegative):
+            value = rng.choice((-1, 1))*value
+        return Float(value, prec)
+    return Float(rng.uniform(-2, 2), prec) + \
+        I*Float(rng.uniform(-2, 2), prec)
+
+def __numeric_mismatch__(eqn, confidence, seed, prec=30):
+    """Compares the sides of `eqn` numerically at random points. Returns
+    `True` if they clearly differ at some point, `False` otherwise
+    (including when no point could be evaluated to a finite number).
+    """
+    import math
+    import random
+    if eqn.lhs.is_Matrix or eqn.rhs.is_Matrix:
+        return False
+    rng = random.Random(seed)
+    npoints = max(1, math.ceil(-math.log2(max(1 - confidence, 1e-300))))
+    syms = sorted(eqn.free_symbols, key=str)
+    if not syms:
+        npoints = 1
+    for k in range(npoints):
+        point = {sym: __random_point_value__(sym, rng, prec) for sym in syms}
+        try:
+            lhs = complex(eqn.lhs.evalf(prec, subs=point))
+            rhs = complex(eqn.rhs.evalf(prec, subs=point))
+            diff = complex((eqn.lhs - eqn.rhs).evalf(prec, subs=point))
+        except (TypeError, ValueError, ZeroDivisionError, OverflowError):
+            # not a number here (e.g. undefined functions or a singularity)
+            continue
+        if not all(math.isfinite(v.real) and math.isfinite(v.imag)
+                   for v in (lhs, rhs, diff)):
+            continue
+        if abs(diff) > 1e-10*max(1, abs(lhs), abs(rhs)):
+            return True
+    return False
+
+def __Equation__check__override__(self, dimensions=False, numeric=None,
+                                  confidence=None, seed=None, **kwargs):
+    """
+    Forces simplification and casts as `Equality` to check validity.
+
+    Parameters
+    ----------
+    dimensions: if `True` (or a dict mapping symbols to their units, see
+    `dimension_mismatches()`) returns `False` without simplifying when the
+    two sides are found to have different dimensions.
+    numeric: if `True` the two sides are first compared numerically with 30
+    digits at random points (see `algwsym_config.numerics.check_numeric`)
+    and `False` is returned without simplifying if they clearly differ,
+    i.e. the equation is not an identity. Default is the value of
+    `algwsym_config.numerics.check_numeric`.
+    confidence, seed: override `algwsym_config.numerics.check_confidence`
+    and `algwsym_config.numerics.check_seed` for this check.
+    kwargs any appropriate for `Equality`.
+
+    Returns
+    -------
+    True, False or an unevaluated `Equality` if truth cannot be determined.
+    """
+    if dimensions is not False:
+        from algebra_with_sympy.dimensions import dimensionally_consistent
+        symbol_units = None
+        if isinstance(dimensions, dict):
+            symbol_units = dimensions
+        if not dimensionally_consistent(self, symbol_units):
+            return False
+    if numeric is None:
+        numeric = getattr(algwsym_config.numerics, 'check_numeric', False)
+    if numeric is True:
+        if confidence is None:
+            confidence = getattr(algwsym_config.numerics,
+                                 'check_confidence', 0.999)
+        if seed is None:
+            seed = getattr(algwsym_config.numerics, 'check_seed', None)
+        if __numeric_mismatch__(self, confidence, seed):
+            return False
+    return __sympy_Equation_check__(self, **kwargs)
+
+sympy.core.Equation.check = __Equation__check__override__
+
+# Hash-consing of Equations (see `algwsym_config.numerics.intern_equations`).
+# `__interned_exprs__` maps every subexpression of a live interned Equation to
+# `[canonical object, reference count]`, where references come from interned
+# Equations and from parent subexpressions. Sympy expressions cannot be
+# weakly referenced, so entries are released by reference counting when the
+# (weakly referenced) Equations that use them are garbage collected.
+import weakref
+__interned_equations__ = weakref.WeakValueDictionary()
+__interned_exprs__ = {}
+__sympy_Equation_new__ = sympy.core.Equation.__new__
+
+def __intern_acquire__(expr):
+    """Returns the canonical copy of `expr`, adding it (and, bottom-up,
+    its subexpressions) to the table if necessary, and takes a reference to
+    it.
+    """
+    entry = __interned_exprs__.get(expr, None)
+    if entry is not None:
+        entry[1] += 1
+        return entry[0]
+    args = expr.args
+    if args and type(expr).args is Basic.args:
+        shared = tuple(__intern_acquire__(k) for k in args)
+        if any(new is not old for new, old in zip(shared, args)):
+            # equal children, so the hash and meaning are unchanged
+            expr._args = shared
+    __interned_exprs__[expr] = [expr, 1]
+    return expr
+
+def __intern_release__(*exprs):
+    """Drops a reference to each of `exprs`, removing subexpressions that
+    are no longer used by any interned Equation from the table.
+    """
+    stack = list(exprs)
+    while stack:
+        expr = stack.pop()
+        entry = __interned_exprs__.get(expr, None)
+        if entry is None or entry[0] is not expr:
+            continue
+        entry[1] -= 1
+        if entry[1] == 0:
+            del __interned_exprs__[expr]
+            if type(expr).args is Basic.args:
+                stack.extend(expr.args)
+
+def __Equation__new__override__(cls, lhs, rhs, **kwargs):
+    """Override of `Equation.__new__` that returns the canonical Equation
+    with sides that share all subexpressions with previously created
+    Equations when `algwsym_config.numerics.intern_equations` is `True`.
+    """
+    obj = __sympy_Equation_new__(cls, lhs, rhs, **kwargs)
+    if getattr(algwsym_config.numerics, 'intern_equations', False) is not \
+            True:
+        return obj
+    key = (cls, obj.lhs, obj.rhs)
+    existing = __interned_equations__.get(key, None)
+    if existing is not None:
+        return existing
+    lhs = __intern_acquire__(obj.lhs)
+    rhs = __intern_acquire__(obj.rhs)
+    obj._args = (lhs, rhs)
+    __interned_equations__[key] = obj
+    weakref.finalize(obj, __intern_release__, lhs, rhs)
+    return obj
+
+sympy.core.Equation.__new__ = __Equation__new__override__
+
+# Concurrent transformation of the two sides of an Equation (see
+# `algwsym_config.numerics.parallel_sides`). The worker process is started on
+# first use, reused, and shut down when the interpreter exits.
+import atexit
+
+__side_pool__ = None
+__sympy_Equation_apply__ = sympy.core.Equation.apply
+
+def __side_pool_shutdown__():
+    """Shuts down the worker process of `parallel_sides`, if running."""
+    global __side_pool__
+    if __side_pool__ is not None:
+        __side_pool__.shutdown(wait=False)
+        __side_pool__ = None
+
+atexit.register(__side_pool_shutdown__)
+
+def __apply_to_lhs_in_pool__(lhs, func, name, args, kwargs):
+    """Submits the lhs transformation of a parallel `Equation.apply()` to the
+    worker process and returns the future. If the pool is broken (e.g. the
+    worker was killed) it is replaced once; `None` is returned if the new
+    one is broken as well.
+    """
+    global __side_pool__
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    for attempt in range(2):
+        if __side_pool__ is None:
+            __side_pool__ = ProcessPoolExecutor(1)
+        try:
+            return __side_pool__.submit(__apply_to_side__, lhs, func, name,
+                                        args, kwargs)
+        except BrokenProcessPool:
+            __side_pool_shutdown__()
+    return None
+
+def __apply_to_side__(expr, func, name, args, kwargs):
+    """Worker for the lhs in a parallel `Equation.apply()`. If `name` is not
+    `None` the expression method of that name is called instead of `func`.
+    """
+    if name is not None:
+        return getattr(expr, name)(*args, **kwargs)
+    return sympy.core.Equation._applytoexpr(None, expr, func, *args,
+                                            **kwargs)
+
+def __Equation__apply__override__(self, func, *args, side='both',
+                                  parallel=None, **kwargs):
+    """Override of `Equation.apply()` that accepts `parallel=` and, when
+    it (or `algwsym_config.numerics.parallel_sides`) is `True`, transforms
+    the lhs in a worker process concurrently with the rhs.
+    """
+    if parallel is None:
+        parallel = getattr(algwsym_config.numerics, 'parallel_sides', False)
+    if parallel is not True or side != 'both' or self.lhs == self.rhs or \
+            self.lhs.is_Atom or self.rhs.is_Atom:
+        return __sympy_Equation_apply__(self, func, *args, side=side,
+                                        **kwargs)
+    import pickle
+    # `.do.` passes a method bound to the rhs; only send its name.
+    name = None
+    if isinstance(getattr(func, '__self__', None), Basic):
+        name = func.__name__
+        if getattr(self.lhs, name, None) is None:
+            return __sympy_Equation_apply__(self, func, *args, side=side,
+                                            **kwargs)
+    try:
+        pickle.dumps((None if name else func, args, kwargs))
+    except Exception:
+        # e.g. lambdas and local functions cannot be sent to another process
+        return __sympy_Equation_apply__(self, func, *args, side=side,
+                                        **kwargs)
+    from concurrent.futures.process import BrokenProcessPool
+    future = __apply_to_lhs_in_pool__(self.lhs, None if name else func, name,
+                                      args, kwargs)
+    rhs = self._applytoexpr(self.rhs, func, *args, **kwargs)
+    lhs = None
+    if future is not None:
+        try:
+            lhs = future.result()
+        except BrokenProcessPool:
+            # the worker died; the next call starts a new one
+            __side_pool_shutdown__()
+    if lhs is None:
+        lhs = self._applytoexpr(self.lhs, func, *args, **kwargs)
+    return Equation(lhs, rhs)
+
+sympy.core.Equation.apply = __Equation__apply__override__
+
 def __FiniteSet__repr__override__(self):
     """Override of the `FiniteSet.__repr__(self)` to overcome sympy's
     inconsistent wrapping of Finite Sets which prevents reliable use of
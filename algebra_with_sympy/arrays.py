@@ -0,0 +1,340 @@
+"""
+Containers for applying the same operations to many `Equation` objects.
+"""
+from sympy import Equation, sympify
+
+__all__ = ['EquationArray']
+
+
+def _apply_to_expr(expr, func, name, args, kwargs):
+    """Applies `func` to `expr` as `Equation.apply()` does or, if `name` is
+    not `None`, calls the expression method of that name.
+    """
+    if name is not None:
+        method = getattr(expr, name, None)
+        if method is None:
+            raise AttributeError('Expressions in the equation have no '
+                                 'attribute `' + name + '`.')
+        return method(*args, **kwargs)
+    return Equation._applytoexpr(None, expr, func, *args, **kwargs)
+
+
+def _apply_chunk(exprs, func, name, args, kwargs):
+    """Worker for `EquationArray.apply(..., workers=n)`."""
+    return [_apply_to_expr(k, func, name, args, kwargs) for k in exprs]
+
+
+class EquationArray():
+    """
+    An ordered collection of equations to which operations are applied in
+    a single batch.
+
+    An array is stored in one of two ways:
+
+    * *Template-backed*: `EquationArray(template, params)` represents the
+      equations obtained by substituting each row of the parameter columns
+      `params` (a dict from symbol to a sequence of values, all of the same
+      length) into the `Equation` `template`. Operations on the array are
+      carried out once on the template, treating the parameters as generic
+      symbols, so the symbolic work does not grow with the number of
+      equations. The individual equations are only built when they are
+      accessed.
+    * *Explicit*: `EquationArray(equations)` stores the sides of the given
+      equations as aligned tuples. Each distinct side expression is
+      transformed only once however often it occurs, and the work can be
+      spread over worker processes.
+
+    Use `materialized()` to turn a template-backed array into an explicit
+    one when an operation depends on the parameter values (e.g. one that
+    is only valid for particular values).
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, x = symbols('a b x')
+    >>> arr = EquationArray(Eqn(a*x**2 + b*x, (x + a)**2), {a: [1, 2, 3],
+    ...                                                      b: [0, 1, 2]})
+    >>> len(arr)
+    3
+    >>> arr[1]
+    Equation(2*x**2 + x, (x + 2)**2)
+    >>> arr.do.expand().rhs
+    (x**2 + 2*x + 1, x**2 + 4*x + 4, x**2 + 6*x + 9)
+    >>> arr.subs(x, 1).check()
+    [False, False, False]
+    >>> EquationArray([Eqn(x**2, a), Eqn(sin(x), a), Eqn(x**2, b)]).do.diff(x)
+    EquationArray([Equation(2*x, 0), Equation(cos(x), 0), Equation(2*x, 0)])
+    """
+
+    def __init__(self, equations, params=None):
+        self._template = None
+        self._params = None
+        if params is not None:
+            if not isinstance(equations, Equation):
+                raise TypeError('A template-backed EquationArray needs an '
+                                'Equation as template.')
+            cols = {sympify(k): tuple(sympify(v) for v in vals)
+                    for k, vals in params.items()}
+            lengths = {len(k) for k in cols.values()}
+            if len(lengths) > 1:
+                raise ValueError('All parameter columns must have the same '
+                                 'length.')
+            self._template = equations
+            self._params = cols
+            self._len = lengths.pop() if lengths else 0
+        else:
+            equations = list(equations)
+            for k in equations:
+                if not isinstance(k, Equation):
+                    raise TypeError(str(k) + ' is not an Equation.')
+            self._lhs = tuple(k.lhs for k in equations)
+            self._rhs = tuple(k.rhs for k in equations)
+            self._len = len(equations)
+
+    @classmethod
+    def _from_sides(cls, lhs, rhs):
+        new = cls(())
+        new._lhs = tuple(lhs)
+        new._rhs = tuple(rhs)
+        new._len = len(new._lhs)
+        return new
+
+    def _with_template(self, template):
+        new = EquationArray.__new__(EquationArray)
+        new._template = template
+        new._params = self._params
+        new._len = self._len
+        return new
+
+    @property
+    def template(self):
+        """
+        The shared template `Equation`, or `None` for an explicit array.
+        """
+        return self._template
+
+    def _row(self, i):
+        return {k: v[i] for k, v in self._params.items()}
+
+    def _equation(self, i):
+        if self._template is not None:
+            return self._template.xreplace(self._row(i))
+        return Equation(self._lhs[i], self._rhs[i])
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return (self._equation(i) for i in range(self._len))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            if self._template is not None:
+                new = self._with_template(self._template)
+                new._params = {k: v[i] for k, v in self._params.items()}
+                new._len = len(range(*i.indices(self._len)))
+                return new
+            return EquationArray._from_sides(self._lhs[i], self._rhs[i])
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('EquationArray index out of range')
+        return self._equation(i)
+
+    def __repr__(self):
+        return 'EquationArray(%s)' % repr(self.equations)
+
+    def __str__(self):
+        return '[' + ', '.join(str(k) for k in self) + ']'
+
+    @property
+    def equations(self):
+        """
+        A list of the equations in the array.
+        """
+        return list(self)
+
+    @property
+    def lhs(self):
+        """
+        A tuple of the left-hand sides.
+        """
+        if self._template is not None:
+            return tuple(self._template.lhs.xreplace(self._row(i))
+                         for i in range(self._len))
+        return self._lhs
+
+    @property
+    def rhs(self):
+        """
+        A tuple of the right-hand sides.
+        """
+        if self._template is not None:
+            return tuple(self._template.rhs.xreplace(self._row(i))
+                         for i in range(self._len))
+        return self._rhs
+
+    def materialized(self):
+        """
+        Returns an explicit `EquationArray` holding the same equations.
+        """
+        if self._template is None:
+            return self
+        return EquationArray(self.equations)
+
+    def _apply(self, func, name, args, kwargs, side, workers):
+        if side not in ('both', 'lhs', 'rhs'):
+            raise ValueError('`side` must be "both", "lhs" or "rhs".')
+        if self._template is not None:
+            lhs, rhs = self._template.args
+            if side in ('both', 'lhs'):
+                lhs = _apply_to_expr(lhs, func, name, args, kwargs)
+            if side in ('both', 'rhs'):
+                rhs = _apply_to_expr(rhs, func, name, args, kwargs)
+            return self._with_template(Equation(lhs, rhs))
+        todo = []
+        if side in ('both', 'lhs'):
+            todo.extend(self._lhs)
+        if side in ('both', 'rhs'):
+            todo.extend(self._rhs)
+        unique = list(dict.fromkeys(todo))
+        results = None
+        if workers is not None and workers > 1 and len(unique) > 1:
+            results = self._apply_parallel(unique, func, name, args, kwargs,
+                                           workers)
+        if results is None:
+            results = _apply_chunk(unique, func, name, args, kwargs)
+        done = dict(zip(unique, results))
+        lhs = self._lhs
+        rhs = self._rhs
+        if side in ('both', 'lhs'):
+            lhs = [done[k] for k in lhs]
+        if side in ('both', 'rhs'):
+            rhs = [done[k] for k in rhs]
+        return EquationArray._from_sides(lhs, rhs)
+
+    @staticmethod
+    def _apply_parallel(exprs, func, name, args, kwargs, workers):
+        """Applies the operation to `exprs` in a process pool. Returns
+        `None` if the operation cannot be sent to another process.
+        """
+        import pickle
+        try:
+            pickle.dumps((func, args, kwargs))
+        except Exception:
+            return None
+        from algebra_with_sympy.evaluation import _map_chunks
+        return _map_chunks(_apply_chunk, exprs, workers, func, name, args,
+                           kwargs)
+
+    def apply(self, func, *args, side='both', workers=None, **kwargs):
+        """
+        Applies `func` to every equation in the array as `Equation.apply`
+        does and returns the new `EquationArray`. For explicit arrays
+        `workers` (an integer) spreads the distinct side expressions over
+        that many processes.
+        """
+        return self._apply(func, None, args, kwargs, side, workers)
+
+    def applylhs(self, func, *args, **kwargs):
+        """
+        Applies `func` to the lhs of every equation.
+        """
+        return self.apply(func, *args, side='lhs', **kwargs)
+
+    def applyrhs(self, func, *args, **kwargs):
+        """
+        Applies `func` to the rhs of every equation.
+        """
+        return self.apply(func, *args, side='rhs', **kwargs)
+
+    class _sides:
+        """
+        Helper class for the `.do.`, `.dolhs.`, `.dorhs.` syntax applied to
+        every equation in the array. `workers=` may be passed to the method.
+        """
+
+        def __init__(self, array, side='both'):
+            self.array = array
+            self.side = side
+
+        def __getattr__(self, name):
+            if name.startswith('__'):
+                raise AttributeError(name)
+            array = self.array
+            side = self.side
+
+            def method(*args, workers=None, **kwargs):
+                return array._apply(None, name, args, kwargs, side, workers)
+            return method
+
+    @property
+    def do(self):
+        return self._sides(self, side='both')
+
+    @property
+    def dolhs(self):
+        return self._sides(self, side='lhs')
+
+    @property
+    def dorhs(self):
+        return self._sides(self, side='rhs')
+
+    def subs(self, *args, **kwargs):
+        """
+        Substitutes into every equation. Accepts the same arguments as
+        `Equation.subs`. For a template-backed array the substitution is
+        done once on the template unless a parameter appears in an
+        expression being replaced or in its replacement, in which case the
+        array is materialized first.
+        """
+        if args and all(isinstance(a, Equation) for a in args):
+            # as in `Equation.subs`
+            args = ({a.lhs: a.rhs for a in args},)
+        if self._template is None:
+            return self._apply(None, 'subs', args, kwargs, 'both', None)
+        if len(args) == 2:
+            pairs = [args]
+        elif hasattr(args[0], 'keys'):
+            pairs = args[0].items()
+        else:
+            pairs = args[0]
+        if any(sympify(k).has(*self._params.keys()) for pair in pairs
+               for k in pair):
+            return self.materialized().subs(*args, **kwargs)
+        return self._with_template(self._template.subs(*args, **kwargs))
+
+    def evalf(self, n=15, subs=None, **kwargs):
+        """
+        Numerically evaluates every equation to `n` digits, with the
+        optional substitutions `subs` applied to all of them, and returns a
+        list of the results. Common subexpressions of the template (or of
+        all the explicit equations) are found once and each is evaluated
+        only once per equation.
+        """
+        from algebra_with_sympy.evaluation import EvaluationPlan
+        values = {}
+        if subs is not None:
+            values = {sympify(k): sympify(v) for k, v in subs.items()}
+        if self._template is None:
+            return EvaluationPlan(self.equations).evalf(n, subs=values,
+                                                        **kwargs)
+        plan = EvaluationPlan(self._template)
+        results = []
+        for i in range(self._len):
+            row = dict(values)
+            row.update(self._row(i))
+            results.append(plan.evalf(n, subs=row, **kwargs))
+        return results
+
+    def check(self, **kwargs):
+        """
+        Returns a list of the results of `Equation.check()` for every
+        equation. For a template-backed array whose template holds
+        identically (checks `True`) the individual equations are not
+        checked.
+        """
+        if self._template is not None and \
+                self._template.check(**kwargs) is True:
+            return [True]*self._len
+        return [k.check(**kwargs) for k in self]
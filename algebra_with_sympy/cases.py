@@ -0,0 +1,218 @@
+"""
+Case splitting of equations containing `Abs` and `Piecewise`.
+
+Each `Abs(u)` with real `u` is replaced by `u` under the condition `u >= 0`
+and by `-u` under `u < 0`, and each `Piecewise` by its pieces under their
+conditions, so that a system becomes a set of sub-systems free of these
+functions. Branches whose conditions cannot hold together are pruned as
+they are generated. `solve(..., split_cases=True)` uses this to solve the
+sub-systems independently (optionally in parallel).
+"""
+from sympy import Abs, Piecewise, And, Not, S, EmptySet
+from sympy.core.relational import Relational
+from sympy.core.sorting import default_sort_key
+
+__all__ = ['split_cases']
+
+
+def _splittable(items):
+    """Returns an `Abs` or `Piecewise` in `items` whose arguments contain
+    no further `Abs` or `Piecewise`, or `None` if there is none (ignoring
+    `Abs` of possibly non-real arguments, which cannot be split).
+    """
+    candidates = set()
+    for item in items:
+        candidates |= item.atoms(Abs, Piecewise)
+    for atom in sorted(candidates, key=default_sort_key):
+        if isinstance(atom, Abs) and not atom.args[0].is_extended_real:
+            continue
+        inner = set()
+        for arg in atom.args:
+            inner |= arg.atoms(Abs, Piecewise)
+        if not inner:
+            return atom
+    return None
+
+
+def _branches(atom):
+    """Returns `(replacement, condition)` pairs for one `Abs` or
+    `Piecewise`.
+    """
+    if isinstance(atom, Abs):
+        u = atom.args[0]
+        return [(u, u >= 0), (-u, u < 0)]
+    branches = []
+    earlier = S.true
+    for expr, cond in atom.args:
+        branches.append((expr, And(cond, earlier)))
+        earlier = And(earlier, Not(cond))
+    return branches
+
+
+def _conjuncts(cond):
+    if isinstance(cond, And):
+        return list(cond.args)
+    return [cond]
+
+
+def _interval(cond):
+    """Returns `(symbol, interval)` for a strict or non-strict inequality
+    that is linear in a single real symbol with numeric coefficients, or
+    `None` for any other condition.
+    """
+    from sympy import Interval, oo
+    if not isinstance(cond, Relational) or cond.rel_op not in ('<', '<=',
+                                                                '>', '>='):
+        return None
+    expr = cond.lhs - cond.rhs
+    free = expr.free_symbols
+    if len(free) != 1:
+        return None
+    sym = free.pop()
+    if not sym.is_extended_real:
+        return None
+    poly = expr.as_poly(sym)
+    if poly is None or poly.degree() != 1:
+        return None
+    a, b = poly.all_coeffs()
+    if not (a.is_extended_real and a.is_number and b.is_extended_real and
+            b.is_number):
+        return None
+    root = -b/a
+    op = cond.rel_op
+    if a.is_negative:
+        op = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}[op]
+    if op in ('>', '>='):
+        return sym, Interval(root, oo, op == '>', True)
+    return sym, Interval(-oo, root, True, op == '<')
+
+
+def _feasible(conds):
+    """Cheap test of whether the conditions can hold together: conditions
+    linear in a single symbol are intersected as intervals, and a condition
+    together with its negation is a contradiction. `True` does not
+    guarantee that the conditions can be met.
+    """
+    intervals = {}
+    seen = set()
+    for cond in conds:
+        if cond == S.false:
+            return False
+        if cond == S.true:
+            continue
+        if isinstance(cond, Relational):
+            if cond.negated in seen:
+                return False
+            seen.add(cond)
+        bound = _interval(cond)
+        if bound is None:
+            continue
+        sym, interval = bound
+        if sym in intervals:
+            interval = intervals[sym].intersect(interval)
+        if interval == EmptySet:
+            return False
+        intervals[sym] = interval
+    return True
+
+
+def split_cases(equations):
+    """
+    Splits an `Equation`, expression or iterable of them on every `Abs`
+    (of a real argument) and `Piecewise` they contain.
+
+    Returns a list of `(items, conditions)` pairs: `items` is the list of
+    equations (or expressions) with the `Abs` and `Piecewise` replaced by
+    the branch's expressions and `conditions` the list of conditions under
+    which that branch applies. Branches that fail a cheap feasibility test
+    (intersection of the intervals given by conditions linear in one
+    symbol, or a condition appearing together with its negation) are not
+    returned.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y = symbols('x y', real=True)
+    >>> for items, conds in split_cases(Eqn(abs(x - 1) + abs(x), 3)):
+    ...     print(items, conds)
+    [Equation(2*x - 1, 3)] [x >= 0, x - 1 >= 0]
+    [Equation(1, 3)] [x >= 0, x - 1 < 0]
+    [Equation(1 - 2*x, 3)] [x < 0, x - 1 < 0]
+    """
+    from sympy import Basic
+    if isinstance(equations, Basic) or not hasattr(equations, '__iter__'):
+        equations = [equations]
+    pending = [(list(equations), [])]
+    done = []
+    while pending:
+        items, conds = pending.pop()
+        atom = _splittable(items)
+        if atom is None:
+            done.append((items, conds))
+            continue
+        # later branches are pushed first so the output follows the order
+        # of the branches
+        for replacement, cond in reversed(_branches(atom)):
+            new_conds = conds + _conjuncts(cond)
+            if not _feasible(new_conds):
+                continue
+            pending.append(([k.xreplace({atom: replacement}) for k in items],
+                            new_conds))
+    return done
+
+
+def _solve_branch(exprs, symbols, flags):
+    """Worker that solves one sub-system."""
+    from sympy.solvers.solvers import solve
+    return solve(exprs, *symbols, **flags)
+
+
+def _solve_split(exprs, symbols, flags, workers=None):
+    """
+    Solves the expressions `exprs` (each equal to zero) by case splitting.
+    Returns the merged list of solution dicts, or `None` if splitting does
+    not apply, a sub-system cannot be solved, a branch has solutions that
+    leave an unknown free (e.g. a piece reducing to `0 = 0`, which holds on
+    the whole interval given by its conditions) or a solution's branch
+    conditions cannot be decided, in which case the caller should solve the
+    system without splitting.
+    """
+    from sympy import expand
+    branches = split_cases(exprs)
+    if len(branches) == 1 and not branches[0][1]:
+        return None
+    if not symbols:
+        free = set()
+        for k in exprs:
+            free |= k.free_symbols
+        symbols = tuple(sorted(free, key=default_sort_key))
+    for items, conds in branches:
+        if all(expand(k) == 0 for k in items):
+            # solve() returns no solutions for an identity
+            return None
+    flags = dict(flags, dict=True)
+    try:
+        if workers is not None and workers > 1 and len(branches) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(min(workers, len(branches))) as pool:
+                futures = [pool.submit(_solve_branch, items, symbols, flags)
+                           for items, conds in branches]
+                results = [k.result() for k in futures]
+        else:
+            results = [_solve_branch(items, symbols, flags)
+                       for items, conds in branches]
+    except NotImplementedError:
+        return None
+    merged = {}
+    for (items, conds), solns in zip(branches, results):
+        for soln in solns:
+            if not set(symbols) <= set(soln):
+                return None
+            holds = And(*conds).xreplace(soln) if conds else S.true
+            if holds == S.false:
+                continue
+            if holds != S.true:
+                return None
+            key = tuple(sorted(soln.items(), key=default_sort_key))
+            merged.setdefault(key, soln)
+    return [merged[k] for k in sorted(merged, key=default_sort_key)]
@@ -0,0 +1,364 @@
+"""
+Numerical continuation of the solutions of a system of equations as a
+parameter varies.
+
+Instead of solving the system from scratch at every parameter value, each
+known solution is followed from one value to the next with a
+predictor-corrector step: the tangent of the solution curve (from the
+implicit function theorem) predicts the solution at the next value and a
+few Newton iterations correct it. The residual and Jacobians are compiled
+once and all branches are advanced together as arrays. Requires NumPy.
+"""
+from sympy import Equation, sympify
+
+__all__ = ['ContinuationTracker', 'TrackedSolutions', 'track_solutions']
+
+_tracker_cache = {}
+_TRACKER_CACHE_SIZE = 64
+
+
+def _stacked(values, nbranches, dtype):
+    """Stacks the values returned by a compiled function, some of which may
+    be scalars, into an array of shape `(nbranches, len(values))`.
+    """
+    import numpy as np
+    return np.stack([np.broadcast_to(np.asarray(k, dtype=dtype),
+                                     (nbranches,)) for k in values], axis=-1)
+
+
+def _batched_solve(A, b):
+    """Solves `A[i] x[i] = b[i]` for every `i`. Returns `x` and a mask of
+    the systems that could be solved (singular ones give NaN).
+    """
+    import numpy as np
+    try:
+        x = np.linalg.solve(A, b[..., None])[..., 0]
+        return x, np.isfinite(x).all(axis=-1)
+    except np.linalg.LinAlgError:
+        x = np.full_like(b, np.nan)
+        for i in range(len(b)):
+            try:
+                x[i] = np.linalg.solve(A[i], b[i])
+            except np.linalg.LinAlgError:
+                pass
+        return x, np.isfinite(x).all(axis=-1)
+
+
+class TrackedSolutions():
+    """
+    The result of `ContinuationTracker.track()`.
+
+    Attributes
+    ==========
+    parameter_values: the parameter values of the sweep.
+    paths: an array of shape `(branches, len(parameter_values),
+        len(unknowns))` with the solution of every branch at every
+        parameter value, NaN once a branch has been lost.
+    events: a list of `(kind, branches, parameter_value)` tuples, where
+        `kind` is `'turning_point'` (the branch folds back and cannot be
+        followed further; `parameter_value` is the last value reached),
+        `'bifurcation'` (the determinant of the Jacobian changed sign
+        between two parameter values), `'collision'` (two branches came
+        together; `branches` is a pair) or `'failed'` (a starting point
+        did not converge).
+    newton_iterations: the number of Newton iterations, counted once per
+        branch.
+    """
+
+    def __init__(self, unknowns, parameter_values, paths, events,
+                 newton_iterations):
+        self.unknowns = unknowns
+        self.parameter_values = parameter_values
+        self.paths = paths
+        self.events = events
+        self.newton_iterations = newton_iterations
+
+    def __repr__(self):
+        return ('TrackedSolutions(%d branches, %d parameter values, '
+                '%d events, %d Newton iterations)' % (
+                    self.paths.shape[0], len(self.parameter_values),
+                    len(self.events), self.newton_iterations))
+
+    def branch(self, i):
+        """
+        Returns a dict mapping each unknown to the array of its values
+        along branch `i`.
+        """
+        return {k: self.paths[i, :, j] for j, k in enumerate(self.unknowns)}
+
+
+class ContinuationTracker():
+    """
+    Follows the solutions of a system of equations in `unknowns` as the
+    symbol `parameter` varies.
+
+    The residual `lhs - rhs` of the equations and its Jacobians with
+    respect to the unknowns and the parameter are compiled once (and
+    cached, so a new tracker for the same system reuses them). `track()`
+    then follows any number of solution branches through a sequence of
+    parameter values:
+
+    * the tangent `dX/dp = -J_X**-1 * J_p` predicts the solution at the
+      next parameter value and Newton's method corrects it, for all
+      branches at once;
+    * if the correction does not converge the step is halved; a branch
+      that still fails at the minimum step has reached a turning point
+      (where it folds back) and is no longer followed;
+    * a sign change of `det(J_X)` between parameter values is reported as
+      a bifurcation and branches that come within `collision_tol` of each
+      other as a collision.
+
+    Parameters
+    ==========
+    equations: an `Equation`, expression or iterable of them, as many as
+        unknowns. They may contain no symbols other than the unknowns and
+        the parameter.
+    unknowns: the symbols solved for.
+    parameter: the symbol varied.
+    modules: passed on to `lambdify()`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, p = symbols('x p')
+    >>> tracker = ContinuationTracker(Eqn(x**2, p), [x], p)
+    >>> result = tracker.track([4, 1, 0.25, -1], [[-2], [2]])
+    >>> result.paths[:, :, 0]
+    array([[-2. , -1. , -0.5,  nan],
+           [ 2. ,  1. ,  0.5,  nan]])
+    >>> sorted(k[0] for k in result.events)
+    ['turning_point', 'turning_point']
+    """
+
+    def __init__(self, equations, unknowns, parameter, modules=None):
+        from sympy.utilities.lambdify import lambdify as sympy_lambdify
+        from algebra_with_sympy.evaluation import _cache_put, _hashable
+        from algebra_with_sympy.systems import _as_exprs, _as_symbol_list, \
+            jacobian
+        exprs = _as_exprs(equations)
+        self.unknowns = _as_symbol_list(unknowns)
+        self.parameter = sympify(parameter)
+        if len(exprs) != len(self.unknowns):
+            raise ValueError('Need as many equations as unknowns, not ' +
+                             str(len(exprs)) + ' and ' +
+                             str(len(self.unknowns)) + '.')
+        extra = set()
+        for k in exprs:
+            extra |= k.free_symbols
+        extra -= set(self.unknowns) | {self.parameter}
+        if extra:
+            raise ValueError('The equations contain symbols other than the '
+                             'unknowns and the parameter: ' +
+                             ', '.join(sorted(str(k) for k in extra)) +
+                             '. Substitute values for them first.')
+        self.exprs = exprs
+        key = (exprs, tuple(self.unknowns), self.parameter,
+               _hashable(modules))
+        funcs = _tracker_cache.get(key, None)
+        if funcs is None:
+            args = self.unknowns + [self.parameter]
+            JX = jacobian(exprs, self.unknowns)
+            JP = jacobian(exprs, [self.parameter])
+            funcs = _cache_put(_tracker_cache, key, (
+                sympy_lambdify(args, list(exprs), modules=modules, cse=True),
+                sympy_lambdify(args, list(JX) + list(JP), modules=modules,
+                               cse=True)), _TRACKER_CACHE_SIZE)
+        self._residual_func, self._jacobian_func = funcs
+
+    def _residual(self, X, p):
+        return _stacked(self._residual_func(*X.T, p), len(X), X.dtype)
+
+    def _jacobians(self, X, p):
+        """Returns `J_X` with shape `(branches, n, n)` and `J_p` with shape
+        `(branches, n)`.
+        """
+        n = len(self.unknowns)
+        values = _stacked(self._jacobian_func(*X.T, p), len(X), X.dtype)
+        return values[:, :n*n].reshape(len(X), n, n), values[:, n*n:]
+
+    def _newton(self, X, p, tol, max_iter):
+        """Newton's method for every branch at parameter value `p`. Returns
+        the corrected points, a mask of the branches that converged and the
+        number of iterations performed.
+        """
+        import numpy as np
+        converged = np.zeros(len(X), dtype=bool)
+        for iteration in range(1, max_iter + 1):
+            scale = tol*(1 + np.abs(X).max(axis=-1, initial=0))
+            F = self._residual(X, p)
+            # points that already satisfy the equations are accepted even
+            # where the Jacobian is singular (e.g. where branches cross)
+            solved = np.abs(F).max(axis=-1, initial=0) <= scale
+            JX, JP = self._jacobians(X, p)
+            dX, ok = _batched_solve(JX, F)
+            ok &= ~solved
+            X = np.where(ok[:, None], X - dX, X)
+            size = np.abs(dX).max(axis=-1, initial=0)
+            converged = solved | (ok & (size <= scale))
+            if converged.all():
+                break
+        return X, converged, iteration
+
+    def _start_points(self, start, p0):
+        """Converts the starting solutions to an array with one row per
+        branch.
+        """
+        import numpy as np
+        from algebra_with_sympy.evaluation import _solution_branches
+        subs = {self.parameter: p0}
+        if start is None:
+            from sympy.solvers.solvers import solve
+            found = solve([k.xreplace(subs) for k in self.exprs],
+                          self.unknowns, dict=True)
+            rows = [[complex(d.get(k, k).evalf()) for k in self.unknowns]
+                    for d in found if all(d.get(k, k).is_number for k in
+                                          self.unknowns)]
+            rows = [k for k in rows if all(abs(v.imag) <= 1e-12*(1 +
+                                                                 abs(v))
+                                           for v in k)]
+            if not rows:
+                raise ValueError('No real starting solutions found at ' +
+                                 str(self.parameter) + ' = ' + str(p0) +
+                                 '.')
+            return np.array(rows).real
+        if hasattr(start, 'keys'):
+            start = [start]
+        if isinstance(start, Equation) or (
+                hasattr(start, '__iter__') and
+                any(isinstance(k, Equation) or hasattr(k, 'is_FiniteSet')
+                    for k in start)):
+            start = [{k.lhs: k.rhs for k in branch}
+                     for branch in _solution_branches(start)]
+        rows = []
+        for row in start:
+            if hasattr(row, 'keys'):
+                row = [sympify(row[k]).xreplace(subs) for k in
+                       self.unknowns]
+            rows.append([complex(sympify(v).evalf()) for v in row])
+        rows = np.array(rows, dtype=complex)
+        if np.all(rows.imag == 0):
+            rows = rows.real
+        return rows
+
+    def track(self, values, start=None, tol=1e-10, max_iter=8,
+              min_step=None, collision_tol=1e-6):
+        """
+        Follows the solution branches through the parameter `values` (a
+        monotonic sequence) and returns a `TrackedSolutions` object.
+
+        Parameters
+        ==========
+        values: the parameter values.
+        start: the solutions at `values[0]`: a `solve()` result, a dict or
+            list of dicts mapping unknowns to values, or an array with one
+            row of unknown values per branch. Values may still contain the
+            parameter. If `None` the system is solved at `values[0]` and
+            every real solution is followed.
+        tol: relative tolerance of the Newton corrections.
+        max_iter: maximum number of Newton iterations per step.
+        min_step: the smallest step before a failing branch is given up
+            as having reached a turning point. Defaults to `1e-9` times the
+            range of `values`.
+        collision_tol: relative distance below which two branches are
+            reported as colliding.
+        """
+        import numpy as np
+        values = np.asarray(values, dtype=float)
+        X = self._start_points(start, values[0])
+        nbranches, n = X.shape
+        if n != len(self.unknowns):
+            raise ValueError('Each starting point needs a value for each '
+                             'of the ' + str(len(self.unknowns)) +
+                             ' unknowns.')
+        if min_step is None:
+            min_step = 1e-9*max(abs(values[-1] - values[0]), 1)
+        events = []
+        paths = np.full((nbranches, len(values), n), np.nan, dtype=X.dtype)
+        X, active, iterations = self._newton(X, values[0], tol, max_iter)
+        total = iterations*nbranches
+        for i in np.flatnonzero(~active):
+            events.append(('failed', int(i), float(values[0])))
+        paths[:, 0] = np.where(active[:, None], X, np.nan)
+        det_prev = np.linalg.det(self._jacobians(X, values[0])[0])
+        colliding = set()
+        step = None
+        X_prev, p_prev = X, None
+        for k in range(1, len(values)):
+            p, target = values[k - 1], values[k]
+            direction = np.sign(target - p)
+            if step is None:
+                step = abs(target - p)
+            while p != target and active.any():
+                h = direction*min(step, abs(target - p))
+                JX, JP = self._jacobians(X, p)
+                tangent, ok = _batched_solve(JX, -JP)
+                if p_prev is not None:
+                    # secant through the last two points where the tangent
+                    # is not defined
+                    tangent = np.where(ok[:, None], tangent,
+                                       (X - X_prev)/(p - p_prev))
+                    ok[:] = True
+                predicted = np.where(ok[:, None], X + h*tangent, X)
+                corrected, converged, iterations = self._newton(
+                    predicted, p + h, tol, max_iter)
+                total += iterations*int(active.sum())
+                if (converged | ~active).all():
+                    X_prev, p_prev = X, p
+                    X = np.where(active[:, None], corrected, X)
+                    p = target if abs(target - (p + h)) <= \
+                        1e-12*abs(h) else p + h
+                    step = 2*abs(h)
+                    continue
+                if abs(h) > min_step:
+                    step = abs(h)/2
+                    continue
+                lost = active & ~converged
+                for i in np.flatnonzero(lost):
+                    events.append(('turning_point', int(i), float(p)))
+                active &= ~lost
+                X = np.where(active[:, None], corrected, X)
+                p = p + h
+            if p != target:
+                break
+            paths[:, k] = np.where(active[:, None], X, np.nan)
+            det = np.linalg.det(self._jacobians(X, target)[0])
+            if not np.iscomplexobj(det):
+                flipped = active & (np.sign(det)*np.sign(det_prev) < 0)
+                for i in np.flatnonzero(flipped):
+                    events.append(('bifurcation', int(i), float(target)))
+            det_prev = det
+            scale = 1 + np.abs(X).max(axis=-1)
+            for i in range(nbranches):
+                for j in range(i + 1, nbranches):
+                    if not (active[i] and active[j]):
+                        colliding.discard((i, j))
+                        continue
+                    close = np.abs(X[i] - X[j]).max() <= \
+                        collision_tol*max(scale[i], scale[j])
+                    if close and (i, j) not in colliding:
+                        events.append(('collision', (i, j), float(target)))
+                        colliding.add((i, j))
+                    elif not close:
+                        colliding.discard((i, j))
+        return TrackedSolutions(self.unknowns, values, paths, events, total)
+
+
+def track_solutions(equations, unknowns, parameter, values, start=None,
+                    **kwargs):
+    """
+    Follows the solutions of `equations` in `unknowns` as `parameter`
+    takes the given `values`. Shorthand for
+    `ContinuationTracker(equations, unknowns, parameter).track(values,
+    start, **kwargs)`; see `ContinuationTracker` for details.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y, p = symbols('x y p')
+    >>> result = track_solutions([Eqn(x**2 + y**2, 1), Eqn(y, p*x)],
+    ...                          [x, y], p, [0, 1], start=[[1, 0]])
+    >>> result.paths[0, -1]
+    array([0.70710678, 0.70710678])
+    """
+    return ContinuationTracker(equations, unknowns, parameter).track(
+        values, start, **kwargs)
@@ -0,0 +1,598 @@
+"""
+Numerical evaluation of equations containing units.
+
+Units may be `sympy.physics.units` quantities or unit symbols declared with
+`units()` whose names are the names or abbreviations of such quantities
+(e.g. `units('m kg s atm')`). Rather than rewriting expressions with
+`convert_to()`, a `UnitTable` holding the scale factor and base-dimension
+exponents of every unit in a unit system is built once. Each unit is then
+replaced by a float scale factor and dimensions are tracked as short tuples
+of integer exponents, one per base dimension.
+"""
+from sympy import Equation, Float, S, sympify
+
+__all__ = ['UnitTable', 'evalf_units', 'lambdify_units',
+           'dimension_mismatches', 'dimensionally_consistent']
+
+
+class UnitTable():
+    """
+    Scale factors and dimension vectors for the units of a unit system.
+
+    The scale factor of a unit is its size in the base units of the system
+    (e.g. for SI `kilometer -> 1000.0`, `atmosphere -> 101325.0`). The
+    dimension vector is the tuple of exponents of the base dimensions listed
+    in `base_dimensions` (e.g. pressure in SI is mass/(length*time**2)).
+
+    Tables are expensive to build and are cached per unit system, so use
+    `UnitTable.for_system(name)` to get one.
+
+    Parameters
+    ==========
+    unit_system: the name of a sympy unit system ('SI', 'MKS', 'MKSA' ...)
+        or a `UnitSystem`. Default 'SI'.
+    aliases: optional dict mapping symbols to the quantities they stand
+        for. Symbols declared with `units()` are recognized automatically
+        when their name is the name or abbreviation of a quantity.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> from sympy.physics.units import kilometer, atmosphere
+    >>> T = UnitTable.for_system('SI')
+    >>> T.base_units
+    (mole, ampere, meter, candela, kilogram, kelvin, second)
+    >>> T.lookup(kilometer)
+    (1000.0, (0, 0, 1, 0, 0, 0, 0))
+    >>> T.lookup(atmosphere)
+    (101325.0, (0, 0, -1, 0, 1, 0, -2))
+    """
+    _tables = {}
+
+    def __init__(self, unit_system='SI', aliases=None):
+        import sympy.physics.units as u
+        from sympy.physics.units import Quantity
+        from sympy.physics.units.unitsystem import UnitSystem
+        if isinstance(unit_system, str):
+            unit_system = UnitSystem.get_unit_system(unit_system)
+        self.unit_system = unit_system
+        dimsys = unit_system.get_dimension_system()
+        self.base_dimensions = tuple(dimsys.base_dims)
+        self._position = {k: i for i, k in enumerate(self.base_dimensions)}
+        base_units = {}
+        for k in unit_system._base_units:
+            dim = unit_system.get_quantity_dimension(k)
+            base_units[dimsys.get_dimensional_dependencies(dim).popitem()[0]] \
+                = k
+        self.base_units = tuple(base_units[k] for k in self.base_dimensions)
+        self._base_scales = [unit_system.get_quantity_scale_factor(k)
+                             for k in self.base_units]
+        self._table = {}
+        self._names = {}
+        self._ambiguous = {}
+        # Names of the `sympy.physics.units` module come first (`u.g` is
+        # the gram, `u.h` the hour). Other quantity names and abbreviations
+        # are only used if they denote a single quantity.
+        for name in dir(u):
+            q = getattr(u, name)
+            if isinstance(q, Quantity) and self._add(q):
+                self._names[name] = q
+        candidates = {}
+        for q in list(self._table) + list(unit_system._units):
+            if isinstance(q, Quantity) and self._add(q):
+                for name in (q.name.name, q.abbrev.name):
+                    candidates.setdefault(name, set()).add(q)
+        for name, qs in candidates.items():
+            if name in self._names:
+                continue
+            if len(qs) == 1:
+                self._names[name] = qs.pop()
+            else:
+                self._ambiguous[name] = qs
+        self.aliases = {}
+        if aliases is not None:
+            for sym, q in aliases.items():
+                self.aliases[sympify(sym)] = q
+
+    @classmethod
+    def for_system(cls, unit_system='SI'):
+        """
+        Returns the cached table for a unit system, building it the first
+        time it is requested.
+        """
+        key = unit_system if isinstance(unit_system, str) else \
+            unit_system.name
+        table = cls._tables.get(key, None)
+        if table is None:
+            table = cls(unit_system)
+            cls._tables[key] = table
+        return table
+
+    def __repr__(self):
+        return 'UnitTable(%s, %d units)' % (self.unit_system.name,
+                                            len(self._table))
+
+    @property
+    def dimensionless(self):
+        """
+        The dimension vector of a pure number.
+        """
+        return (0,)*len(self.base_dimensions)
+
+    def _add(self, q):
+        """Adds a quantity to the table. Returns `False` if the unit system
+        does not define it.
+        """
+        if q not in self._table:
+            entry = self._entry(q)
+            if entry is None:
+                return False
+            self._table[q] = entry
+        return True
+
+    def _entry(self, q):
+        """Computes the (scale, dimension vector) entry for a quantity or
+        returns `None` if the unit system does not define it.
+        """
+        system = self.unit_system
+        dimsys = system.get_dimension_system()
+        try:
+            deps = dimsys.get_dimensional_dependencies(
+                system.get_quantity_dimension(q))
+        except (TypeError, ValueError, KeyError):
+            return None
+        dims = [0]*len(self.base_dimensions)
+        for dim, power in deps.items():
+            if dim not in self._position or not power.is_integer:
+                return None
+            dims[self._position[dim]] = int(power)
+        scale = system.get_quantity_scale_factor(q)
+        for base, power in zip(self._base_scales, dims):
+            scale = scale/base**power
+        if not scale.is_number:
+            return None
+        return float(scale), tuple(dims)
+
+    def lookup(self, unit):
+        """
+        Returns `(scale, dimension vector)` for a quantity, an aliased symbol
+        or a symbol declared with `units()`, or `None` if `unit` is not a
+        known unit. Raises `ValueError` for a declared symbol whose name is
+        the name or abbreviation of several quantities.
+        """
+        from sympy import Symbol
+        from sympy.physics.units import Quantity
+        entry = self._table.get(unit, None)
+        if entry is not None:
+            return entry
+        if isinstance(unit, Quantity):
+            entry = self._entry(unit)
+            if entry is not None:
+                self._table[unit] = entry
+            return entry
+        if isinstance(unit, Symbol):
+            from algebra_with_sympy.algebraic_equation import _declared_units
+            q = self.aliases.get(unit, None)
+            if q is None and unit in _declared_units:
+                q = self._names.get(unit.name, None)
+                if q is None and unit.name in self._ambiguous:
+                    raise ValueError(
+                        'The unit name %s could stand for any of %s. Use '
+                        'the quantity itself or pass `aliases`.' % (
+                            unit.name, ', '.join(sorted(
+                                str(k) for k in
+                                self._ambiguous[unit.name]))))
+            if q is not None:
+                return self.lookup(q)
+        return None
+
+    def base_unit_expr(self, dims):
+        """
+        Returns the product of base units with the exponents in `dims`.
+        """
+        expr = S.One
+        for unit, power in zip(self.base_units, dims):
+            expr *= unit**power
+        return expr
+
+    def split(self, expr, values=None):
+        """
+        Replaces every unit in `expr` by its scale factor and returns the
+        resulting expression together with the dimension vector of `expr`.
+        The work is done in one pass over the expression tree.
+
+        Parameters
+        ==========
+        expr: a sympy expression.
+        values: optional dict mapping symbols to `(expression, dimension
+            vector)` pairs that are used in place of the symbol.
+
+        Raises `ValueError` if terms of a sum have different dimensions or a
+        function is applied to an argument with dimensions.
+        """
+        return _Splitter(self, values).split(sympify(expr))
+
+
+def _add_dims(a, b):
+    return tuple(i + j for i, j in zip(a, b))
+
+
+def _scale_dims(a, power):
+    scaled = tuple(i*power for i in a)
+    if not all(sympify(k).is_integer for k in scaled):
+        raise ValueError('Non-integer power %s of a dimensional quantity.'
+                         % str(power))
+    return tuple(int(k) for k in scaled)
+
+
+class _Splitter():
+    """Does the bottom-up work of `UnitTable.split()`, memoizing repeated
+    subexpressions.
+    """
+
+    def __init__(self, table, values=None):
+        self.table = table
+        self.values = values or {}
+        self.memo = {}
+
+    def split(self, expr):
+        result = self.memo.get(expr, None)
+        if result is None:
+            result = self._split(expr)
+            self.memo[expr] = result
+        return result
+
+    def _split(self, expr):
+        from sympy import Add, Mul, Pow, Abs, Symbol
+        from sympy.physics.units import Quantity
+        none = self.table.dimensionless
+        if expr in self.values:
+            return self.values[expr]
+        if expr.is_Number or expr.is_NumberSymbol:
+            return expr, none
+        if isinstance(expr, (Quantity, Symbol)):
+            entry = self.table.lookup(expr)
+            if entry is not None:
+                return Float(entry[0]), entry[1]
+            return expr, none
+        if isinstance(expr, Add):
+            parts = [self.split(k) for k in expr.args]
+            dims = None
+            for term, (num, d) in zip(expr.args, parts):
+                if num == 0:
+                    continue
+                if dims is None:
+                    dims = d
+                elif d != dims:
+                    raise ValueError('Terms with different dimensions are '
+                                     'added in ' + str(expr) + '.')
+            return Add(*[k[0] for k in parts]), dims or none
+        if isinstance(expr, Mul):
+            parts = [self.split(k) for k in expr.args]
+            dims = none
+            for num, d in parts:
+                dims = _add_dims(dims, d)
+            return Mul(*[k[0] for k in parts]), dims
+        if isinstance(expr, Pow):
+            base, bdims = self.split(expr.base)
+            exp, edims = self.split(expr.exp)
+            if edims != none:
+                raise ValueError('The exponent of ' + str(expr) +
+                                 ' has dimensions.')
+            if bdims == none:
+                return base**exp, none
+            if not exp.is_number:
+                raise ValueError('Symbolic power of a dimensional quantity'
+                                 ' in ' + str(expr) + '.')
+            return base**exp, _scale_dims(bdims, exp)
+        if isinstance(expr, Abs):
+            num, dims = self.split(expr.args[0])
+            return Abs(num), dims
+        parts = [self.split(k) for k in expr.args]
+        for num, d in parts:
+            if d != none:
+                raise ValueError('The argument of ' + str(expr) +
+                                 ' has dimensions.')
+        return expr.func(*[k[0] for k in parts]), none
+
+
+def _unit_values(table, subs):
+    """Splits the values substituted for symbols once so they can be shared
+    by every expression they appear in.
+    """
+    values = {}
+    if subs is not None:
+        splitter = _Splitter(table)
+        for k, v in subs.items():
+            values[sympify(k)] = splitter.split(sympify(v))
+    return values
+
+
+def _convert(table, num, dims, to):
+    """Returns `(numeric expression, unit expression)` expressing `num`
+    (in base units with dimensions `dims`) in the unit `to`, or in base
+    units if `to` is `None`.
+    """
+    if to is None:
+        return num, table.base_unit_expr(dims)
+    to_num, to_dims = table.split(sympify(to))
+    if to_dims != dims:
+        raise ValueError('Cannot convert a quantity with dimensions ' +
+                         str(table.base_unit_expr(dims)) + ' to ' + str(to) +
+                         '.')
+    return num/to_num, sympify(to)
+
+
+def evalf_units(eqn, n=15, subs=None, to=None, unit_system='SI'):
+    """
+    Numerically evaluates an `Equation` (or expression) containing units,
+    converting all units by table lookup.
+
+    Parameters
+    ==========
+    eqn: an `Equation` or expression.
+    n: number of significant digits (default 15).
+    subs: optional dict of values (which may carry units) to substitute.
+    to: optional unit for the result. Default is the base units of the
+        unit system.
+    unit_system: the name of a sympy unit system or a `UnitTable`.
+
+    A side that is left with unknown symbols that carry no units (e.g. the
+    `p` in `p = n*R*T/V`) is evaluated but not converted. Raises
+    `ValueError` if both sides carry units and their dimensions differ, or
+    if `to` is not compatible with them.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> from sympy.physics.units import atmosphere, liter, joule, mole, kelvin
+    >>> p, V, n, R, T = symbols('p V n R T')
+    >>> eq = Eqn(p, n*R*T/V)
+    >>> evalf_units(eq, 5, subs={n: 1*mole, R: 8.314*joule/mole/kelvin,
+    ...                          T: 273*kelvin, V: 22.4*liter}, to=atmosphere)
+    Equation(p, 1.0*atmosphere)
+    """
+    table = unit_system if isinstance(unit_system, UnitTable) else \
+        UnitTable.for_system(unit_system)
+    values = _unit_values(table, subs)
+    splitter = _Splitter(table, values)
+    if not isinstance(eqn, Equation):
+        num, dims = splitter.split(sympify(eqn))
+        num, unit = _convert(table, num, dims, to)
+        return num.evalf(n)*unit
+    sides = [splitter.split(eqn.lhs), splitter.split(eqn.rhs)]
+    known = [(num, dims) for num, dims in sides
+             if not (num.free_symbols and dims == table.dimensionless)]
+    if len(known) == 2 and known[0][1] != known[1][1] and \
+            known[0][0] != 0 and known[1][0] != 0:
+        raise ValueError('The two sides of ' + str(eqn) + ' have different '
+                         'dimensions.')
+    results = []
+    for num, dims in sides:
+        if num.free_symbols and dims == table.dimensionless:
+            # an unknown: dimensions cannot be assigned
+            results.append(num.evalf(n))
+            continue
+        num, unit = _convert(table, num, dims, to)
+        results.append(num.evalf(n)*unit)
+    return Equation(*results)
+
+
+def lambdify_units(args, eqn, arg_units=None, side='rhs', to=None,
+                   unit_system='SI', modules=None):
+    """
+    Compiles one side (or the residual) of an `Equation` containing units
+    into a fast numerical function.
+
+    The arguments of the function are plain numbers (or arrays) in the units
+    given by `arg_units`. All unit conversions are folded into float
+    constants when the function is generated, so calls cost no more than
+    for an equation without units. The result is the number of `to` units
+    (base units of the unit system if `to` is `None`).
+
+    Parameters
+    ==========
+    args: the symbols that become the arguments of the function.
+    eqn: an `Equation` or expression.
+    arg_units: optional dict mapping arguments to their units. Arguments
+        not listed are dimensionless.
+    side: 'lhs', 'rhs' (default) or 'residual'.
+    to: optional unit for the result.
+    unit_system: the name of a sympy unit system or a `UnitTable`.
+    modules: as for `lambdify()`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> from sympy.physics.units import atmosphere, liter, joule, mole, kelvin
+    >>> p, V, n, T = symbols('p V n T')
+    >>> eq = Eqn(p, n*8.314*joule/mole/kelvin*T/V)
+    >>> f = lambdify_units((n, T, V), eq, to=atmosphere,
+    ...                    arg_units={n: mole, T: kelvin, V: liter})
+    >>> round(f(1, 273, 22.4), 4)
+    1.0
+    """
+    from sympy.utilities.lambdify import lambdify
+    table = unit_system if isinstance(unit_system, UnitTable) else \
+        UnitTable.for_system(unit_system)
+    if not hasattr(args, '__iter__'):
+        args = [args]
+    values = {}
+    for k in args:
+        unit = S.One if arg_units is None else arg_units.get(k, S.One)
+        scale, dims = table.split(sympify(unit))
+        values[k] = (k*scale, dims)
+    splitter = _Splitter(table, values)
+    if not isinstance(eqn, Equation):
+        num, dims = splitter.split(sympify(eqn))
+    elif side in ('lhs', 'rhs'):
+        num, dims = splitter.split(getattr(eqn, side))
+    elif side == 'residual':
+        num, dims = splitter.split(eqn.lhs - eqn.rhs)
+    else:
+        raise ValueError('`side` must be "lhs", "rhs" or "residual".')
+    num = _convert(table, num, dims, to)[0]
+    return lambdify(args, num, modules=modules)
+
+
+class _DimensionChecker():
+    """Propagates dimension vectors bottom-up through expressions, visiting
+    each distinct subexpression once and recording every place where
+    dimensions do not match. A dimension of `None` means unknown (a symbol
+    with no declared units) and matches anything.
+    """
+
+    def __init__(self, table, symbol_units=None, strict=False):
+        self.table = table
+        self.strict = strict
+        self.memo = {}
+        self.mismatches = []
+        self.known = {}
+        if symbol_units is not None:
+            for sym, unit in symbol_units.items():
+                self.known[sympify(sym)] = table.split(sympify(unit))[1]
+
+    def _flag(self, expr, dims):
+        self.mismatches.append((expr, [None if k is None else
+                                       self.table.base_unit_expr(k)
+                                       for k in dims]))
+
+    def dims(self, expr):
+        if expr in self.memo:
+            return self.memo[expr]
+        result = self._dims(expr)
+        self.memo[expr] = result
+        return result
+
+    def _dims(self, expr):
+        from sympy import Add, Mul, Pow, Abs, Symbol
+        from sympy.physics.units import Quantity
+        none = self.table.dimensionless
+        if expr in self.known:
+            return self.known[expr]
+        if expr.is_Number or expr.is_NumberSymbol:
+            return none
+        if isinstance(expr, (Quantity, Symbol)):
+            entry = self.table.lookup(expr)
+            if entry is not None:
+                return entry[1]
+            return none if self.strict else None
+        if isinstance(expr, Equation):
+            parts = [self.dims(expr.lhs), self.dims(expr.rhs)]
+            self._compare(expr, [k for k, side in zip(parts, expr.args)
+                                 if side != 0])
+            return None
+        if isinstance(expr, Add):
+            parts = [self.dims(k) for k in expr.args]
+            return self._compare(expr, parts)
+        if isinstance(expr, Mul):
+            dims = none
+            for k in expr.args:
+                d = self.dims(k)
+                if d is None:
+                    dims = None
+                elif dims is not None:
+                    dims = _add_dims(dims, d)
+            return dims
+        if isinstance(expr, Pow):
+            bdims = self.dims(expr.base)
+            edims = self.dims(expr.exp)
+            if edims is not None and edims != none:
+                self._flag(expr, [edims])
+                return None
+            if bdims is None or bdims == none:
+                return bdims
+            if not expr.exp.is_number:
+                self._flag(expr, [bdims])
+                return None
+            try:
+                return _scale_dims(bdims, expr.exp)
+            except ValueError:
+                self._flag(expr, [bdims])
+                return None
+        if isinstance(expr, Abs):
+            return self.dims(expr.args[0])
+        parts = [self.dims(k) for k in expr.args]
+        bad = [k for k in parts if k is not None and k != none]
+        if bad:
+            self._flag(expr, bad)
+        return none
+
+    def _compare(self, expr, parts):
+        """Flags `expr` if its known parts have different dimensions and
+        returns their common dimension (or `None` if unknown).
+        """
+        known = [k for k in parts if k is not None]
+        if len(set(known)) > 1:
+            self._flag(expr, parts)
+            # do not report the same problem again further up the tree
+            return None
+        if len(known) < len(parts):
+            return None
+        return known[0] if known else None
+
+
+def dimension_mismatches(eqn, symbol_units=None, unit_system='SI',
+                         strict=False):
+    """
+    Finds the places where an `Equation` (or expression) combines
+    quantities with incompatible dimensions.
+
+    Dimensions are propagated bottom-up through the expression tree as
+    vectors of integer exponents of the base dimensions, visiting each
+    distinct subexpression once, so the cost is linear in the size of the
+    expression and no simplification is done. Units may be
+    `sympy.physics.units` quantities or symbols declared with `units()`
+    (see `UnitTable`).
+
+    Symbols that are not units have unknown dimensions, which are compatible
+    with anything, unless their units are given in `symbol_units` or
+    `strict=True`, in which case they are dimensionless.
+
+    Parameters
+    ==========
+    eqn: an `Equation`, expression or iterable of them.
+    symbol_units: optional dict mapping symbols to their units.
+    unit_system: the name of a sympy unit system or a `UnitTable`.
+    strict: treat symbols that are not units as dimensionless.
+
+    Returns
+    =======
+    A list of `(expr, dimensions)` tuples, one for each subexpression (a sum,
+    an equation, a function argument or a power) where the dimensions
+    of the parts listed in `dimensions` disagree. `None` marks an unknown
+    dimension. An empty list means no inconsistency was found.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> from sympy.physics.units import meter, second, kilogram
+    >>> x, v, t = symbols('x v t')
+    >>> su = {x: meter, v: meter/second, t: second}
+    >>> dimension_mismatches(Eqn(x, v*t), su)
+    []
+    >>> dimension_mismatches(Eqn(x, v*t + v), su)
+    [(t*v + v, [meter/second, meter])]
+    >>> dimension_mismatches(Eqn(x*kilogram, v*t))
+    []
+    >>> dimension_mismatches(Eqn(x*kilogram, v*t), strict=True)
+    [(Equation(kilogram*x, t*v), [kilogram, 1])]
+    """
+    table = unit_system if isinstance(unit_system, UnitTable) else \
+        UnitTable.for_system(unit_system)
+    checker = _DimensionChecker(table, symbol_units, strict)
+    if isinstance(eqn, Equation) or not hasattr(eqn, '__iter__'):
+        eqn = [eqn]
+    for k in eqn:
+        checker.dims(sympify(k))
+    return checker.mismatches
+
+
+def dimensionally_consistent(eqn, symbol_units=None, unit_system='SI',
+                             strict=False):
+    """
+    Returns `True` if `dimension_mismatches()` finds nothing wrong with
+    `eqn`, `False` otherwise. Takes the same arguments.
+    """
+    return len(dimension_mismatches(eqn, symbol_units, unit_system,
+                                    strict)) == 0
@@ -0,0 +1,1041 @@
+"""
+Numerical evaluation of `Equation` objects.
+
+These tools turn equations into fast numerical functions (by default
+vectorized NumPy functions when NumPy is installed) while keeping track of
+which part of the equation is being evaluated.
+"""
+from sympy import Equation
+
+__all__ = ['lambdify', 'sweep', 'EvaluationPlan', 'EvaluatorCache',
+           'evalf_batch', 'lambdify_solutions']
+
+_compiled_cache = {}
+_COMPILED_CACHE_SIZE = 256
+_namespace_cache = {}
+
+
+def _cache_put(cache, key, value, size):
+    """Stores `value` in a dict used as a cache, dropping the oldest entry
+    if the cache already holds `size` items.
+    """
+    if len(cache) >= size:
+        del cache[next(iter(cache))]
+    cache[key] = value
+    return value
+
+
+def _hashable(obj):
+    """Converts lists (and nested lists) of module specifications or
+    arguments to tuples so they can be part of a cache key.
+    """
+    if isinstance(obj, (list, tuple)):
+        return tuple(_hashable(k) for k in obj)
+    if isinstance(obj, dict):
+        return tuple(sorted((str(k), _hashable(v)) for k, v in obj.items()))
+    return obj
+
+
+def _equation_part(eqn, side='residual', solve_for=None):
+    """Returns the expression (or tuple of expressions, one per solution
+    branch) to be evaluated for `eqn`.
+    """
+    if solve_for is not None:
+        from sympy.solvers.solvers import solve
+        solns = solve(eqn.lhs - eqn.rhs, solve_for)
+        if len(solns) == 0:
+            raise ValueError('Unable to solve ' + str(eqn) + ' for ' +
+                             str(solve_for) + '.')
+        if len(solns) == 1:
+            return solns[0]
+        return tuple(solns)
+    if side == 'residual':
+        return eqn.lhs - eqn.rhs
+    if side in ('lhs', 'rhs'):
+        return getattr(eqn, side)
+    raise ValueError('`side` must be "residual", "lhs" or "rhs".')
+
+
+def lambdify(args, expr, modules=None, side='residual', solve_for=None,
+             **kwargs):
+    """
+    Extension of sympy `lambdify()` that accepts an `Equation`.
+
+    Anything other than an `Equation` is passed straight to sympy
+    `lambdify()`. For an `Equation` the function returned evaluates:
+
+    * the residual `lhs - rhs` (`side='residual'`, the default);
+    * the lhs or rhs (`side='lhs'` or `side='rhs'`);
+    * the equation solved for a symbol (`solve_for=symbol`). If there is
+      more than one solution the function returns a tuple with one result
+      per solution branch.
+
+    The argument order is always the explicit `args`, as for sympy
+    `lambdify()`. Compiled functions for equations are cached by the
+    expression being compiled, the arguments and the `lambdify` options, so
+    asking again for the same function does not repeat code generation (or
+    the call to `solve()` when `solve_for` is used). If
+    `algwsym_config.numerics.compile_cache_dir` is set, compiled functions
+    are also stored on disk (see `EvaluatorCache`) and reused by later
+    Python sessions.
+
+    Parameters
+    ==========
+    args: the arguments of the generated function, as for sympy
+        `lambdify()`.
+    expr: an `Equation` or anything accepted by sympy `lambdify()`.
+    modules: as for sympy `lambdify()`. The default uses NumPy if it is
+        installed.
+    side: 'residual', 'lhs' or 'rhs'.
+    solve_for: optional symbol to solve the equation for.
+    kwargs: passed on to sympy `lambdify()`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, c = symbols('a b c')
+    >>> eq = Eqn(a*b, c)
+    >>> lambdify((a, b, c), eq)(2, 3, 5)
+    1
+    >>> lambdify((a, b, c), eq, side='lhs')(2, 3, 5)
+    6
+    >>> lambdify((b, c), eq, solve_for=a)(2, 5)
+    2.5
+    """
+    from sympy.utilities.lambdify import lambdify as sympy_lambdify
+    if not isinstance(expr, Equation):
+        return sympy_lambdify(args, expr, modules=modules, **kwargs)
+    key = (expr, _hashable(args), side, solve_for, _hashable(modules),
+           _hashable(kwargs))
+    func = _compiled_cache.get(key, None)
+    if func is None:
+        disk = EvaluatorCache.from_config()
+        if disk is not None:
+            diskkey = disk.key(expr, args, side, solve_for, modules, kwargs)
+            func = disk.load(diskkey, modules)
+        if func is None:
+            func = sympy_lambdify(args, _equation_part(expr, side,
+                                                       solve_for),
+                                  modules=modules, **kwargs)
+            if disk is not None:
+                disk.store(diskkey, func)
+        _cache_put(_compiled_cache, key, func, _COMPILED_CACHE_SIZE)
+    return func
+
+
+class EvaluatorCache():
+    """
+    A directory of compiled numerical functions that persists between
+    Python sessions.
+
+    Each entry is keyed by a SHA-256 hash of the `srepr()` of the equation,
+    the `srepr()` of the arguments, the options passed to `lambdify()` and
+    the sympy version. The generated source is stored in `<key>.py` and the
+    compiled bytecode in `<key>.<python cache tag>.bin`, so loading an entry
+    skips both the symbolic work and code generation. Bytecode from another
+    Python version is ignored and the source is recompiled instead. When
+    the total size of the directory exceeds `max_size` bytes, the least
+    recently used entries are removed.
+
+    `lambdify()` uses the cache automatically when
+    `algwsym_config.numerics.compile_cache_dir` is set to a directory. The
+    size limit is `algwsym_config.numerics.compile_cache_size`.
+
+    Parameters
+    ==========
+    directory: the cache directory. It is created if necessary.
+    max_size: the maximum total size of the cache in bytes.
+    """
+
+    def __init__(self, directory, max_size=100*2**20):
+        import os
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls):
+        """
+        Returns the cache selected by `algwsym_config` or `None` if disk
+        caching is off.
+        """
+        from algebra_with_sympy.algebraic_equation import algwsym_config
+        directory = getattr(algwsym_config.numerics, 'compile_cache_dir',
+                            None)
+        if not isinstance(directory, str):
+            return None
+        return cls(directory, algwsym_config.numerics.compile_cache_size)
+
+    def key(self, expr, args, side='residual', solve_for=None, modules=None,
+            options=None):
+        """
+        Returns the stable hash used as the file name of an entry.
+        """
+        import hashlib
+        import sympy
+        from sympy import srepr
+        if not hasattr(args, '__iter__'):
+            args = [args]
+        text = '|'.join([srepr(expr), srepr(tuple(args)), str(side),
+                         srepr(solve_for), repr(_hashable(modules)),
+                         repr(_hashable(options or {})), sympy.__version__])
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        import os
+        import sys
+        base = os.path.join(self.directory, key)
+        return base + '.py', base + '.' + sys.implementation.cache_tag + \
+            '.bin'
+
+    def _write(self, path, data):
+        """Writes `data` (`str` or `bytes`) to `path` atomically: it is
+        written to a temporary file in the cache directory that then
+        replaces `path`, so other processes see either no entry or a
+        complete one.
+        """
+        import os
+        import tempfile
+        fd, tmppath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb' if isinstance(data, bytes) else 'w') \
+                    as f:
+                f.write(data)
+            os.replace(tmppath, path)
+        except BaseException:
+            try:
+                os.remove(tmppath)
+            except OSError:
+                pass
+            raise
+
+    def _discard(self, key):
+        """Removes the files of an entry, if present."""
+        import os
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load(self, key, modules=None):
+        """
+        Returns the function stored under `key` or `None` if there is no
+        usable entry. Unreadable or corrupt entries are removed.
+        """
+        import linecache
+        import marshal
+        import os
+        from sympy.utilities.lambdify import lambdify as sympy_lambdify
+        srcpath, codepath = self._paths(key)
+        filename = '<algwsym-cached-' + key[:16] + '>'
+        try:
+            with open(srcpath, 'r') as f:
+                source = f.read()
+        except OSError:
+            return None
+        try:
+            code = None
+            try:
+                with open(codepath, 'rb') as f:
+                    code = marshal.load(f)
+            except (OSError, EOFError, ValueError, TypeError):
+                code = None
+            if code is None:
+                code = compile(source, filename, 'exec')
+                self._write(codepath, marshal.dumps(code))
+            # The namespace of module translations is the same for every
+            # function lambdified with the same modules.
+            modkey = _hashable(modules)
+            if modkey not in _namespace_cache:
+                _namespace_cache[modkey] = sympy_lambdify(
+                    (), 0, modules=modules).__globals__
+            namespace = dict(_namespace_cache[modkey])
+            exec(code, namespace)
+        except (SyntaxError, ValueError, EOFError, OSError):
+            self._discard(key)
+            return None
+        func = namespace.get('_lambdifygenerated', None)
+        if func is None or not set(func.__code__.co_names) <= set(namespace):
+            return None
+        linecache.cache[filename] = (len(source), None,
+                                     source.splitlines(True), filename)
+        for path in (srcpath, codepath):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return func
+
+    def store(self, key, func):
+        """
+        Saves the source and bytecode of a function generated by sympy
+        `lambdify()` under `key`. Functions whose source is not available
+        are not stored. The files are replaced atomically, so processes
+        storing and loading the same entry concurrently do not see partly
+        written files.
+        """
+        import inspect
+        import marshal
+        try:
+            source = inspect.getsource(func)
+        except (OSError, TypeError):
+            return
+        srcpath, codepath = self._paths(key)
+        filename = '<algwsym-cached-' + key[:16] + '>'
+        code = marshal.dumps(compile(source, filename, 'exec'))
+        try:
+            # the bytecode first: an entry is only looked up by its source
+            self._write(codepath, code)
+            self._write(srcpath, source)
+        except OSError:
+            return
+        self.evict()
+
+    def _entries(self):
+        import os
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                # being written by some process
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    @property
+    def size(self):
+        """
+        The total size in bytes of the files in the cache.
+        """
+        return sum(k[1] for k in self._entries())
+
+    def evict(self):
+        """
+        Removes the least recently used files until the cache is no larger
+        than `max_size`.
+        """
+        import os
+        entries = self._entries()
+        total = sum(k[1] for k in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # already removed by another process
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        import os
+        for mtime, size, path in self._entries():
+            os.remove(path)
+
+
+def _solution_rows(solns):
+    """Returns the list of solution equations in a `solve()` result (a
+    `FiniteSet` or list of equations, or of sets of equations) in order.
+    """
+    rows = []
+    for k in solns:
+        if isinstance(k, Equation):
+            rows.append(k)
+        else:
+            rows.extend(_solution_rows(k))
+    return rows
+
+
+def _sweep_function(expr, syms, side, solve_for):
+    """Returns the compiled function and number of result rows used by
+    `sweep()`.
+    """
+    if isinstance(expr, Equation):
+        part = _equation_part(expr, side, solve_for)
+        nrows = len(part) if isinstance(part, tuple) else 1
+        return lambdify(syms, expr, side=side, solve_for=solve_for), nrows
+    rows = tuple(k.rhs for k in _solution_rows(expr))
+    if len(rows) == 0:
+        raise ValueError('There are no solutions to sweep over.')
+    if len(rows) == 1:
+        return lambdify(syms, rows[0]), 1
+    return lambdify(syms, rows), len(rows)
+
+
+def sweep(expr, params, chunksize=65536, side='residual', solve_for=None,
+          out=None, dtype=None):
+    """
+    Evaluates an `Equation` or a `solve()` solution set over the grid formed
+    by all combinations of the parameter values, a fixed-size chunk at a
+    time, so memory use does not depend on the size of the grid.
+
+    The grid is traversed in C (row-major) order of its flattened index. By
+    default a generator is returned that yields `(indices, values)` for each
+    chunk, where `indices` is the `slice` of the flattened grid covered by
+    the chunk. If `out` is a file name, the results are instead written to a
+    memory-mapped `.npy` file of the grid's shape and the memory-mapped
+    array is returned.
+
+    For an `Equation`, what is evaluated is selected by `side` and
+    `solve_for` exactly as in `lambdify()`. For a solution set the rhs of
+    every solution equation is evaluated. When there is more than one
+    result per grid point (several solution branches) `values` has one
+    row per branch, and the output file has a leading branch axis.
+
+    Requires NumPy.
+
+    Parameters
+    ==========
+    expr: an `Equation` or the result of `solve()`.
+    params: a dict mapping each free symbol to a one-dimensional array of
+        values. The order of the dict is the order of the grid axes.
+    chunksize: the number of grid points evaluated at once.
+    side, solve_for: as for `lambdify()`.
+    out: optional file name for a memory-mapped `.npy` output.
+    dtype: optional dtype of the output file. Defaults to the dtype of the
+        first chunk evaluated.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, c = symbols('a b c')
+    >>> for idx, vals in sweep(Eqn(c, a*b), {a: [1, 2], b: [1, 2, 3]},
+    ...                        chunksize=4, solve_for=c):
+    ...     print(idx, vals)
+    slice(0, 4, None) [1 2 3 2]
+    slice(4, 6, None) [4 6]
+    """
+    import numpy as np
+    syms = tuple(params.keys())
+    axes = [np.asarray(params[k]) for k in syms]
+    shape = tuple(len(k) for k in axes)
+    func, nrows = _sweep_function(expr, syms, side, solve_for)
+    chunks = _sweep_chunks(func, nrows, axes, shape, int(chunksize))
+    if out is None:
+        return chunks
+    from numpy.lib.format import open_memmap
+    result = None
+    for indices, values in chunks:
+        if result is None:
+            rshape = shape if nrows == 1 else (nrows,) + shape
+            result = open_memmap(out, mode='w+', shape=rshape,
+                                 dtype=values.dtype if dtype is None
+                                 else dtype)
+            flat = result.reshape(rshape[:-len(shape)] + (-1,))
+        flat[..., indices] = values
+    if result is None:
+        # empty grid: nothing was evaluated to take the dtype from
+        rshape = shape if nrows == 1 else (nrows,) + shape
+        result = open_memmap(out, mode='w+', shape=rshape,
+                             dtype=float if dtype is None else dtype)
+    result.flush()
+    return result
+
+
+def _sweep_chunks(func, nrows, axes, shape, chunksize):
+    """Generator doing the work of `sweep()`."""
+    import numpy as np
+    total = int(np.prod(shape))
+    for start in range(0, total, chunksize):
+        stop = min(start + chunksize, total)
+        idx = np.unravel_index(np.arange(start, stop), shape)
+        values = func(*(ax[i] for ax, i in zip(axes, idx)))
+        n = stop - start
+        if nrows == 1:
+            values = np.broadcast_to(np.asarray(values), (n,))
+        else:
+            values = np.stack([np.broadcast_to(np.asarray(k), (n,))
+                               for k in values])
+        yield slice(start, stop), values
+
+
+def _solution_branches(solns):
+    """Returns the solution branches of a `solve()` result as a list of
+    lists of equations. A flat set of equations is one branch per equation
+    if they all solve for the same symbol and a single branch (one
+    solution of a system) if their lhs are all different.
+    """
+    if isinstance(solns, Equation):
+        return [[solns]]
+    solns = list(solns)
+    if not solns:
+        return []
+    if all(isinstance(k, Equation) for k in solns):
+        lhs = [k.lhs for k in solns]
+        if len(set(lhs)) == 1:
+            return [[k] for k in solns]
+        if len(set(lhs)) == len(lhs):
+            return [solns]
+        raise ValueError('Cannot tell the solution branches apart; pass '
+                         'a set of sets of equations.')
+    return [_solution_rows(k) if not isinstance(k, Equation) else [k]
+            for k in solns]
+
+
+def lambdify_solutions(args, solns, unknowns=None, mask=True, check=None,
+                       tol=1e-9, modules=None):
+    """
+    Compiles every branch of a `solve()` result into one vectorized
+    function of `args` that returns a branch-by-sample array.
+
+    The right-hand sides of all branches are passed to `cse()` together,
+    so subexpressions shared by several branches (the discriminant of a
+    quadratic, say) are computed once per call. The function broadcasts
+    its arguments against each other and returns an array of shape
+    `(branches,) + shape` for a single unknown, or
+    `(branches, len(unknowns)) + shape` for a system; an unknown that a
+    branch does not determine is NaN.
+
+    With `mask=True` (the default) the arguments are evaluated as complex
+    numbers and a branch is set to NaN at every sample where any of its
+    values is non-finite or has an imaginary part larger than `tol`
+    relative to its magnitude; the real part is returned otherwise. With
+    `check` (an `Equation` or list of them, usually the equations that
+    were solved) a branch is also masked where the equations do not hold
+    to within the relative tolerance `tol` for its values, which removes
+    spurious solutions. Requires NumPy.
+
+    Parameters
+    ==========
+    args: the symbols the function takes, in order.
+    solns: a `solve()` result: a set (or list) of solution equations for
+        one unknown, a set of sets of equations for a system, or a single
+        equation.
+    unknowns: the order of the unknowns for a system. Defaults to the
+        sorted lhs of the solutions.
+    mask: whether to mask complex and invalid values.
+    check: equations that the solutions must satisfy.
+    tol: relative tolerance for the masks.
+    modules: as for sympy `lambdify()`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, x = symbols('a b x')
+    >>> f = lambdify_solutions((a, b), solve(Eqn(x**2 + a*x, b), x))
+    >>> f(1, [2, 6, -1])
+    array([[-2., -3., nan],
+           [ 1.,  2., nan]])
+    >>> f = lambdify_solutions(a, solve(Eqn(sqrt(x), a), x),
+    ...                        check=Eqn(sqrt(x), a))
+    >>> f([-2, 2])
+    array([[nan,  4.]])
+    """
+    from sympy import S, cse
+    from sympy.core.sorting import default_sort_key
+    from sympy.utilities.lambdify import lambdify as sympy_lambdify
+    branches = _solution_branches(solns)
+    if not branches:
+        raise ValueError('There are no solutions to evaluate.')
+    if unknowns is None:
+        unknowns = sorted({k.lhs for b in branches for k in b},
+                          key=default_sort_key)
+    elif not hasattr(unknowns, '__iter__'):
+        unknowns = [unknowns]
+    unknowns = list(unknowns)
+    if check is not None and isinstance(check, Equation):
+        check = [check]
+    args = tuple(args) if hasattr(args, '__iter__') else (args,)
+    key = ('solutions', tuple(tuple(b) for b in branches), args,
+           tuple(unknowns), mask, None if check is None else tuple(check),
+           tol, _hashable(modules))
+    func = _compiled_cache.get(key, None)
+    if func is not None:
+        return func
+    exprs = []
+    for branch in branches:
+        values = {k.lhs: k.rhs for k in branch}
+        exprs.extend(values.get(k, S.NaN) for k in unknowns)
+    plan = cse(exprs)
+    values = sympy_lambdify(args, exprs, modules=modules,
+                            cse=lambda e: plan)
+    residuals = None
+    if check is not None:
+        sides = []
+        for eqn in check:
+            sides.extend((eqn.lhs, eqn.rhs))
+        residuals = sympy_lambdify(args + tuple(unknowns), sides,
+                                   modules=modules, cse=True)
+    func = _cache_put(_compiled_cache, key,
+                      _solution_function(values, residuals, len(branches),
+                                         len(unknowns), mask, tol),
+                      _COMPILED_CACHE_SIZE)
+    return func
+
+
+def _solution_function(values, residuals, nbranches, nunknowns, mask, tol):
+    """Returns the vectorized function built by `lambdify_solutions()`."""
+    import numpy as np
+
+    def solutions(*args):
+        if mask:
+            args = [np.asarray(k, dtype=complex) for k in args]
+        else:
+            args = [np.asarray(k) for k in args]
+        with np.errstate(all='ignore'):
+            flat = np.broadcast_arrays(*values(*args), *args)
+            shape = flat[0].shape
+            result = np.stack(flat[:nbranches*nunknowns]).reshape(
+                (nbranches, nunknowns) + shape)
+            valid = np.ones((nbranches,) + shape, dtype=bool)
+            if mask:
+                bad = ~np.isfinite(result) | (np.abs(result.imag) >
+                                              tol*np.maximum(1,
+                                                             np.abs(result)))
+                valid &= ~bad.any(axis=1)
+                result = result.real
+            if residuals is not None:
+                for i in range(nbranches):
+                    sides = residuals(*args, *result[i])
+                    for lhs, rhs in zip(sides[0::2], sides[1::2]):
+                        lhs = np.asarray(lhs)
+                        rhs = np.asarray(rhs)
+                        scale = np.maximum(1, np.maximum(np.abs(lhs),
+                                                         np.abs(rhs)))
+                        valid[i] &= np.abs(lhs - rhs) <= tol*scale
+            if mask or residuals is not None:
+                result = np.where(valid[:, None], result, np.nan)
+        if nunknowns == 1:
+            return result[:, 0]
+        return result
+    return solutions
+
+
+def _flatten_equations(obj):
+    """Returns a flat list of the equations in an `Equation`, iterable or
+    `solve()` result together with a template used by `_rebuild()` to
+    restore the original structure.
+    """
+    from sympy import FiniteSet
+    if isinstance(obj, Equation):
+        return [obj], None
+    flat = []
+    template = []
+    for k in obj:
+        items, sub = _flatten_equations(k)
+        flat.extend(items)
+        template.append(sub)
+    return flat, (isinstance(obj, FiniteSet), template)
+
+
+def _rebuild(template, items):
+    """Inverse of `_flatten_equations()`: puts equations from the iterator
+    `items` back into the structure described by `template`.
+    """
+    if template is None:
+        return next(items)
+    from sympy import FiniteSet
+    is_set, children = template
+    rebuilt = [_rebuild(sub, items) for sub in children]
+    if is_set:
+        return FiniteSet(*rebuilt)
+    return rebuilt
+
+
+class EvaluationPlan():
+    """
+    A joint common-subexpression elimination of every side of a group of
+    equations, used to evaluate them without repeating shared work.
+
+    Both sides of every equation (an `Equation`, an iterable of them or a
+    `solve()` result, including the `FiniteSet` of `FiniteSet` form) are
+    passed together to `cse()`, so subexpressions shared between the lhs
+    and rhs of one equation, or between different equations and solution
+    branches, are computed once. The plan can then be evaluated
+    numerically (`evalf`), with values substituted (`subs`) or compiled to
+    a single numerical function (`lambdify`). The results of `evalf` and
+    `subs` have the same structure as the input.
+
+    `ops_before` and `ops_after` report the operation count (`count_ops()`)
+    of the sides evaluated independently and of the plan, respectively.
+
+    Parameters
+    ==========
+    equations: an `Equation`, iterable of equations or `solve()` result.
+    kwargs: passed on to `cse()` (e.g. `optimizations='basic'`).
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, x = symbols('a b x')
+    >>> plan = EvaluationPlan(solve(Eqn(x**2 + a*x, b), x))
+    >>> plan.replacements
+    [(x0, a/2), (x1, sqrt(a**2 + 4*b)/2)]
+    >>> plan.ops_before > plan.ops_after
+    True
+    >>> plan.evalf(4, subs={a: 1, b: 2})
+    FiniteSet(Equation(x, -2.000), Equation(x, 1.000))
+    """
+
+    def __init__(self, equations, **kwargs):
+        from sympy import cse, count_ops
+        self.equations, self._template = _flatten_equations(equations)
+        sides = []
+        for k in self.equations:
+            sides.extend((k.lhs, k.rhs))
+        self.replacements, self.reduced = cse(sides, **kwargs)
+        self.ops_before = sum(count_ops(k) for k in sides)
+        self.ops_after = (sum(count_ops(v) for s, v in self.replacements) +
+                          sum(count_ops(k) for k in self.reduced))
+
+    def __repr__(self):
+        return ('EvaluationPlan(%d equations, %d shared subexpressions, '
+                'ops %d -> %d)' % (len(self.equations),
+                                   len(self.replacements), self.ops_before,
+                                   self.ops_after))
+
+    @property
+    def savings(self):
+        """
+        The fraction of operations removed by the plan.
+        """
+        if self.ops_before == 0:
+            return 0
+        return 1 - self.ops_after/self.ops_before
+
+    def _assemble(self, sides):
+        eqns = iter(Equation(sides[k], sides[k + 1])
+                    for k in range(0, len(sides), 2))
+        return _rebuild(self._template, eqns)
+
+    def _run(self, values, transform):
+        """Substitutes `values` into each shared subexpression in order,
+        applying `transform` once to each, and then into the reduced sides.
+        """
+        values = dict(values)
+        for sym, expr in self.replacements:
+            values[sym] = transform(expr.xreplace(values))
+        return [transform(k.xreplace(values)) for k in self.reduced]
+
+    def subs(self, *args, **kwargs):
+        """
+        Substitutes into the equations, visiting every shared subexpression
+        once. Takes the same arguments as `Equation.subs`. Returns the
+        equations in the structure they were provided in.
+        """
+        return self._assemble(self._run({}, lambda e: e.subs(*args,
+                                                             **kwargs)))
+
+    def evalf(self, n=15, subs=None, **kwargs):
+        """
+        Numerically evaluates the equations, evaluating every shared
+        subexpression once. Takes the same arguments as `Equation.evalf`.
+        Returns the equations in the structure they were provided in.
+        """
+        from sympy import sympify
+        values = {}
+        if subs is not None:
+            values = {sympify(k): sympify(v) for k, v in subs.items()}
+        return self._assemble(self._run(values,
+                                        lambda e: e.evalf(n, **kwargs)))
+
+    def lambdify(self, args, side='both', modules=None, **kwargs):
+        """
+        Compiles the whole plan into one numerical function of `args`,
+        computing every shared subexpression once per call. The function
+        returns a list with one entry per equation, in the order of
+        `.equations`. Each entry is a `(lhs, rhs)` tuple for `side='both'`
+        (the default), the value of that side for `side='lhs'` or
+        `side='rhs'`, or `lhs - rhs` for `side='residual'`. Use
+        `side='rhs'` for solution sets, whose lhs are the unknowns.
+        """
+        from sympy.utilities.lambdify import lambdify as sympy_lambdify
+        lhs = self.reduced[0::2]
+        rhs = self.reduced[1::2]
+        if side == 'both':
+            exprs = list(self.reduced)
+        elif side == 'lhs':
+            exprs = list(lhs)
+        elif side == 'rhs':
+            exprs = list(rhs)
+        elif side == 'residual':
+            exprs = [l - r for l, r in zip(lhs, rhs)]
+        else:
+            raise ValueError('`side` must be "both", "lhs", "rhs" or '
+                             '"residual".')
+        plan = (self.replacements, exprs)
+        flat = sympy_lambdify(args, exprs, modules=modules,
+                              cse=lambda exprs: plan, **kwargs)
+        if side != 'both':
+            return flat
+
+        def evaluate(*values):
+            sides = flat(*values)
+            return list(zip(sides[0::2], sides[1::2]))
+        evaluate.__doc__ = flat.__doc__
+        return evaluate
+
+
+class _SharedValues():
+    """Numerical values of the shared subexpressions of an
+    `EvaluationPlan`, computed lazily and memoized per precision.
+    """
+
+    def __init__(self, replacements, subs):
+        self.replacements = replacements
+        self.defs = dict(replacements)
+        self.subs = subs
+        self.levels = {}
+
+    def values(self, expr, digits):
+        """Returns a substitution dict with the values of every shared
+        subexpression `expr` depends on at `digits` precision.
+        """
+        level = self.levels.setdefault(digits, dict(self.subs))
+        needed = set()
+        stack = [k for k in expr.free_symbols if k in self.defs]
+        while stack:
+            sym = stack.pop()
+            if sym in needed or sym in level:
+                continue
+            needed.add(sym)
+            stack.extend(k for k in self.defs[sym].free_symbols
+                         if k in self.defs)
+        if needed:
+            for sym, definition in self.replacements:
+                if sym in needed:
+                    level[sym] = definition.xreplace(level).evalf(digits)
+        return level
+
+    def evaluate(self, expr, digits):
+        return expr.xreplace(self.values(expr, digits)).evalf(digits)
+
+
+def _evalf_number(result, prec):
+    """Converts a `(re, im, re_acc, im_acc)` tuple from sympy's internal
+    `evalf()` to a number rounded to at most `prec` bits, as `Expr.evalf`
+    does. Returns the number and its accuracy in bits.
+    """
+    from sympy import Float, I, S
+    if result is S.ComplexInfinity:
+        return result, prec
+    re, im, re_acc, im_acc = result
+    if re is S.NaN or im is S.NaN:
+        return S.NaN, prec
+    value, acc = S.Zero, prec
+    if re:
+        value = Float._new(re, max(min(prec, re_acc), 1))
+        acc = min(acc, re_acc)
+    if im:
+        value += I*Float._new(im, max(min(prec, im_acc), 1))
+        acc = min(acc, im_acc)
+    return value, acc
+
+
+def _map_chunks(func, items, workers, *args):
+    """Divides the list `items` into `workers` strided chunks, calls
+    `func(chunk, *args)` (which returns one result per item of the chunk)
+    for each in a process pool and returns the results in the order of
+    `items`. Strided chunks even out the work when the cost of the items
+    varies along the list.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    chunks = [items[k::workers] for k in range(workers)]
+    chunks = [k for k in chunks if k]
+    with ProcessPoolExecutor(len(chunks)) as pool:
+        futures = [pool.submit(func, k, *args) for k in chunks]
+        done = [k.result() for k in futures]
+    results = [None]*len(items)
+    for k, chunk in enumerate(done):
+        results[k::len(chunks)] = chunk
+    return results
+
+
+class _Expired(BaseException):
+    """Raised by the timer of `_run_within()`. Not an `Exception`, so that
+    sympy code catching errors does not swallow it.
+    """
+
+
+def _can_interrupt():
+    """`True` if `_run_within()` can interrupt a call: it uses `SIGALRM`,
+    which is only available on Unix, in the main thread and while no other
+    timer is running.
+    """
+    import signal
+    import threading
+    return hasattr(signal, 'setitimer') and \
+        threading.current_thread() is threading.main_thread() and \
+        not signal.getitimer(signal.ITIMER_REAL)[0]
+
+
+def _run_within(seconds, func, *args, **kwargs):
+    """Calls `func(*args, **kwargs)` and interrupts it after `seconds`
+    seconds. Returns `(result, True)`, or `(None, False)` if it was
+    interrupted. The call is not limited if `seconds` is `None` or
+    `_can_interrupt()` is `False`.
+    """
+    if seconds is None or not _can_interrupt():
+        return func(*args, **kwargs), True
+    if seconds <= 0:
+        return None, False
+    import signal
+
+    def expired(signum, frame):
+        raise _Expired()
+    previous = signal.signal(signal.SIGALRM, expired)
+    try:
+        try:
+            signal.setitimer(signal.ITIMER_REAL, seconds)
+            return func(*args, **kwargs), True
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except _Expired:
+        return None, False
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _worth_sharing(exprs):
+    """`True` if repeated subexpressions make up a fifth or more of the
+    operations in `exprs`. Otherwise evaluating them again costs less than
+    finding them with `cse()`.
+    """
+    from sympy import preorder_traversal
+    seen = set()
+    distinct = repeated = 0
+    stack = list(exprs)
+    while stack:
+        expr = stack.pop()
+        if not expr.args:
+            continue
+        if expr in seen:
+            repeated += sum(1 for k in preorder_traversal(expr) if k.args)
+            continue
+        seen.add(expr)
+        distinct += 1
+        stack.extend(expr.args)
+    return 4*repeated >= distinct > 0
+
+
+def _evalf_batch_serial(equations, n, subs, guard, maxn):
+    """Evaluates a flat list of equations, evaluating the subexpressions
+    they share once. Returns the list of evaluated equations.
+    """
+    from mpmath.libmp import dps_to_prec
+    from sympy import cse
+    try:
+        from sympy.core.evalf import evalf as evalf_tuple
+    except ImportError:
+        evalf_tuple = None
+    sides = []
+    for k in equations:
+        sides.extend((k.lhs, k.rhs))
+    replacements, reduced = [], sides
+    if _worth_sharing(sides):
+        replacements, reduced = cse(sides, order='none')
+    # sympy's evalf evaluates a symbol found in `subs` once per call and
+    # precision and tracks its accuracy like any other subexpression, so
+    # with the shared subexpressions in `subs` and one `options` dict for
+    # the whole batch each is evaluated once (again only if an item needs
+    # it at a higher precision).
+    defs = dict(subs)
+    numeric = set(subs)
+    for sym, definition in replacements:
+        defs[sym] = definition
+        if definition.free_symbols <= numeric:
+            numeric.add(sym)
+    prec = dps_to_prec(n)
+    maxprec = dps_to_prec(maxn)
+    options = {'maxprec': maxprec, 'chop': False, 'strict': False,
+               'verbose': False, 'subs': defs}
+    if evalf_tuple is not None:
+        # evaluating the shared subexpressions first with some margin lets
+        # the slightly higher precisions asked for by e.g. powers reuse them
+        working = dps_to_prec(n + guard) + 32
+        for sym, definition in replacements:
+            if sym in numeric:
+                try:
+                    evalf_tuple(sym, working, options)
+                except NotImplementedError:
+                    pass
+    shared = None
+    values = []
+    for expr in reduced:
+        value = None
+        if expr.free_symbols <= numeric:
+            if evalf_tuple is None:
+                value = expr.evalf(n, subs=defs)
+            working = dps_to_prec(n + guard)
+            while value is None:
+                try:
+                    value, acc = _evalf_number(
+                        evalf_tuple(expr, working, options), prec)
+                except NotImplementedError:
+                    break
+                if acc < prec and working < maxprec:
+                    # cancellation beyond what evalf compensated for:
+                    # only this item is evaluated again
+                    value, working = None, min(2*working, maxprec)
+        if value is None:
+            # not a number: substitute the values of the shared
+            # subexpressions it contains
+            if shared is None:
+                shared = _SharedValues(replacements, subs)
+            value = shared.evaluate(expr, n + guard).evalf(n)
+        values.append(value)
+    return [Equation(values[k], values[k + 1])
+            for k in range(0, len(values), 2)]
+
+
+def evalf_batch(equations, n=15, subs=None, guard=10, maxn=None,
+                workers=None):
+    """
+    Numerically evaluates a collection of equations to `n` significant
+    digits, sharing work between them.
+
+    Every side of every equation is put through one common subexpression
+    elimination, so subexpressions that appear in several places are
+    evaluated once for the whole batch, with the substitutions in `subs`
+    applied once. Evaluation uses sympy's `evalf()` machinery, which tracks
+    the accuracy of every intermediate result and raises the working
+    precision (up to `maxn` digits) only for the items and shared
+    subexpressions that lose accuracy by cancellation, so hard cases do not
+    slow down the rest of the batch.
+
+    Parameters
+    ==========
+    equations: an `Equation`, iterable of equations (e.g. a list or an
+        `EquationSystem`) or a `solve()` result.
+    n: the number of significant digits wanted (default 15).
+    subs: optional dict of values to substitute before evaluation.
+    guard: extra working digits (default 10).
+    maxn: the largest working precision tried. Default `10*n + guard`.
+    workers: if an integer greater than 1, the equations are divided into
+        that many groups evaluated in parallel in a process pool. Sharing
+        of subexpressions then happens within each group.
+
+    Returns
+    =======
+    The evaluated equations in the same structure as `equations` (a list
+    for iterables other than `FiniteSet`).
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, x = symbols('a x')
+    >>> evalf_batch(solve(Eqn(x**2, a), x), 30, subs={a: 2})
+    FiniteSet(Equation(x, -1.41421356237309504880168872421), Equation(x, 1.41421356237309504880168872421))
+    """
+    from sympy import sympify
+    flat, template = _flatten_equations(equations)
+    values = {}
+    if subs is not None:
+        values = {sympify(k): sympify(v) for k, v in subs.items()}
+    if maxn is None:
+        maxn = 10*n + guard
+    if workers is None or workers < 2 or len(flat) < 2:
+        results = _evalf_batch_serial(flat, n, values, guard, maxn)
+    else:
+        results = _map_chunks(_evalf_batch_serial, flat, workers, n, values,
+                              guard, maxn)
+    return _rebuild(template, iter(results))
@@ -0,0 +1,167 @@
+"""
+Integration that races several of sympy's integration algorithms.
+
+Depending on the integrand one of sympy's algorithms (`manual`, `risch`,
+`meijerg`, `heurisch`) may finish in milliseconds while another runs for
+minutes. `race_integrate()` first gives plain `integrate()` a short time in
+the calling process, which is enough for most integrals, and only if that
+fails runs the algorithms at the same time in separate processes and keeps
+the first one that succeeds.
+"""
+import time
+
+from sympy import Equation, Integral, Tuple, sympify
+
+__all__ = ['race_integrate']
+
+_integral_cache = {}
+_INTEGRAL_CACHE_SIZE = 256
+_METHODS = ('manual', 'risch', 'meijerg', 'heurisch')
+
+
+def _quick_integrate(expr, limits, budget):
+    """Runs plain `integrate()` in this process for at most `budget`
+    seconds and returns the result, or `None` if it raised an error or ran
+    out of time. Where the call cannot be interrupted (see
+    `evaluation._can_interrupt()`) nothing is tried and `None` is returned.
+    """
+    from sympy import integrate
+    from algebra_with_sympy.evaluation import _can_interrupt, _run_within
+    if not budget or not _can_interrupt():
+        return None
+    try:
+        return _run_within(budget, integrate, expr, *limits)[0]
+    except Exception:
+        return None
+
+
+def _integrate_worker(queue, method, expr, limits):
+    """Runs one integration algorithm and reports `(method, result)`, with
+    `None` as result if the algorithm raised an error.
+    """
+    from sympy import integrate
+    try:
+        result = integrate(expr, *limits, **{method: True})
+    except Exception:
+        result = None
+    queue.put((method, result))
+
+
+def _solved(result):
+    return result is not None and not result.has(Integral)
+
+
+def _race(expr, limits, methods, deadline):
+    """Starts one process per method and returns the first result free of
+    unevaluated integrals. If there is none before `deadline` (or all
+    methods finished without one) returns the first partial result
+    received, or `None`. Processes still running are terminated.
+    """
+    import multiprocessing
+    import queue as queue_module
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_integrate_worker,
+                                     args=(results, method, expr, limits),
+                                     daemon=True) for method in methods]
+    for proc in procs:
+        proc.start()
+    partial = None
+    try:
+        for k in range(len(procs)):
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+            try:
+                method, result = results.get(timeout=remaining)
+            except queue_module.Empty:
+                break
+            if _solved(result):
+                return result
+            if partial is None and result is not None:
+                partial = result
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+        results.close()
+    return partial
+
+
+def race_integrate(f, *limits, side=None, timeout=10, methods=_METHODS,
+                   quick=0.2):
+    """
+    Integrates `f` by running several of sympy's integration algorithms in
+    parallel worker processes and keeping the first result that contains
+    no unevaluated integral.
+
+    Starting the processes takes far longer than integrating most simple
+    integrands, so plain `integrate()` is first tried in the calling
+    process for `quick` seconds (where `SIGALRM` is available, i.e. in the
+    main thread on Unix); the processes are only started if that does not
+    give a result without unevaluated integrals.
+
+    Results are cached by integrand, limits and methods, so repeating an
+    integration (e.g. while redoing steps of a derivation) is instant. If
+    no algorithm succeeds within `timeout` seconds the remaining workers
+    are stopped and a partial result from an algorithm that finished is
+    returned, or the unevaluated `Integral` if there is none. Such results
+    are not cached.
+
+    Parameters
+    ==========
+    f: an expression or an `Equation`. As with `integrate()`, for an
+        `Equation` one side must be chosen with `side='lhs'` or
+        `side='rhs'` and the integral of that side is returned. To
+        integrate both sides use `eqn.apply(race_integrate, x)`.
+    limits: as for `integrate()`: symbols or `(symbol, a, b)` tuples.
+    timeout: seconds to wait for a successful algorithm (`None` for no
+        limit).
+    methods: names of the `integrate()` algorithm flags to race (default
+        `('manual', 'risch', 'meijerg', 'heurisch')`).
+    quick: seconds for the first attempt in the calling process (`0` or
+        `None` to always race). This counts towards `timeout`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, c, x = symbols('a b c x')
+    >>> q = Eqn(a*c, b/c)
+    >>> race_integrate(q, b, side='rhs')
+    b**2/(2*c)
+    >>> Eqn(x, exp(-x**2)).apply(race_integrate, (x, 0, oo))
+    Equation(oo, sqrt(pi)/2)
+    """
+    if isinstance(f, Equation):
+        if side not in ('lhs', 'rhs'):
+            raise ValueError('You must specify `side="lhs"` or `side="rhs"` '
+                             'when integrating an Equation')
+        f = getattr(f, side)
+    expr = sympify(f)
+    limits = tuple(Tuple(*k) if isinstance(k, (tuple, list)) else
+                   sympify(k) for k in limits)
+    key = (expr, limits, tuple(methods))
+    result = _integral_cache.get(key, None)
+    if result is not None:
+        return result
+    deadline = None
+    if timeout is not None:
+        deadline = time.perf_counter() + timeout
+    if quick and timeout is not None:
+        quick = min(quick, timeout)
+    result = _quick_integrate(expr, limits, quick)
+    if not _solved(result):
+        partial = result
+        result = _race(expr, limits, methods, deadline)
+        if result is None:
+            result = partial
+    if not _solved(result):
+        if result is None:
+            result = Integral(expr, *limits)
+        return result
+    if len(_integral_cache) >= _INTEGRAL_CACHE_SIZE:
+        del _integral_cache[next(iter(_integral_cache))]
+    _integral_cache[key] = result
+    return result
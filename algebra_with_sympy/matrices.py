@@ -0,0 +1,344 @@
+"""
+Matrix-valued equations whose sides are stored as `DomainMatrix` objects.
+
+Storing the sides over a polynomial ring or field (rather than as matrices
+of general sympy expressions) means that row operations, multiplication by
+matrices and elimination are carried out with the fast domain arithmetic
+of `sympy.polys.matrices`.
+"""
+from sympy import Equation, Matrix, ImmutableMatrix, sympify
+from sympy.polys.matrices import DomainMatrix
+
+__all__ = ['MatrixEquation']
+
+
+def _as_domain_matrix(side):
+    """Converts a `DomainMatrix`, matrix or nested list to a
+    `DomainMatrix`.
+    """
+    if isinstance(side, DomainMatrix):
+        return side
+    return DomainMatrix.from_Matrix(Matrix(side))
+
+
+def _scalar(dm, c):
+    """Returns `dm` and the domain element for the sympy scalar `c`, with
+    the domain of `dm` enlarged if necessary to contain `c`.
+    """
+    c = sympify(c)
+    dm, cdm = dm.unify(DomainMatrix.from_list_sympy(1, 1, [[c]]))
+    return dm, cdm.to_dod()[0][0] if cdm.nnz() else dm.domain.zero
+
+
+class MatrixEquation():
+    """
+    An equation between two matrices of the same shape, `lhs = rhs`.
+
+    Both sides are stored as `DomainMatrix` objects over a common domain,
+    e.g. `ZZ[x,y]` for matrices of integer polynomials, so operations that
+    act on both sides at once (row operations, multiplication by a matrix,
+    multiplication by the inverse of a matrix, elimination) run at the
+    speed of domain-level matrix arithmetic rather than by manipulating
+    individual sympy expressions.
+
+    Parameters
+    ==========
+    lhs, rhs: `DomainMatrix`, `Matrix` or nested lists. Alternatively a
+        single `Equation` with matrix sides, or another `MatrixEquation`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y = symbols('x y')
+    >>> A = Matrix([[1, 2], [3, 4]])
+    >>> meq = MatrixEquation(A*Matrix([x, y]), Matrix([5, 6]))
+    >>> meq
+    MatrixEquation(Matrix([[x + 2*y], [3*x + 4*y]]), Matrix([[5], [6]]))
+    >>> meq.row_add(1, 0, -3)
+    MatrixEquation(Matrix([[x + 2*y], [-2*y]]), Matrix([[5], [-9]]))
+    >>> meq.left_divide(A)
+    MatrixEquation(Matrix([[x], [y]]), Matrix([[-4], [9/2]]))
+    >>> meq.solve(x, y)
+    FiniteSet(Equation(x, -4), Equation(y, 9/2))
+    >>> meq.to_equations()
+    [Equation(x + 2*y, 5), Equation(3*x + 4*y, 6)]
+    """
+
+    def __init__(self, lhs, rhs=None):
+        if rhs is None:
+            if isinstance(lhs, MatrixEquation):
+                lhs, rhs = lhs._lhs, lhs._rhs
+            elif isinstance(lhs, Equation):
+                lhs, rhs = lhs.lhs, lhs.rhs
+            else:
+                raise TypeError('MatrixEquation needs two sides or an '
+                                'Equation with matrix sides.')
+        lhs = _as_domain_matrix(lhs)
+        rhs = _as_domain_matrix(rhs)
+        if lhs.shape != rhs.shape:
+            raise ValueError('The sides of a MatrixEquation must have the '
+                             'same shape, not ' + str(lhs.shape) + ' and ' +
+                             str(rhs.shape) + '.')
+        self._lhs, self._rhs = lhs.unify(rhs)
+
+    @classmethod
+    def _new(cls, lhs, rhs):
+        new = cls.__new__(cls)
+        new._lhs, new._rhs = lhs.unify(rhs)
+        return new
+
+    @classmethod
+    def from_equations(cls, equations):
+        """
+        Builds a column-vector `MatrixEquation` with one row per scalar
+        `Equation` in `equations`.
+        """
+        equations = list(equations)
+        return cls(Matrix([k.lhs for k in equations]),
+                   Matrix([k.rhs for k in equations]))
+
+    def to_equations(self):
+        """
+        Returns a list of the scalar equations between corresponding entries
+        of the two sides, in row-major order.
+        """
+        return [Equation(l, r) for l, r in zip(self.lhs, self.rhs)]
+
+    def as_Equation(self):
+        """
+        Returns an `Equation` with immutable matrix sides.
+        """
+        return Equation(ImmutableMatrix(self.lhs), ImmutableMatrix(self.rhs))
+
+    @property
+    def lhs(self):
+        return self._lhs.to_Matrix()
+
+    @property
+    def rhs(self):
+        return self._rhs.to_Matrix()
+
+    @property
+    def domain(self):
+        """
+        The domain over which both sides are stored.
+        """
+        return self._lhs.domain
+
+    @property
+    def shape(self):
+        return self._lhs.shape
+
+    def __repr__(self):
+        def rows(M):
+            return 'Matrix(%s)' % repr(M.tolist())
+        return 'MatrixEquation(%s, %s)' % (rows(self.lhs), rows(self.rhs))
+
+    def __str__(self):
+        return str(self.lhs) + ' = ' + str(self.rhs)
+
+    def __eq__(self, other):
+        if not isinstance(other, MatrixEquation):
+            return NotImplemented
+        return self.lhs == other.lhs and self.rhs == other.rhs
+
+    def __hash__(self):
+        return hash((MatrixEquation, ImmutableMatrix(self.lhs),
+                     ImmutableMatrix(self.rhs)))
+
+    def _binary(self, other, op):
+        if isinstance(other, MatrixEquation):
+            a, b = self._lhs.unify(other._lhs)
+            c, d = self._rhs.unify(other._rhs)
+            return self._new(op(a, b), op(c, d))
+        other = _as_domain_matrix(other)
+        lhs, o1 = self._lhs.unify(other)
+        rhs, o2 = self._rhs.unify(other)
+        return self._new(op(lhs, o1), op(rhs, o2))
+
+    def __add__(self, other):
+        return self._binary(other, lambda a, b: a + b)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._binary(other, lambda a, b: a - b)
+
+    def __rsub__(self, other):
+        return self._binary(other, lambda a, b: b - a)
+
+    def __neg__(self):
+        return self._new(-self._lhs, -self._rhs)
+
+    def __mul__(self, other):
+        """Right-multiplies both sides by a matrix or scalar."""
+        if isinstance(other, MatrixEquation):
+            return NotImplemented
+        if _is_scalar(other):
+            return self.scale(other)
+        return self._binary(other, lambda a, b: a*b)
+
+    def __rmul__(self, other):
+        """Left-multiplies both sides by a matrix or scalar."""
+        if _is_scalar(other):
+            return self.scale(other)
+        return self._binary(other, lambda a, b: b*a)
+
+    # Let `Matrix * MatrixEquation` reach `__rmul__`.
+    _op_priority = 20
+
+    def scale(self, c):
+        """
+        Multiplies both sides by the scalar `c`.
+        """
+        lhs, c1 = _scalar(self._lhs, c)
+        rhs, c2 = _scalar(self._rhs, c)
+        return self._new(lhs.scalarmul(c1), rhs.scalarmul(c2))
+
+    def transpose(self):
+        return self._new(self._lhs.transpose(), self._rhs.transpose())
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def subs(self, *args, **kwargs):
+        """
+        Substitutes into both sides. Accepts the same arguments as
+        `Equation.subs`.
+        """
+        return MatrixEquation(self.lhs.subs(*args, **kwargs),
+                              self.rhs.subs(*args, **kwargs))
+
+    def _row_op(self, op):
+        """Applies `op(dod, domain)`, which modifies a dict-of-dicts
+        representation in place, to both sides.
+        """
+        sides = []
+        for side in (self._lhs, self._rhs):
+            dod = side.to_dod()
+            op(dod, side.domain)
+            sides.append(DomainMatrix.from_dod(dod, side.shape, side.domain))
+        return self._new(*sides)
+
+    def row_swap(self, i, j):
+        """
+        Swaps rows `i` and `j` of both sides.
+        """
+        def op(dod, K):
+            ri = dod.pop(i, None)
+            rj = dod.pop(j, None)
+            if ri:
+                dod[j] = ri
+            if rj:
+                dod[i] = rj
+        return self._row_op(op)
+
+    def row_scale(self, i, c):
+        """
+        Multiplies row `i` of both sides by the non-zero scalar `c`.
+        """
+        if sympify(c).is_zero:
+            raise ValueError('Scaling a row by zero is not reversible.')
+        eqn = self._new(*_scalar(self._lhs, c)[0].unify(self._rhs))
+        cK = _scalar(eqn._lhs, c)[1]
+
+        def op(dod, K):
+            row = dod.get(i, {})
+            for k in row:
+                row[k] = row[k]*cK
+        return eqn._row_op(op)
+
+    def row_add(self, i, j, c=1):
+        """
+        Adds `c` times row `j` to row `i` on both sides.
+        """
+        eqn = self._new(*_scalar(self._lhs, c)[0].unify(self._rhs))
+        cK = _scalar(eqn._lhs, c)[1]
+
+        def op(dod, K):
+            source = dod.get(j, {})
+            if not source or not cK:
+                return
+            target = dod.setdefault(i, {})
+            for k, v in source.items():
+                value = target.get(k, K.zero) + cK*v
+                if value:
+                    target[k] = value
+                else:
+                    target.pop(k, None)
+            if not target:
+                del dod[i]
+        return eqn._row_op(op)
+
+    def left_divide(self, M):
+        """
+        Multiplies both sides on the left by the inverse of the square
+        matrix `M`, computed by solving with an LU decomposition over the
+        field of fractions rather than by forming the inverse.
+        """
+        M = _as_domain_matrix(M)
+        if not M.is_square or M.shape[0] != self.shape[0]:
+            raise ValueError('Can only divide by a square matrix with as '
+                             'many rows as the sides.')
+        M, lhs = M.unify(self._lhs)
+        M, rhs = M.unify(self._rhs)
+        lhs, rhs = lhs.unify(rhs)
+        M = M.to_field()
+        return self._new(M.lu_solve(lhs.to_field()),
+                         M.lu_solve(rhs.to_field()))
+
+    def linear_system(self, *unknowns):
+        """
+        Writes the equation as `A*X = b` for the column vector `X` of
+        `unknowns`, assuming each entry is linear in them. Returns the
+        `DomainMatrix` objects `(A, b)`.
+        """
+        from sympy import linear_eq_to_matrix
+        exprs = [l - r for l, r in zip(self.lhs, self.rhs)]
+        A, b = linear_eq_to_matrix(exprs, list(unknowns))
+        return DomainMatrix.from_Matrix(A).unify(DomainMatrix.from_Matrix(b))
+
+    def eliminate(self, *unknowns):
+        """
+        Performs Gauss-Jordan elimination on the linear system in
+        `unknowns` (see `linear_system()`), returning the equivalent
+        column-vector `MatrixEquation` `R*X = c` with `R` in reduced row
+        echelon form.
+        """
+        A, b = self.linear_system(*unknowns)
+        R, _ = A.hstack(b).to_field().rref()
+        n = len(unknowns)
+        X = DomainMatrix.from_Matrix(Matrix(unknowns))
+        coeffs = R.extract(range(R.shape[0]), range(n))
+        coeffs, X = coeffs.unify(X)
+        return self._new(coeffs.matmul(X), R.extract(range(R.shape[0]),
+                                                     [n]))
+
+    def solve(self, *unknowns):
+        """
+        Solves the linear system in `unknowns` by elimination. Returns the
+        equations `unknown = value` packaged as by `solve()`. Unknowns that
+        are not determined are left free and do not get an equation; an
+        inconsistent system returns an empty result.
+        """
+        from algebra_with_sympy.systems import _wrap_equations
+        A, b = self.linear_system(*unknowns)
+        R, pivots = A.hstack(b).to_field().rref()
+        n = len(unknowns)
+        if n in pivots:
+            return _wrap_equations([])
+        R = R.to_Matrix()
+        eqns = []
+        for row, col in enumerate(pivots):
+            value = R[row, n] - sum(R[row, k]*unknowns[k]
+                                    for k in range(n) if k not in pivots)
+            eqns.append(Equation(unknowns[col], value))
+        return _wrap_equations(eqns)
+
+
+def _is_scalar(obj):
+    if isinstance(obj, (DomainMatrix, list, tuple)):
+        return False
+    obj = sympify(obj)
+    return not getattr(obj, 'is_Matrix', False)
@@ -0,0 +1,214 @@
+"""
+Deferred (lazy) application of chains of operations to an `Equation`.
+
+`eqn.lazy` returns an `EquationPipeline` that records `.apply`,
+`.applylhs`, `.applyrhs`, `.do`, `.dolhs` and `.dorhs` steps instead of
+carrying them out. `.compute()` then runs the recorded steps on each side
+without building an intermediate `Equation` after every step.
+"""
+import sympy
+from sympy import Equation
+
+__all__ = ['EquationPipeline']
+
+# Operations for which applying the same call twice in a row gives the same
+# result as applying it once.
+_idempotent = {'expand', 'factor', 'together', 'cancel', 'collect',
+               'simplify', 'trigsimp', 'powsimp', 'radsimp', 'expand_trig',
+               'expand_log', 'expand_power_exp', 'expand_power_base',
+               'logcombine', 'nsimplify', 'doit', 'evalf', 'n'}
+
+_step_cache = {}
+_STEP_CACHE_SIZE = 1024
+
+
+class _Step():
+    """One recorded operation. `name` is the name of an expression method
+    (`.do` steps) or `None` when `func` is to be applied as by
+    `Equation.apply()`.
+    """
+
+    def __init__(self, side, name, func, args, kwargs):
+        self.side = side
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        try:
+            self.key = (name, func, args, tuple(sorted(kwargs.items())))
+            hash(self.key)
+        except TypeError:
+            self.key = None
+
+    def __repr__(self):
+        what = self.name if self.name is not None else \
+            getattr(self.func, '__name__', repr(self.func))
+        return '%s(%s)' % (what, self.side)
+
+    def run(self, expr):
+        if self.name is not None:
+            method = getattr(expr, self.name, None)
+            if method is None:
+                raise AttributeError('Expressions in the equation have no '
+                                     'attribute `' + self.name + '`.')
+            return method(*self.args, **self.kwargs)
+        return Equation._applytoexpr(None, expr, self.func, *self.args,
+                                     **self.kwargs)
+
+    def same_call(self, other):
+        return self.key is not None and self.key == other.key
+
+
+class EquationPipeline():
+    """
+    A lazily evaluated chain of operations on an `Equation`, obtained from
+    `eqn.lazy`.
+
+    Each recorded step returns a new pipeline, so the usual chaining syntax
+    works. Nothing is computed until `.compute()` is called, which:
+
+    * runs the steps for the lhs and for the rhs as two independent chains,
+      building a single `Equation` at the end rather than one per step;
+    * drops a step that repeats the immediately preceding step on the same
+      side when the operation is idempotent (e.g. `.expand()` twice);
+    * computes a step only once when both sides are identical expressions,
+      and reuses the results of steps already computed on the same
+      expression (in this or earlier pipelines) from a cache.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, c, x = symbols('a b c x')
+    >>> poly = Eqn(a*x**2 + b*x + c*x**2, a*x**3 + b*x**3 + c*x)
+    >>> p = poly.lazy.do.expand().do.collect(x).dorhs.factor()
+    >>> p
+    EquationPipeline(Equation(a*x**2 + b*x + c*x**2, a*x**3 + b*x**3 + c*x), [expand(both), collect(both), factor(rhs)])
+    >>> p.compute()
+    Equation(b*x + x**2*(a + c), x*(a*x**2 + b*x**2 + c))
+    >>> p.compute() == poly.do.expand().do.collect(x).dorhs.factor()
+    True
+    """
+
+    def __init__(self, eqn, steps=()):
+        self.eqn = eqn
+        self.steps = tuple(steps)
+
+    def __repr__(self):
+        return 'EquationPipeline(%s, %s)' % (repr(self.eqn),
+                                             repr(list(self.steps)))
+
+    def _add(self, side, name, func, args, kwargs):
+        if side not in ('both', 'lhs', 'rhs'):
+            raise ValueError('`side` must be "both", "lhs" or "rhs".')
+        return EquationPipeline(self.eqn, self.steps +
+                                (_Step(side, name, func, args, kwargs),))
+
+    def apply(self, func, *args, side='both', **kwargs):
+        """
+        Records `Equation.apply(func, *args, side=side, **kwargs)`.
+        """
+        return self._add(side, None, func, args, kwargs)
+
+    def applylhs(self, func, *args, **kwargs):
+        """
+        Records `Equation.applylhs(func, *args, **kwargs)`.
+        """
+        return self._add('lhs', None, func, args, kwargs)
+
+    def applyrhs(self, func, *args, **kwargs):
+        """
+        Records `Equation.applyrhs(func, *args, **kwargs)`.
+        """
+        return self._add('rhs', None, func, args, kwargs)
+
+    class _sides:
+        """
+        Helper class for the `.do.`, `.dolhs.`, `.dorhs.` syntax on a
+        pipeline.
+        """
+
+        def __init__(self, pipeline, side='both'):
+            self.pipeline = pipeline
+            self.side = side
+
+        def __getattr__(self, name):
+            if name.startswith('__'):
+                raise AttributeError(name)
+            pipeline = self.pipeline
+            side = self.side
+
+            def method(*args, **kwargs):
+                return pipeline._add(side, name, None, args, kwargs)
+            return method
+
+    @property
+    def do(self):
+        return self._sides(self, side='both')
+
+    @property
+    def dolhs(self):
+        return self._sides(self, side='lhs')
+
+    @property
+    def dorhs(self):
+        return self._sides(self, side='rhs')
+
+    def _chain(self, side):
+        """The steps that apply to one side with repeated idempotent steps
+        removed.
+        """
+        chain = []
+        for step in self.steps:
+            if step.side not in ('both', side):
+                continue
+            if chain and step.same_call(chain[-1]) and \
+                    (step.name or getattr(step.func, '__name__', None)) in \
+                    _idempotent:
+                continue
+            chain.append(step)
+        return chain
+
+    @staticmethod
+    def _run(step, expr):
+        if step.key is None:
+            return step.run(expr)
+        key = (expr, step.key)
+        result = _step_cache.get(key, None)
+        if result is None:
+            result = step.run(expr)
+            if len(_step_cache) >= _STEP_CACHE_SIZE:
+                del _step_cache[next(iter(_step_cache))]
+            _step_cache[key] = result
+        return result
+
+    def compute(self):
+        """
+        Carries out the recorded steps and returns the resulting `Equation`.
+        """
+        lhs_chain = self._chain('lhs')
+        rhs_chain = self._chain('rhs')
+        lhs = self.eqn.lhs
+        rhs = self.eqn.rhs
+        n = 0
+        # Run the steps the two sides have in common together while the
+        # sides are identical, so each is computed once.
+        while (lhs is rhs or lhs == rhs) and n < min(len(lhs_chain),
+                                                     len(rhs_chain)) and \
+                lhs_chain[n] is rhs_chain[n]:
+            lhs = rhs = self._run(lhs_chain[n], lhs)
+            n += 1
+        for step in lhs_chain[n:]:
+            lhs = self._run(step, lhs)
+        for step in rhs_chain[n:]:
+            rhs = self._run(step, rhs)
+        return Equation(lhs, rhs)
+
+
+def __Equation__lazy__(self):
+    """
+    Returns an `EquationPipeline` that records operations on this equation
+    until `.compute()` is called.
+    """
+    return EquationPipeline(self)
+
+sympy.core.Equation.lazy = property(__Equation__lazy__)
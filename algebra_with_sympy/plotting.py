@@ -0,0 +1,342 @@
+"""
+Adaptive sampling of `Equation` objects for plotting.
+
+Equations are compiled once to vectorized NumPy functions (the compiled
+functions are cached by `lambdify()`, so replotting over a new range does
+not compile again) and sampled coarsely first. Points are then added only
+where the curve needs them: where it bends, changes sign, leaves its
+domain or jumps at a singularity. The samplers return plain arrays, so any
+plotting library can draw them; `plot_equation()` draws them with
+Matplotlib. Requires NumPy.
+"""
+from sympy import Equation, sympify
+
+__all__ = ['sample_equation', 'sample_implicit', 'plot_equation']
+
+
+def _real(values, shape):
+    """Broadcasts the result of a compiled function to `shape` as a float
+    array, with NaN wherever the value is complex or infinite.
+    """
+    import numpy as np
+    values = np.broadcast_to(np.asarray(values), shape)
+    if np.iscomplexobj(values):
+        values = np.where(values.imag == 0, values.real, np.nan)
+    values = values.astype(float)
+    return np.where(np.isfinite(values), values, np.nan)
+
+
+def _explicit_function(eqn, var, side, solve_for):
+    """Returns a function of an array of `var` values returning an array of
+    shape `(branches, len(x))`.
+    """
+    import numpy as np
+    from algebra_with_sympy.evaluation import lambdify
+    if isinstance(eqn, Equation):
+        func = lambdify(var, eqn, side=side, solve_for=solve_for)
+    else:
+        # as an equation so that the compiled function is cached
+        func = lambdify(var, Equation(sympify(eqn), 0), side='lhs')
+
+    def evaluate(x):
+        with np.errstate(all='ignore'):
+            values = func(x)
+        if isinstance(values, (tuple, list)):
+            return np.stack([_real(k, x.shape) for k in values])
+        return _real(values, x.shape)[None, :]
+    return evaluate
+
+
+def sample_equation(eqn, var, start, stop, n=64, tol=1e-3, max_depth=10,
+                    max_points=100000, side='rhs', solve_for=None,
+                    jump=0.5):
+    """
+    Adaptively samples a side of an `Equation` (by default the rhs, as for
+    `Eqn(y, f(x))`) as a function of `var` on `[start, stop]`.
+
+    Sampling starts with `n` equally spaced points. In each round every
+    interval is split in two if the value at its midpoint differs from the
+    straight line between its ends by more than `tol` times the range of
+    the values (high curvature), if the values change sign, or if the
+    value is undefined (NaN, e.g. outside the domain of a square root) at
+    some but not all of the three points. This stops after `max_depth`
+    rounds or once there are `max_points` points. Finally a NaN is inserted
+    in every interval containing a pole (where the values change sign with
+    a jump of more than `jump` times the range of the values, or the value
+    at the midpoint is that far outside the values at the ends, or a
+    sample is that far above or below both its neighbours), so the curve
+    is drawn with a gap there.
+
+    Parameters
+    ==========
+    eqn: an `Equation` or expression.
+    var: the independent variable.
+    start, stop: the sampled interval.
+    n: the number of initial points.
+    tol: the relative curvature tolerance.
+    max_depth: the maximum number of refinement rounds.
+    max_points: the maximum number of points.
+    side, solve_for: what to evaluate for an `Equation`, as for
+        `lambdify()`. If `solve_for` gives several solution branches they
+        are refined together.
+    jump: the relative size of a jump treated as a pole.
+
+    Returns
+    =======
+    `(x, y)`: the sample points and the values, with shape `(len(x),)` for
+    a single branch or `(branches, len(x))` otherwise.
+
+    Examples
+    ========
+    >>> import numpy
+    >>> from algebra_with_sympy import *
+    >>> x, y = symbols('x y')
+    >>> xs, ys = sample_equation(Eqn(y, 1/x), x, -1, 1)
+    >>> bool(numpy.isnan(ys).sum() == 1)
+    True
+    >>> xs, ys = sample_equation(Eqn(y, sin(1/x)), x, 0.01, 1)
+    >>> len(xs) > 500 and bool(numpy.diff(xs)[0] < numpy.diff(xs)[-1]/100)
+    True
+    """
+    import numpy as np
+    evaluate = _explicit_function(eqn, var, side, solve_for)
+    xs = np.linspace(float(start), float(stop), int(n))
+    ys = evaluate(xs)
+    # the range of the evenly spaced values, which are not crowded near
+    # poles as the later ones are
+    scale = _value_range(ys)
+    for depth in range(max_depth):
+        if len(xs) >= max_points:
+            break
+        mid = (xs[:-1] + xs[1:])/2
+        ym = evaluate(mid)
+        left, right = ys[:, :-1], ys[:, 1:]
+        with np.errstate(invalid='ignore'):
+            curved = np.abs(ym - (left + right)/2) > tol*scale
+            signs = np.sign(left)*np.sign(right) < 0
+        defined = np.isfinite(np.stack([left, ym, right]))
+        edge = defined.any(axis=0) & ~defined.all(axis=0)
+        refine = (curved | signs | edge).any(axis=0)
+        if not refine.any():
+            break
+        refine = np.flatnonzero(refine)[:max(max_points - len(xs), 0)]
+        xs = np.insert(xs, refine + 1, mid[refine])
+        ys = np.insert(ys, refine + 1, ym[:, refine], axis=1)
+    # a gap is left at poles: intervals across which the values change sign
+    # with a large jump, or whose midpoint value is far outside the values
+    # at the ends or undefined although they are not, and sample points
+    # far above or below both neighbours of the same sign
+    ym = evaluate((xs[:-1] + xs[1:])/2)
+    left, right = ys[:, :-1], ys[:, 1:]
+    with np.errstate(invalid='ignore'):
+        outside = np.maximum(ym - np.maximum(left, right),
+                             np.minimum(left, right) - ym) > jump*scale
+        crossing = (np.sign(left)*np.sign(right) < 0) & \
+            (np.abs(right - left) > jump*scale)
+        rise, fall = np.diff(ys[:, :-1], axis=1), np.diff(ys[:, 1:], axis=1)
+        same = (np.sign(ys[:, :-2]) == np.sign(ys[:, 1:-1])) & \
+            (np.sign(ys[:, 2:]) == np.sign(ys[:, 1:-1]))
+        spike = same & (np.sign(rise)*np.sign(fall) < 0) & \
+            (np.minimum(np.abs(rise), np.abs(fall)) > jump*scale)
+    ys[:, 1:-1][spike] = np.nan
+    undefined = ~np.isfinite(ym) & np.isfinite(left) & np.isfinite(right)
+    breaks = np.flatnonzero((outside | crossing | undefined).any(axis=0))
+    if len(breaks):
+        xs = np.insert(xs, breaks + 1, np.nan)
+        ys = np.insert(ys, breaks + 1, np.nan, axis=1)
+    if ys.shape[0] == 1:
+        return xs, ys[0]
+    return xs, ys
+
+
+def _value_range(values):
+    """A robust estimate of the range of the finite values (ignoring the
+    largest and smallest 5%, which may be near poles), or 1 if there are
+    none.
+    """
+    import numpy as np
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 1.0
+    low, high = np.percentile(finite, [5, 95])
+    return float(high - low) or float(np.abs(finite).max()) or 1.0
+
+
+def sample_implicit(eqn, x, y, xrange, yrange, n=32, max_depth=6):
+    """
+    Samples the curve on which an `Equation` `F(x, y) = G(x, y)` (or an
+    expression, taken as `expr = 0`) holds in the rectangle `xrange` by
+    `yrange`.
+
+    The residual `lhs - rhs` is compiled to a vectorized function and
+    evaluated at the corners and centres of an `n` by `n` grid of cells.
+    Only cells in which it changes sign (or which lie on the border of the
+    region where it is defined) are split into four, for `max_depth`
+    rounds, so the work is concentrated along the curve. In the final
+    cells the curve is located by linear interpolation along the cell
+    edges (marching squares), and pieces where the residual is not much
+    smaller on the curve than beside it (sign changes through a pole, such
+    as that of `1/x`) are dropped.
+
+    Parameters
+    ==========
+    eqn: an `Equation` or expression.
+    x, y: the variables of the horizontal and vertical axes.
+    xrange, yrange: `(min, max)` of each axis.
+    n: the number of cells along each axis of the initial grid.
+    max_depth: the number of times cells are split.
+
+    Returns
+    =======
+    An array of shape `(segments, 2, 2)` of line segments `((x0, y0), (x1,
+    y1))`, which can be drawn e.g. with Matplotlib's `LineCollection`.
+
+    Examples
+    ========
+    >>> import numpy
+    >>> from algebra_with_sympy import *
+    >>> x, y = symbols('x y')
+    >>> segments = sample_implicit(Eqn(x**2 + y**2, 1), x, y, (-2, 2), (-2, 2))
+    >>> radii = numpy.hypot(segments[..., 0], segments[..., 1])
+    >>> bool(numpy.abs(radii - 1).max() < 1e-4)
+    True
+    >>> len(sample_implicit(Eqn(1/x, 0), x, y, (-1, 1), (-1, 1)))
+    0
+    """
+    import numpy as np
+    from algebra_with_sympy.evaluation import lambdify
+    if not isinstance(eqn, Equation):
+        eqn = Equation(sympify(eqn), 0)
+    func = lambdify((x, y), eqn)
+
+    def F(xv, yv):
+        with np.errstate(all='ignore'):
+            return _real(func(xv, yv), np.broadcast(xv, yv).shape)
+
+    x0, x1 = (float(k) for k in xrange)
+    y0, y1 = (float(k) for k in yrange)
+    dx = (x1 - x0)/n
+    dy = (y1 - y0)/n
+    gx, gy = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    cx = x0 + dx*gx.ravel()
+    cy = y0 + dy*gy.ravel()
+    for depth in range(max_depth + 1):
+        corners = np.stack([F(cx, cy), F(cx + dx, cy), F(cx + dx, cy + dy),
+                            F(cx, cy + dy)], axis=-1)
+        centre = F(cx + dx/2, cy + dy/2)
+        positive = np.concatenate([corners, centre[:, None]], axis=-1) > 0
+        finite = np.isfinite(corners).all(axis=-1) & np.isfinite(centre)
+        crosses = positive.any(axis=-1) & ~positive.all(axis=-1)
+        border = np.isfinite(corners).any(axis=-1) & ~finite
+        if depth == max_depth:
+            keep = crosses & finite
+            cx, cy, corners, centre = cx[keep], cy[keep], corners[keep], \
+                centre[keep]
+            break
+        keep = crosses | border
+        cx, cy = cx[keep], cy[keep]
+        dx, dy = dx/2, dy/2
+        cx = np.concatenate([cx, cx + dx, cx, cx + dx])
+        cy = np.concatenate([cy, cy, cy + dy, cy + dy])
+    return _marching_squares(F, cx, cy, dx, dy, corners, centre)
+
+
+def _marching_squares(F, cx, cy, dx, dy, corners, centre):
+    """Returns the segments of the zero contour in the cells with lower
+    left corners `(cx, cy)` given the residual at their corners (in the
+    order lower left, lower right, upper right, upper left) and centres.
+    """
+    import numpy as np
+    empty = np.zeros((0, 2, 2))
+    if len(cx) == 0:
+        return empty
+    xs = np.stack([cx, cx + dx, cx + dx, cx], axis=-1)
+    ys = np.stack([cy, cy, cy + dy, cy + dy], axis=-1)
+    # edge k joins corner k and corner k + 1: bottom, right, top, left
+    fa, fb = corners, np.roll(corners, -1, axis=-1)
+    xa, xb = xs, np.roll(xs, -1, axis=-1)
+    ya, yb = ys, np.roll(ys, -1, axis=-1)
+    crossed = (fa > 0) != (fb > 0)
+    with np.errstate(all='ignore'):
+        t = np.where(crossed, fa/(fa - fb), 0)
+    points = np.stack([xa + t*(xb - xa), ya + t*(yb - ya)], axis=-1)
+    count = crossed.sum(axis=-1)
+    rows = np.arange(len(cx))
+    segments = []
+    two = count == 2
+    if two.any():
+        edges = np.argsort(~crossed[two], axis=-1, kind='stable')[:, :2]
+        r = rows[two]
+        segments.append(np.stack([points[r, edges[:, 0]],
+                                  points[r, edges[:, 1]]], axis=1))
+    four = count == 4
+    if four.any():
+        r = rows[four]
+        # if the centre has the sign of the lower left corner the lower
+        # right and upper left corners are cut off, otherwise the lower
+        # left and upper right ones
+        joined = (centre[four] > 0) == (corners[four, 0] > 0)
+        first = np.where(joined[:, None], [0, 1], [3, 0])
+        second = np.where(joined[:, None], [2, 3], [1, 2])
+        for pair in (first, second):
+            segments.append(np.stack([points[r, pair[:, 0]],
+                                      points[r, pair[:, 1]]], axis=1))
+    if not segments:
+        return empty
+    segments = np.concatenate(segments)
+    # drop crossings through poles: across a true crossing the residual is
+    # much smaller at the curve than a short distance to either side of it
+    mid = segments.mean(axis=1)
+    normal = np.stack([segments[:, 0, 1] - segments[:, 1, 1],
+                       segments[:, 1, 0] - segments[:, 0, 0]], axis=-1)
+    length = np.hypot(normal[:, 0], normal[:, 1])
+    with np.errstate(all='ignore'):
+        normal *= (max(dx, dy)/np.where(length > 0, length, 1))[:, None]
+        at = np.abs(F(mid[:, 0], mid[:, 1]))
+        beside = np.maximum(np.abs(F(*(mid + normal).T)),
+                            np.abs(F(*(mid - normal).T)))
+        keep = (at == 0) | (at <= beside/10)
+    return segments[keep]
+
+
+def plot_equation(eqn, xrange, yrange=None, ax=None, **kwargs):
+    """
+    Plots an `Equation` with Matplotlib using adaptive sampling.
+
+    With `xrange = (x, start, stop)` only, the rhs of the equation is
+    plotted as a function of `x` (see `sample_equation()`, to which
+    `side`, `solve_for` and the sampling options may be passed). With also
+    `yrange = (y, start, stop)`, the curve on which the equation holds is
+    plotted (see `sample_implicit()`, which takes `n` and `max_depth`).
+    Other keyword arguments are passed to Matplotlib. A sampling option
+    that the chosen sampler does not take raises a `TypeError`. Returns
+    the axes.
+    """
+    explicit_options = ('n', 'tol', 'max_depth', 'max_points', 'side',
+                        'solve_for', 'jump')
+    implicit_options = ('n', 'max_depth')
+    if yrange is None:
+        sampler, sample_options = 'sample_equation', explicit_options
+    else:
+        sampler, sample_options = 'sample_implicit', implicit_options
+    for k in explicit_options:
+        if k in kwargs and k not in sample_options:
+            raise TypeError('plot_equation() got the option %r, which '
+                            '%s() does not take' % (k, sampler))
+    options = {k: kwargs.pop(k) for k in sample_options if k in kwargs}
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    var, start, stop = xrange
+    if yrange is None:
+        xs, ys = sample_equation(eqn, var, start, stop, **options)
+        ax.plot(xs, ys.T, **kwargs)
+        return ax
+    from matplotlib.collections import LineCollection
+    yvar, ystart, ystop = yrange
+    segments = sample_implicit(eqn, var, yvar, (start, stop),
+                               (ystart, ystop), **options)
+    ax.add_collection(LineCollection(segments, **kwargs))
+    ax.set_xlim(float(start), float(stop))
+    ax.set_ylim(float(ystart), float(ystop))
+    return ax
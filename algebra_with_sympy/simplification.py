@@ -0,0 +1,222 @@
+"""
+Budgeted and memoized simplification of `Equation` objects.
+
+`sympy.simplify()` tries every strategy it knows on the whole expression,
+has no time limit and remembers nothing between calls. `budget_simplify()`
+instead picks the strategies likely to help from the content of each side,
+stops starting new strategies when its budget is spent and memoizes
+simplified subexpressions, so later steps of a derivation that contain
+them reuse the earlier work.
+"""
+import time
+
+from sympy import Equation, Basic, Set, Pow, exp, log, count_ops
+from sympy.functions.elementary.trigonometric import TrigonometricFunction
+from sympy.functions.elementary.hyperbolic import HyperbolicFunction
+
+__all__ = ['budget_simplify']
+
+_simplify_cache = {}
+_SIMPLIFY_CACHE_SIZE = 2048
+
+
+def _features(expr):
+    """Returns the set of content features of `expr` used to choose
+    simplification strategies.
+    """
+    features = set()
+    if expr.has(TrigonometricFunction, HyperbolicFunction):
+        features.add('trig')
+    if expr.has(exp):
+        features.add('exp')
+    if expr.has(log):
+        features.add('log')
+    for p in expr.atoms(Pow):
+        if p.exp.is_negative:
+            features.add('rational')
+        if not p.exp.is_Integer:
+            features.add('power')
+    return features
+
+
+def _strategies(features):
+    """The names of the strategies to try, cheapest and most likely to help
+    first, for expressions with `features`.
+    """
+    names = []
+    if 'rational' in features:
+        names += ['cancel', 'together']
+    if 'trig' in features:
+        names += ['trigsimp']
+        if 'exp' in features:
+            names += ['exptrigsimp']
+    if 'power' in features or 'exp' in features:
+        names += ['powsimp', 'powdenest']
+    if 'power' in features:
+        names += ['radsimp']
+    if 'log' in features:
+        names += ['logcombine']
+    names += ['factor', 'expand']
+    return names
+
+
+def _run_strategy(name, expr):
+    import sympy
+    if name == 'logcombine':
+        return sympy.logcombine(expr, force=False)
+    return getattr(sympy, name)(expr)
+
+
+def _reuse(expr, options):
+    """Replaces subexpressions of `expr` that have already been simplified
+    with the same `options` by their cached simplified forms.
+    """
+    hit = _simplify_cache.get((expr, options), None)
+    if hit is not None:
+        return hit
+    if expr.is_Atom or not expr.args or \
+            not all(isinstance(k, Basic) for k in expr.args):
+        return expr
+    args = tuple(_reuse(k, options) for k in expr.args)
+    if all(new is old for new, old in zip(args, expr.args)):
+        return expr
+    return expr.func(*args)
+
+
+class _Budget():
+    """Tracks the time left for one `budget_simplify()` call."""
+
+    def __init__(self, timeout):
+        self.deadline = None
+        if timeout is not None:
+            self.deadline = time.perf_counter() + timeout
+
+    @property
+    def left(self):
+        """Seconds left, or `None` without a deadline."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.perf_counter()
+
+    @property
+    def spent(self):
+        return self.deadline is not None and \
+            time.perf_counter() >= self.deadline
+
+
+def _simplify_expr(expr, budget, max_ops, measure):
+    """Simplifies one expression. Returns the result and whether every
+    applicable strategy was tried (only such results are cached, under the
+    expression together with the options that affect the result).
+    """
+    options = (max_ops, measure)
+    hit = _simplify_cache.get((expr, options), None)
+    if hit is not None:
+        return hit, True
+    if expr.is_Atom or not isinstance(expr, Basic):
+        return expr, True
+    best = _reuse(expr, options)
+    complete = True
+    if best.is_Add:
+        # Terms are the pieces most often carried unchanged from one step
+        # of a derivation to the next, so they are simplified (and cached)
+        # on their own before the sum as a whole.
+        terms = []
+        for term in best.args:
+            simpler, done = _simplify_expr(term, budget, max_ops, measure)
+            terms.append(simpler)
+            complete = complete and done
+        candidate = best.func(*terms)
+        if measure(candidate) <= measure(best):
+            best = candidate
+    best_ops = measure(best)
+    for name in _strategies(_features(best)):
+        if budget.spent:
+            complete = False
+            break
+        try:
+            candidate = _run_strategy(name, best)
+        except Exception:
+            continue
+        ops = measure(candidate)
+        if ops < best_ops:
+            best, best_ops = candidate, ops
+    if best_ops <= max_ops:
+        # last resort: every strategy `simplify()` knows
+        # under the same deadline; if it is interrupted the best form so
+        # far is kept
+        from sympy import simplify
+        from algebra_with_sympy.evaluation import _run_within
+        done = False
+        if not budget.spent:
+            candidate, done = _run_within(budget.left, simplify, best,
+                                          measure=measure)
+        if not done:
+            complete = False
+        elif measure(candidate) < best_ops:
+            best, best_ops = candidate, measure(candidate)
+    if complete:
+        if len(_simplify_cache) >= _SIMPLIFY_CACHE_SIZE:
+            del _simplify_cache[next(iter(_simplify_cache))]
+        _simplify_cache[(expr, options)] = best
+    return best, complete
+
+
+def budget_simplify(expr, timeout=2.0, max_ops=150, measure=count_ops):
+    """
+    Simplifies an expression, an `Equation` or a collection of equations
+    (e.g. a `solve()` result) within a time budget, reusing earlier work.
+
+    For each side of each equation the strategies tried are chosen from its
+    content: `cancel`/`together` for rational functions, `trigsimp` (and
+    `exptrigsimp`) for trigonometric and hyperbolic functions, `powsimp`,
+    `powdenest` and `radsimp` for exponentials and non-integer powers,
+    `logcombine` for logarithms, then `factor` and `expand`. A strategy is
+    kept only if it reduces `measure`. Sides that are still no larger than
+    `max_ops` are finally put through `sympy.simplify()`, which is
+    interrupted when the budget runs out (where `SIGALRM` is available,
+    i.e. in the main thread on Unix), keeping the best form found before
+    it. The terms of sums are simplified individually first.
+
+    Simplified expressions (including the terms of sums) are memoized, and
+    any previously simplified subexpression is replaced by its simplified
+    form before work starts, so repeating the same or a similar step is
+    cheap. The memo is shared by all calls with the same `max_ops` and
+    `measure`.
+
+    Parameters
+    ==========
+    expr: an expression, `Equation` or iterable of equations.
+    timeout: seconds after which no further strategies are started (a
+        strategy already running is not interrupted, except for the final
+        `sympy.simplify()`). `None` for no limit.
+        Results of calls that ran out of time are not memoized.
+    max_ops: largest `measure` of a side for which the full
+        `sympy.simplify()` is tried. `0` to never try it.
+    measure: the complexity measure to minimize (default `count_ops`).
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y = symbols('x y')
+    >>> eq = Eqn(sin(x)**2 + cos(x)**2 + (x**2 - 1)/(x - 1), exp(x)*exp(y))
+    >>> budget_simplify(eq)
+    Equation(x + 2, exp(x + y))
+    >>> budget_simplify(eq.lhs + log(y), max_ops=0)
+    x + log(y) + 2
+    """
+    budget = _Budget(timeout)
+    if isinstance(expr, Equation):
+        lhs = _simplify_expr(expr.lhs, budget, max_ops, measure)[0]
+        rhs = _simplify_expr(expr.rhs, budget, max_ops, measure)[0]
+        return Equation(lhs, rhs)
+    if isinstance(expr, Basic) and not isinstance(expr, Set):
+        return _simplify_expr(expr, budget, max_ops, measure)[0]
+    from algebra_with_sympy.evaluation import _flatten_equations, _rebuild
+    flat, template = _flatten_equations(expr)
+    results = []
+    for eqn in flat:
+        results.append(Equation(
+            _simplify_expr(eqn.lhs, budget, max_ops, measure)[0],
+            _simplify_expr(eqn.rhs, budget, max_ops, measure)[0]))
+    return _rebuild(template, iter(results))
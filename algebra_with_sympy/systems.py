@@ -0,0 +1,1001 @@
+"""
+Tools for working with systems of equations built from `Equation` objects.
+
+An equation `lhs = rhs` enters all of these tools as the expression
+`lhs - rhs`, which is understood to be equal to zero. Plain sympy
+expressions are accepted as well and are treated the same way `solve()`
+treats them (`expr = 0`).
+"""
+from sympy import Equation, FiniteSet, groebner, sympify
+from sympy.core.sorting import default_sort_key, ordered
+
+__all__ = ['EquationIdeal', 'eliminate', 'EquationSystem', 'SubstitutionPlan',
+           'bulk_subs', 'jacobian', 'hessian', 'sensitivities']
+
+
+def _as_expr(eqn):
+    """Returns `lhs - rhs` for an `Equation` or the sympified object
+    itself for anything else.
+    """
+    if isinstance(eqn, Equation):
+        return eqn.lhs - eqn.rhs
+    return sympify(eqn)
+
+
+def _as_exprs(equations):
+    """Returns a tuple of expressions equal to zero for an `Equation`,
+    expression or iterable of them.
+    """
+    if isinstance(equations, Equation) or not hasattr(equations, '__iter__'):
+        equations = [equations]
+    return tuple(_as_expr(k) for k in equations)
+
+
+def _wrap_equations(eqns):
+    """Packages a list of equations the same way `solve()` packages its
+    solutions, respecting `algwsym_config.output.solve_to_list`.
+    """
+    from algebra_with_sympy.algebraic_equation import algwsym_config
+    if algwsym_config.output.solve_to_list:
+        return list(eqns)
+    return FiniteSet(*eqns)
+
+
+class _PermutedOrder():
+    """The monomial order `order` with the variables taken in the order
+    given by the indices `perm`.
+    """
+
+    def __init__(self, order, perm):
+        from sympy.polys.orderings import monomial_key
+        self.order = monomial_key(order)
+        self.perm = tuple(perm)
+
+    def __call__(self, monomial):
+        return self.order(tuple(monomial[k] for k in self.perm))
+
+
+class EquationIdeal():
+    """
+    The polynomial ideal generated by a system of polynomial equations.
+
+    Groebner bases of the ideal are computed on demand and cached by
+    generator ordering and monomial order. Only one basis, for the
+    `grevlex` order (usually by far the cheapest), is computed from the
+    equations. Every other basis (e.g. the lexicographic bases with
+    different variables first used for elimination) starts from it: for a
+    zero-dimensional ideal it is converted by FGLM, otherwise its members
+    seed the Groebner computation instead of the original equations.
+
+    Parameters
+    ==========
+    equations: an `Equation`, expression or iterable of them. Each is
+        interpreted as `lhs - rhs = 0`.
+    gens: optional sequence of symbols to use as polynomial generators.
+        Default is all free symbols sorted canonically.
+    kwargs: passed on to `groebner()` (e.g. `domain`).
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y, z = symbols('x y z')
+    >>> ideal = EquationIdeal([Eqn(x**2 + y**2, 1), Eqn(x, y)])
+    >>> ideal.contains(Eqn(2*y**2, 1))
+    True
+    >>> ideal.eliminate(x)
+    FiniteSet(Equation(2*y**2 - 1, 0))
+    >>> ideal.eliminate(y)
+    FiniteSet(Equation(2*x**2 - 1, 0))
+    """
+
+    def __init__(self, equations, gens=None, **kwargs):
+        self.exprs = _as_exprs(equations)
+        if gens is None:
+            syms = set()
+            for k in self.exprs:
+                syms |= k.free_symbols
+            gens = ordered(syms)
+        self.gens = tuple(gens)
+        self.options = kwargs
+        self._bases = {}
+
+    def __repr__(self):
+        return 'EquationIdeal(%s, gens=%s)' % (repr(list(self.exprs)),
+                                               repr(self.gens))
+
+    def _key(self, gens, order):
+        return (tuple(gens), order)
+
+    def basis(self, order='grevlex', gens=None):
+        """
+        Returns the (cached) reduced Groebner basis of the ideal.
+
+        Parameters
+        ==========
+        order: monomial order, 'lex', 'grlex' or 'grevlex' (default).
+        gens: optional ordering of the generators. Defaults to the
+            ideal's generators.
+        """
+        if gens is None:
+            gens = self.gens
+        gens = tuple(gens)
+        key = self._key(gens, order)
+        G = self._bases.get(key, None)
+        if G is not None:
+            return G
+        H = self._bases.get(self._key(self.gens, 'grevlex'), None)
+        if H is None:
+            H = groebner(self.exprs, *self.gens, order='grevlex',
+                         **self.options)
+            self._bases[self._key(self.gens, 'grevlex')] = H
+            if key == self._key(self.gens, 'grevlex'):
+                return H
+        seed = H.exprs
+        if len(gens) == len(self.gens) and set(gens) == set(self.gens) \
+                and H.is_zero_dimensional:
+            # the target order with the generators permuted is an order on
+            # the monomials of `self.gens`, so FGLM can convert to it
+            seed = H.fglm(_PermutedOrder(order, [self.gens.index(k)
+                                                 for k in gens])).exprs
+        # seeded with a basis that is already (close to) reduced for the
+        # target order the Groebner computation has almost nothing to do
+        G = groebner(seed, *gens, order=order, **self.options)
+        self._bases[key] = G
+        return G
+
+    def contains(self, eqn):
+        """
+        Returns `True` if `lhs - rhs` of `eqn` belongs to the ideal, i.e.
+        the equation is a consequence of the system.
+        """
+        return self.basis(order='grevlex').contains(_as_expr(eqn))
+
+    def reduce(self, eqn):
+        """
+        Returns the normal form of `lhs - rhs` of `eqn` modulo the ideal as
+        an `Equation(remainder, 0)`.
+        """
+        return Equation(self.basis(order='grevlex').reduce(_as_expr(eqn))[1],
+                        0)
+
+    def eliminate(self, symbols, order='lex'):
+        """
+        Returns the equations of the ideal basis that are free of `symbols`.
+
+        The basis is computed with `symbols` placed first in the generator
+        ordering. With `order='lex'` (the default) the returned equations
+        generate the full elimination ideal. Other orders return only the
+        basis members that happen to be free of `symbols`.
+
+        Parameters
+        ==========
+        symbols: a symbol or iterable of symbols to eliminate.
+        order: monomial order used for the basis.
+        """
+        if not hasattr(symbols, '__iter__'):
+            symbols = [symbols]
+        symbols = tuple(symbols)
+        rest = tuple(k for k in self.gens if k not in symbols)
+        G = self.basis(order=order, gens=symbols + rest)
+        elim = set(symbols)
+        eqns = [Equation(k, 0) for k in G.exprs
+                if not (k.free_symbols & elim)]
+        return _wrap_equations(eqns)
+
+    def solve(self, *symbols, **flags):
+        """
+        Solves the system through its (cached) lexicographic basis, which is
+        triangular and therefore much easier on `solve()` than the original
+        equations. Output is the same as `solve()`.
+        """
+        from algebra_with_sympy.algebraic_equation import solve
+        G = self.basis(order='lex')
+        if len(symbols) == 0:
+            symbols = self.gens
+        return solve([Equation(k, 0) for k in G.exprs], *symbols, **flags)
+
+
+_ideal_cache = {}
+_IDEAL_CACHE_SIZE = 64
+
+
+def eliminate(equations, symbols, order='lex', gens=None, **kwargs):
+    """
+    Eliminates `symbols` from a system of polynomial equations using a
+    Groebner basis and returns the resulting equations (`expr = 0`) that no
+    longer contain them.
+
+    The `EquationIdeal` built for a system is cached, so later calls on the
+    same system (eliminating other variables, or the same ones with a
+    different order) reuse the bases that were already computed. Use
+    `EquationIdeal` directly to keep a system's bases alive for membership
+    tests and reductions as well.
+
+    Parameters
+    ==========
+    equations: an `Equation`, expression or iterable of them.
+    symbols: a symbol or iterable of symbols to eliminate.
+    order: monomial order used for the basis (default 'lex').
+    gens: optional ordering of the polynomial generators.
+    kwargs: passed on to `groebner()`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y, t = symbols('x y t')
+    >>> eliminate([Eqn(x, t**2), Eqn(y, t**3)], t)
+    FiniteSet(Equation(x**3 - y**2, 0))
+    """
+    return _cached_ideal(equations, gens, **kwargs).eliminate(symbols,
+                                                              order=order)
+
+
+def _cached_ideal(equations, gens=None, **kwargs):
+    """Returns the cached `EquationIdeal` for a system, creating it if
+    necessary. Systems are matched independent of equation order.
+    """
+    exprs = tuple(sorted(_as_exprs(equations), key=default_sort_key))
+    key = (exprs, None if gens is None else tuple(gens),
+           tuple(sorted(kwargs.items(), key=str)))
+    ideal = _ideal_cache.get(key, None)
+    if ideal is None:
+        ideal = EquationIdeal(exprs, gens=gens, **kwargs)
+        if len(_ideal_cache) >= _IDEAL_CACHE_SIZE:
+            # drop the oldest system
+            del _ideal_cache[next(iter(_ideal_cache))]
+        _ideal_cache[key] = ideal
+    return ideal
+
+
+def _canonical_key(eqn):
+    """Returns a hashable canonical form of an equation used to detect
+    duplicates: `lhs - rhs` or its negative, whichever sorts first. Thus
+    `Eqn(a, b)`, `Eqn(b, a)` and `Eqn(a - b, 0)` share a key.
+    """
+    expr = _as_expr(eqn)
+    return min(expr, -expr, key=default_sort_key)
+
+
+class EquationSystem():
+    """
+    A collection of equations that keeps an index from each free symbol to
+    the equations containing it.
+
+    Duplicate equations (equations that are identical after moving
+    everything to one side, up to an overall sign) are stored only once.
+    The bulk operations `subs` (also as `.do.subs`, `.dolhs.subs` and
+    `.dorhs.subs`), `apply` with `symbols` and `solve` use the index to
+    work only on the members that involve the relevant symbols; all other
+    members are carried over untouched. Any other operation through
+    `apply`, `do`, `dolhs` or `dorhs` visits every member, since e.g.
+    `.do.diff(x)` also changes the members without `x`. Operations
+    return a new `EquationSystem` rather than modifying this one, just as
+    operations on an `Equation` return a new `Equation`.
+
+    Parameters
+    ==========
+    equations: an iterable of `Equation` objects (or expressions, which are
+        stored as `Equation(expr, 0)`).
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, c, x = symbols('a b c x')
+    >>> S = EquationSystem([Eqn(a, b + c), Eqn(x, 2*a), Eqn(b + c, a)])
+    >>> len(S)
+    2
+    >>> S.equations_with(x)
+    [Equation(x, 2*a)]
+    >>> S.subs(x, 4)
+    EquationSystem([Equation(a, b + c), Equation(4, 2*a)])
+    >>> S.do.expand()
+    EquationSystem([Equation(a, b + c), Equation(x, 2*a)])
+    """
+
+    def __init__(self, equations=()):
+        self._members = {}
+        self._index = {}
+        self.extend(equations)
+
+    def _new(self, members):
+        """Builds a system from an iterable of (key, equation) pairs that
+        are already known to be canonical.
+        """
+        new = EquationSystem()
+        for key, eqn in members:
+            new._insert(key, eqn)
+        return new
+
+    def _insert(self, key, eqn):
+        if key in self._members:
+            return False
+        self._members[key] = eqn
+        for sym in eqn.free_symbols:
+            self._index.setdefault(sym, set()).add(key)
+        return True
+
+    def add(self, eqn):
+        """
+        Adds an equation to the system. Returns `False` if an equivalent
+        equation is already present, `True` otherwise.
+        """
+        if not isinstance(eqn, Equation):
+            eqn = Equation(sympify(eqn), 0)
+        return self._insert(_canonical_key(eqn), eqn)
+
+    def extend(self, equations):
+        """
+        Adds each equation in an iterable to the system.
+        """
+        for k in equations:
+            self.add(k)
+
+    def remove(self, eqn):
+        """
+        Removes an equation (or its equivalent) from the system. Raises
+        `KeyError` if it is not present.
+        """
+        key = _canonical_key(eqn)
+        old = self._members.pop(key)
+        for sym in old.free_symbols:
+            keys = self._index[sym]
+            keys.discard(key)
+            if not keys:
+                del self._index[sym]
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return iter(self._members.values())
+
+    def __getitem__(self, i):
+        return list(self._members.values())[i]
+
+    def __contains__(self, eqn):
+        return _canonical_key(eqn) in self._members
+
+    def __eq__(self, other):
+        if not isinstance(other, EquationSystem):
+            return NotImplemented
+        return self._members.keys() == other._members.keys()
+
+    def __repr__(self):
+        return 'EquationSystem(%s)' % repr(list(self._members.values()))
+
+    def __str__(self):
+        return '{' + ', '.join(str(k) for k in self) + '}'
+
+    @property
+    def equations(self):
+        """
+        A list of the equations in the system.
+        """
+        return list(self._members.values())
+
+    @property
+    def free_symbols(self):
+        """
+        The set of all symbols that appear in the system.
+        """
+        return set(self._index.keys())
+
+    def _keys_with(self, symbols, every=False):
+        """Returns the keys of the members containing any (or, if `every`,
+        all) of `symbols`.
+        """
+        sets = [self._index.get(sym, set()) for sym in symbols]
+        if not sets:
+            return set()
+        if every:
+            return set.intersection(*sets)
+        return set.union(*sets)
+
+    def equations_with(self, *symbols):
+        """
+        Returns a list of the equations that contain any of `symbols`.
+        """
+        keys = self._keys_with(symbols)
+        return [eqn for key, eqn in self._members.items() if key in keys]
+
+    def _map(self, func, keys=None):
+        """Returns a new system with `func` applied to the members whose
+        keys are in `keys` (all members if `keys` is None). The index of
+        the new system is a copy of this one in which only the entries of
+        the modified members are updated.
+        """
+        if keys is None:
+            return self._new((_canonical_key(eqn), eqn) for eqn in
+                             (func(k) for k in self._members.values()))
+        mapped = {}
+        for key in keys:
+            eqn = func(self._members[key])
+            mapped[key] = (_canonical_key(eqn), eqn)
+        pairs = [mapped.get(key, (key, eqn))
+                 for key, eqn in self._members.items()]
+        members = dict(pairs)
+        if len(members) < len(pairs):
+            # members became equivalent to each other; keep the first
+            return self._new(pairs)
+        index = dict(self._index)
+
+        def owned(sym):
+            # the sets are shared with this system until modified
+            if index.get(sym, None) is self._index.get(sym, None):
+                index[sym] = set(index.get(sym, ()))
+            return index[sym]
+        for key in mapped:
+            for sym in self._members[key].free_symbols:
+                owned(sym).discard(key)
+        for key, eqn in mapped.values():
+            for sym in eqn.free_symbols:
+                owned(sym).add(key)
+        new = EquationSystem()
+        new._members = members
+        new._index = {sym: keys for sym, keys in index.items() if keys}
+        return new
+
+    def _subs_keys(self, args):
+        """Returns the keys of the members that can contain an expression
+        replaced by `subs(*args)`, or `None` for all members.
+        """
+        if all(isinstance(a, Equation) for a in args):
+            olds = [a.lhs for a in args]
+        elif len(args) == 2:
+            olds = [sympify(args[0])]
+        elif hasattr(args[0], 'keys'):
+            olds = [sympify(k) for k in args[0].keys()]
+        else:
+            olds = [sympify(k[0]) for k in args[0]]
+        keys = set()
+        for old in olds:
+            if old.free_symbols:
+                keys |= self._keys_with(old.free_symbols, every=True)
+            else:
+                return None
+        return keys
+
+    def subs(self, *args, **kwargs):
+        """
+        Substitutes into every member of the system that can contain the
+        replaced expression. Accepts the same arguments as `Equation.subs`.
+        Members that do not contain all the free symbols of an expression
+        being replaced are not visited.
+        """
+        return self._map(lambda eqn: eqn.subs(*args, **kwargs),
+                         self._subs_keys(args))
+
+    def apply(self, func, *args, side='both', symbols=None, **kwargs):
+        """
+        Applies `func` to the members of the system as `Equation.apply`
+        does. If `symbols` is given only members containing at least one of
+        them are modified; otherwise every member is visited.
+        """
+        keys = None
+        if symbols is not None:
+            if not hasattr(symbols, '__iter__'):
+                symbols = [symbols]
+            keys = self._keys_with(symbols)
+        return self._map(lambda eqn: eqn.apply(func, *args, side=side,
+                                               **kwargs), keys)
+
+    def applylhs(self, func, *args, **kwargs):
+        """
+        Applies `func` to the lhs of every member.
+        """
+        return self.apply(func, *args, side='lhs', **kwargs)
+
+    def applyrhs(self, func, *args, **kwargs):
+        """
+        Applies `func` to the rhs of every member.
+        """
+        return self.apply(func, *args, side='rhs', **kwargs)
+
+    class _sides:
+        """
+        Helper class for the `.do.`, `.dolhs.`, `.dorhs.` syntax applied to
+        every member of the system, except that `subs` only visits the
+        members `EquationSystem.subs` would.
+        """
+
+        def __init__(self, system, side='both'):
+            self.system = system
+            self.side = side
+
+        def __getattr__(self, name):
+            system = self.system
+            side = self.side
+
+            def method(*args, **kwargs):
+                keys = None
+                if name == 'subs':
+                    keys = system._subs_keys(args)
+                return system._map(lambda eqn: getattr(
+                    Equation._sides(eqn, side=side), name)(*args, **kwargs),
+                    keys)
+            return method
+
+    @property
+    def do(self):
+        return self._sides(self, side='both')
+
+    @property
+    def dolhs(self):
+        return self._sides(self, side='lhs')
+
+    @property
+    def dorhs(self):
+        return self._sides(self, side='rhs')
+
+    def subsystem(self, *symbols):
+        """
+        Returns the `EquationSystem` made up of the members that contain any
+        of `symbols`.
+        """
+        keys = self._keys_with(symbols)
+        return self._new((key, eqn) for key, eqn in self._members.items()
+                         if key in keys)
+
+    def solve(self, *symbols, **flags):
+        """
+        Solves for `symbols` using only the members that contain them. With
+        no symbols the whole system is passed to `solve()`. Output is the
+        same as `solve()`.
+        """
+        from algebra_with_sympy.algebraic_equation import solve
+        eqns = self.equations
+        if len(symbols) == 1 and hasattr(symbols[0], '__iter__'):
+            symbols = tuple(symbols[0])
+        if symbols:
+            eqns = self.subsystem(*symbols).equations
+        return solve(eqns, *symbols, **flags)
+
+
+def _binds_any(expr, keys):
+    """`True` if `expr` contains an `Integral`, `Derivative`, `Sum`,
+    `Product`, `Subs` or `Lambda` binding one of the symbols in `keys`.
+    """
+    from sympy import Derivative, Integral, Lambda, Product, Subs, Sum
+    return any(keys & set(k.variables) for k in
+               expr.atoms(Integral, Derivative, Sum, Product, Subs, Lambda))
+
+
+def _substitute(expr, mapping):
+    """`expr.xreplace(mapping)`, or `expr.subs(mapping, simultaneous=True)`
+    if `expr` binds one of the keys of `mapping`, since `xreplace` would
+    also replace the bound variable.
+    """
+    if _binds_any(expr, mapping.keys()):
+        return expr.subs(mapping, simultaneous=True)
+    return expr.xreplace(mapping)
+
+
+def _xreplace_chunk(items, mapping):
+    """Worker for `SubstitutionPlan.apply(..., workers=n)`."""
+    return [_substitute(k, mapping) for k in items]
+
+
+class SubstitutionPlan():
+    """
+    A set of definitions compiled for substituting into many equations.
+
+    The definitions (`Equation(old, new)` objects, a dict or `(old, new)`
+    pairs) are put in dependency order once and chains between them are
+    resolved ahead of time: if `b` is defined in terms of `a` and `a` in
+    terms of `c`, the compiled replacement for `b` is already written in
+    terms of `c`. Applying the plan then takes a single `xreplace`
+    traversal of each target, instead of one traversal per definition as
+    with repeated `subs`.
+
+    The result is the same as substituting the definitions with `subs`
+    until nothing changes when every `old` is a symbol or a function
+    application (e.g. `f(x)`). Other `old` expressions are only replaced
+    where they appear as a whole subexpression, as with `xreplace`.
+    Expressions in which one of the `old` symbols is bound (the variable
+    of an `Integral`, `Derivative`, `Sum`, `Product`, `Subs` or `Lambda`)
+    are substituted with `subs`, which leaves bound variables alone.
+    Circular definitions raise `ValueError`.
+
+    Parameters
+    ==========
+    definitions: an iterable of `Equation(old, new)` objects (e.g. a
+        `solve()` result), a dict or an iterable of `(old, new)` pairs.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, c, x = symbols('a b c x')
+    >>> plan = SubstitutionPlan([Eqn(b, a + 1), Eqn(a, 2*c)])
+    >>> plan.mapping
+    {a: 2*c, b: 2*c + 1}
+    >>> plan.apply(Eqn(x, a*b))
+    Equation(x, 2*c*(2*c + 1))
+    >>> plan.apply([Eqn(x, b), Eqn(x**2, a)])
+    [Equation(x, 2*c + 1), Equation(x**2, 2*c)]
+    """
+
+    def __init__(self, definitions):
+        if hasattr(definitions, 'items'):
+            pairs = list(definitions.items())
+        else:
+            pairs = [k.args if isinstance(k, Equation) else tuple(k)
+                     for k in definitions]
+        raw = {}
+        for old, new in pairs:
+            raw[sympify(old)] = sympify(new)
+        self.order = self._dependency_order(raw)
+        mapping = {}
+        for old in self.order:
+            mapping[old] = _substitute(raw[old], mapping)
+        self.mapping = mapping
+
+    @staticmethod
+    def _dependency_order(raw):
+        """Returns the keys of `raw` ordered so that every definition comes
+        after those used in its replacement.
+        """
+        from sympy import preorder_traversal
+        deps = {old: set(preorder_traversal(new)) & raw.keys()
+                for old, new in raw.items()}
+        order = []
+        state = {}
+        for start in raw:
+            if start in state:
+                continue
+            # iterative depth first search; state 1 = in progress, 2 = done
+            stack = [(start, iter(deps[start]))]
+            state[start] = 1
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if state.get(child, 0) == 1:
+                        raise ValueError('Circular definitions involving ' +
+                                         str(child) + '.')
+                    if child not in state:
+                        state[child] = 1
+                        stack.append((child, iter(deps[child])))
+                        break
+                else:
+                    stack.pop()
+                    state[node] = 2
+                    order.append(node)
+        return order
+
+    def __repr__(self):
+        return 'SubstitutionPlan(%d definitions)' % len(self.mapping)
+
+    def apply(self, targets, workers=None):
+        """
+        Substitutes the definitions into `targets`, which may be an
+        `Equation`, an expression or an iterable of them (e.g. a list, an
+        `EquationSystem` or a `solve()` result). Iterables are returned as
+        a list (or `FiniteSet` for sets) in the original structure. If
+        `workers` is an integer greater than 1 the targets are divided
+        among that many processes.
+        """
+        from sympy import Basic, Set
+        from algebra_with_sympy.evaluation import _flatten_equations, \
+            _map_chunks, _rebuild
+        if isinstance(targets, Basic) and not isinstance(targets, Set):
+            return _substitute(targets, self.mapping)
+        if not isinstance(targets, Set):
+            targets = list(targets)
+        if isinstance(targets, Set) or all(isinstance(k, Equation)
+                                           for k in targets):
+            flat, template = _flatten_equations(targets)
+        else:
+            flat = [sympify(k) for k in targets]
+            template = (False, [None]*len(flat))
+        if workers is None or workers < 2 or len(flat) < 2:
+            results = _xreplace_chunk(flat, self.mapping)
+        else:
+            results = _map_chunks(_xreplace_chunk, flat, workers,
+                                  self.mapping)
+        return _rebuild(template, iter(results))
+
+
+def bulk_subs(targets, definitions, workers=None):
+    """
+    Substitutes many definitions into many equations at once. Shorthand
+    for `SubstitutionPlan(definitions).apply(targets, workers)`; build the
+    `SubstitutionPlan` once when the same definitions are used repeatedly.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> a, b, x, y = symbols('a b x y')
+    >>> bulk_subs([Eqn(x, a + b), Eqn(y, a*b)], [Eqn(a, b**2), Eqn(b, 3)])
+    [Equation(x, 12), Equation(y, 27)]
+    """
+    return SubstitutionPlan(definitions).apply(targets, workers=workers)
+
+
+class _Derivatives():
+    """
+    Memoized differentiation shared by all entries of a Jacobian or
+    Hessian. Derivatives of every subexpression are cached by
+    `(expr, symbol)`, so subexpressions shared between equations (or
+    between first derivatives) are differentiated only once, and
+    subexpressions that do not contain the symbol are recognized without
+    differentiating them.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._free = {}
+
+    def free_symbols(self, expr):
+        free = self._free.get(expr, None)
+        if free is None:
+            free = expr.free_symbols
+            self._free[expr] = free
+        return free
+
+    def contains(self, expr, sym):
+        """`True` if `expr` can depend on `sym`. A variable that is not a
+        symbol (e.g. `f(t)`) is looked for as a subexpression.
+        """
+        if sym.is_Symbol:
+            return sym in self.free_symbols(expr)
+        return expr.has(sym)
+
+    def diff(self, expr, sym):
+        from sympy import S, Add, Mul, Pow
+        from sympy.core.function import Function
+        if not self.contains(expr, sym):
+            return S.Zero
+        if expr == sym:
+            return S.One
+        key = (expr, sym)
+        result = self._cache.get(key, None)
+        if result is not None:
+            return result
+        if isinstance(expr, Add):
+            result = Add(*[self.diff(k, sym) for k in expr.args])
+        elif isinstance(expr, Mul):
+            terms = []
+            args = expr.args
+            for i, factor in enumerate(args):
+                d = self.diff(factor, sym)
+                if d != 0:
+                    terms.append(Mul(*(args[:i] + (d,) + args[i + 1:])))
+            result = Add(*terms)
+        elif isinstance(expr, Pow) and not self.contains(expr.exp, sym):
+            result = expr.exp*expr.base**(expr.exp - 1)* \
+                self.diff(expr.base, sym)
+        elif isinstance(expr, Function) and len(expr.args) == 1 and \
+                type(expr)._eval_derivative is Function._eval_derivative:
+            # chain rule, only for classes without their own derivative
+            result = expr.fdiff(1)*self.diff(expr.args[0], sym)
+        else:
+            result = expr.diff(sym)
+        self._cache[key] = result
+        return result
+
+
+def _as_symbol_list(symbols):
+    if not hasattr(symbols, '__iter__'):
+        return [symbols]
+    return list(symbols)
+
+
+def jacobian(equations, symbols):
+    """
+    Returns the Jacobian of a system of equations, each taken as
+    `lhs - rhs`, with respect to `symbols`, as an
+    `ImmutableSparseMatrix` with one row per equation.
+
+    All entries are computed with one shared derivative cache, so
+    subexpressions that occur in several equations are differentiated
+    once, and entries are only computed for symbols that actually occur in
+    an equation. Only the nonzero entries are stored (see `.todok()`); the
+    result can be used directly with `solve()`, `Matrix.LUsolve()` or
+    `lambdify()` (which returns `scipy.sparse` matrices when SciPy is
+    installed).
+
+    Parameters
+    ==========
+    equations: an `Equation`, expression or iterable of them (e.g. an
+        `EquationSystem`). Expressions are taken as `expr = 0`.
+    symbols: a symbol or sequence of symbols (the columns).
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y, z = symbols('x y z')
+    >>> J = jacobian([Eqn(x*y, sin(z)), Eqn(x**2, 3*y)], [x, y, z])
+    >>> J
+    Matrix([
+    [  y,  x, -cos(z)],
+    [2*x, -3,       0]])
+    >>> J.todok()
+    {(0, 0): y, (0, 1): x, (0, 2): -cos(z), (1, 0): 2*x, (1, 1): -3}
+    """
+    from sympy import ImmutableSparseMatrix
+    exprs = _as_exprs(equations)
+    symbols = _as_symbol_list(symbols)
+    d = _Derivatives()
+    entries = {}
+    for i, expr in enumerate(exprs):
+        for j, sym in enumerate(symbols):
+            if d.contains(expr, sym):
+                value = d.diff(expr, sym)
+                if value != 0:
+                    entries[(i, j)] = value
+    return ImmutableSparseMatrix(len(exprs), len(symbols), entries)
+
+
+def hessian(equations, symbols, constraints=()):
+    """
+    Returns the Hessian of an equation, taken as `lhs - rhs`, with respect
+    to `symbols` as an `ImmutableSparseMatrix`, or a list of them for an
+    iterable of equations (e.g. an `EquationSystem`).
+
+    As with `jacobian()` a single derivative cache is shared by all
+    entries (and equations), only symbols that occur are differentiated,
+    only the upper triangle is computed and only nonzero entries are
+    stored.
+
+    Anything that is not an `Equation` or collection of equations is passed
+    on unchanged to `sympy.hessian()`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y = symbols('x y')
+    >>> hessian(Eqn(x**2*y, exp(y)), [x, y])
+    Matrix([
+    [2*y,     2*x],
+    [2*x, -exp(y)]])
+    >>> hessian(x**2*y, [x, y])
+    Matrix([
+    [2*y, 2*x],
+    [2*x,   0]])
+    """
+    from sympy import ImmutableSparseMatrix, Basic
+    from sympy import hessian as sympy_hessian
+    single = isinstance(equations, Equation)
+    if not single and (isinstance(equations, Basic) or
+                       not hasattr(equations, '__iter__')):
+        return sympy_hessian(equations, symbols, constraints)
+    if not single:
+        equations = list(equations)
+        if not all(isinstance(k, Equation) for k in equations):
+            return sympy_hessian(equations, symbols, constraints)
+    if constraints:
+        raise ValueError('`constraints` are not supported for Equations.')
+    symbols = _as_symbol_list(symbols)
+    d = _Derivatives()
+    results = []
+    for expr in _as_exprs(equations):
+        entries = {}
+        for i, si in enumerate(symbols):
+            if not d.contains(expr, si):
+                continue
+            first = d.diff(expr, si)
+            for j in range(i, len(symbols)):
+                if not d.contains(first, symbols[j]):
+                    continue
+                value = d.diff(first, symbols[j])
+                if value != 0:
+                    entries[(i, j)] = value
+                    entries[(j, i)] = value
+        results.append(ImmutableSparseMatrix(len(symbols), len(symbols),
+                                             entries))
+    if single:
+        return results[0]
+    return results
+
+
+def _point_values(at):
+    """Returns the substitution dict for `at`: a dict, or an `Equation` or
+    iterable of `Equation` objects `symbol = value` (such as a single
+    solution returned by `solve()`).
+    """
+    from algebra_with_sympy.evaluation import _solution_rows
+    if at is None:
+        return {}
+    if hasattr(at, 'keys'):
+        return {sympify(k): sympify(v) for k, v in at.items()}
+    if isinstance(at, Equation):
+        at = [at]
+    values = {}
+    for eqn in _solution_rows(at):
+        if eqn.lhs in values:
+            raise ValueError('`at` gives more than one value for ' +
+                             str(eqn.lhs) + '; pick a single solution.')
+        values[eqn.lhs] = eqn.rhs
+    return values
+
+
+def sensitivities(equations, unknowns, parameters, at=None, numeric=False,
+                  modules=None):
+    """
+    Returns the derivatives of the `unknowns` determined by a system of
+    equations with respect to `parameters`, without solving the system.
+
+    By the implicit function theorem the solution `X(P)` of `F(X, P) = 0`
+    (with `F` the `lhs - rhs` of the equations) satisfies
+    `dX/dP = -J_X**-1 * J_P`, where `J_X` and `J_P` are the Jacobians of `F`
+    with respect to the unknowns and the parameters (see `jacobian()`). The
+    result is a matrix with one row per unknown and one column per
+    parameter, expressed in terms of the unknowns and parameters, so it is
+    valid on every solution branch at which `J_X` is invertible. Where it
+    is not (e.g. at a turning point) `NonInvertibleMatrixError` is raised.
+
+    Parameters
+    ==========
+    equations: an `Equation`, expression or iterable of them, as many as
+        there are unknowns.
+    unknowns: the symbols solved for.
+    parameters: the symbols to differentiate with respect to.
+    at: optional values substituted into the Jacobians before the linear
+        system is solved: a dict or a solution (an `Equation` or iterable
+        of `Equation` objects `symbol = value`, such as one solution from
+        `solve()`). Substituting a numeric point gives numeric
+        sensitivities cheaply.
+    numeric: if `True` return a compiled function of `(*unknowns,
+        *parameters)` instead, which evaluates the Jacobians (sharing
+        common subexpressions) and solves the linear systems with NumPy.
+        Array arguments are broadcast against each other and the result
+        has shape `broadcast_shape + (len(unknowns), len(parameters))`.
+    modules: passed on to `lambdify()` when `numeric` is `True`.
+
+    Examples
+    ========
+    >>> from algebra_with_sympy import *
+    >>> x, y, a, b = symbols('x y a b')
+    >>> eqs = [Eqn(x**2 + y**2, a), Eqn(x*y, b)]
+    >>> sensitivities(eqs, [x, y], [a, b])
+    Matrix([
+    [ x/(2*x**2 - 2*y**2), -y/(x**2 - y**2)],
+    [-y/(2*x**2 - 2*y**2),  x/(x**2 - y**2)]])
+    >>> sensitivities(eqs, [x, y], [a, b], at={x: 2, y: 1})
+    Matrix([
+    [ 1/3, -1/3],
+    [-1/6,  2/3]])
+    >>> f = sensitivities(eqs, [x, y], [a, b], numeric=True)
+    >>> f([2, 3], 1, 5, 2).shape
+    (2, 2, 2)
+    """
+    from sympy import Matrix
+    exprs = _as_exprs(equations)
+    unknowns = _as_symbol_list(unknowns)
+    parameters = _as_symbol_list(parameters)
+    if len(exprs) != len(unknowns):
+        raise ValueError('Need as many equations as unknowns, not ' +
+                         str(len(exprs)) + ' and ' + str(len(unknowns)) +
+                         '.')
+    JX = jacobian(exprs, unknowns)
+    JP = jacobian(exprs, parameters)
+    values = _point_values(at)
+    if values:
+        JX = JX.xreplace(values)
+        JP = JP.xreplace(values)
+    if numeric:
+        return _compiled_sensitivities(JX, JP, unknowns + parameters,
+                                       modules)
+    return Matrix(JX).LUsolve(-Matrix(JP)).applyfunc(
+        lambda e: e.cancel() if e.is_rational_function() else e)
+
+
+def _compiled_sensitivities(JX, JP, args, modules):
+    """Returns the vectorized function for `sensitivities(...,
+    numeric=True)`.
+    """
+    import numpy
+    from sympy.utilities.lambdify import lambdify as sympy_lambdify
+    n, m = JP.shape
+    entries = list(JX) + list(JP)
+    evaluate = sympy_lambdify(args, entries, modules=modules, cse=True)
+
+    def sensitivity(*values):
+        values = [numpy.asarray(k) for k in values]
+        flat = numpy.broadcast_arrays(*evaluate(*values))
+        shape = flat[0].shape
+        jx = numpy.stack(flat[:n*n], axis=-1).reshape(shape + (n, n))
+        jp = numpy.stack(flat[n*n:], axis=-1).reshape(shape + (n, m))
+        return -numpy.linalg.solve(jx, jp)
+    sensitivity.__doc__ = ('Sensitivities of ' + str(args[:n]) + ' to ' +
+                           str(args[n:]) + '.')
+    return sensitivity
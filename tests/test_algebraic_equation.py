@@ -10,6 +10,7 @@ from sympy import sqrt, root, Heaviside
 from algebra_with_sympy.algebraic_equation import algwsym_config
 
 
+import sys
 from pytest import raises
 
 #####
@@ -381,4 +382,129 @@ def test_subs():
 def test_issue_23():
     # This gave a key error
     a, t = symbols('a t')
-    assert simplify(a * cos(t) + sin(t)) == a * cos(t) + sin(t)
\ No newline at end of file
+    assert simplify(a * cos(t) + sin(t)) == a * cos(t) + sin(t)
+
+
+def test_intern_equations():
+    import gc
+    from sympy.core.cache import clear_cache
+    from algebra_with_sympy import algebraic_equation as ae
+    a, x, y = symbols('a x y')
+    assert Eqn(x, 1) is not Eqn(x, 1)
+    algwsym_config.numerics.intern_equations = True
+    try:
+        eq1 = Eqn(sin(x + y)**2 + exp(x + y), a*(x + y))
+        eq2 = Eqn(sin(x + y)**2 + exp(x + y), a*(x + y))
+        assert eq1 is eq2
+        # shared subexpressions are stored once
+        eq3 = 2*eq1
+        assert eq3 == Equation(2*sin(x + y)**2 + 2*exp(x + y),
+                               2*a*(x + y))
+        sq = [k for k in eq1.lhs.args if k.func != exp][0]
+        twice = [k for k in eq3.lhs.args if k.has(sin)][0]
+        assert any(k is sq for k in twice.args)
+        assert eq3.rhs.args[-1] is eq1.rhs.args[-1]
+        assert len(ae.__interned_exprs__) > 0
+    finally:
+        algwsym_config.numerics.intern_equations = False
+    # entries are released once the Equations are gone
+    del eq1, eq2, eq3, sq, twice
+    clear_cache()
+    gc.collect()
+    assert len(ae.__interned_exprs__) == 0
+    assert len(ae.__interned_equations__) == 0
+
+
+def test_parallel_sides():
+    x, y = symbols('x y')
+    eq = Eqn(sin(x)**2 + cos(x)**2 + (x + 1)**2, (x**2 - 1)/(x - 1))
+    assert eq.apply(simplify, parallel=True) == eq.apply(simplify)
+    assert eq.do.expand(parallel=True) == eq.do.expand()
+    assert eq.apply(diff, x, parallel=True) == Equation(2*x + 2,
+        2*x/(x - 1) - (x**2 - 1)/(x - 1)**2)
+    # functions that cannot be sent to another process are applied serially
+    assert eq.apply(lambda e: e + y, parallel=True) == eq + y
+    assert eq.applylhs(expand, parallel=True) == eq.applylhs(expand)
+    algwsym_config.numerics.parallel_sides = True
+    try:
+        assert eq.do.series(x, 0, 3) == Equation(
+            (sin(x)**2 + cos(x)**2 + (x + 1)**2).series(x, 0, 3),
+            ((x**2 - 1)/(x - 1)).series(x, 0, 3))
+    finally:
+        algwsym_config.numerics.parallel_sides = False
+    # a dead worker is replaced and the call still succeeds
+    import os
+    import signal
+    import time
+    from algebra_with_sympy import algebraic_equation as ae
+    pool = ae.__side_pool__
+    if hasattr(signal, 'SIGKILL'):
+        for pid in list(pool._processes):
+            os.kill(pid, signal.SIGKILL)
+        time.sleep(0.5)
+        assert eq.apply(simplify, parallel=True) == eq.apply(simplify)
+        assert eq.apply(simplify, parallel=True) == eq.apply(simplify)
+        assert ae.__side_pool__ is not pool
+    ae.__side_pool_shutdown__()
+    assert ae.__side_pool__ is None
+
+
+def test_check_numeric():
+    x, y = symbols('x y')
+    p = Symbol('p', positive=True)
+    n = Symbol('n', integer=True)
+    f = Function('f')
+    assert Eqn(sin(x)**2, 1 - cos(x)**2).check(numeric=True) == True
+    assert Eqn(sqrt(x**2), x).check(numeric=True) == False
+    assert Eqn(sqrt(p**2), p).check(numeric=True) == True
+    assert Eqn(cos(2*pi*n), 1).check(numeric=True) == True
+    assert Eqn(x, 1).check(numeric=True) == False
+    assert Eqn(x, 1).check() == Eq(x, 1)
+    assert Eqn(exp(1), 2.718281828459045).check(numeric=True) == False
+    # sides that cannot be evaluated are left to the symbolic check
+    assert Eqn(f(x), 2*f(x)).check(numeric=True) == Eq(f(x), 2*f(x))
+    algwsym_config.numerics.check_numeric = True
+    algwsym_config.numerics.check_seed = 7
+    try:
+        assert Eqn((x + y)**2, x**2 + y**2).check() == False
+        assert Eqn((x + y)**2, x**2 + y**2).check(numeric=False) != False
+        near = Eqn(sin(x), x - x**3/6 + x**5/120 - x**7/5040)
+        assert near.check(confidence=0.999) == False
+        assert near.check(seed=1) == near.check(seed=1)
+    finally:
+        algwsym_config.numerics.check_numeric = False
+        algwsym_config.numerics.check_seed = None
+
+
+def test_dsolve(monkeypatch):
+    from algebra_with_sympy.algebraic_equation import dsolve, \
+        _ode_classification_cache
+    algwsym_config.output.solve_to_list = False
+    t = symbols('t')
+    f, g = symbols('f g', cls=Function)
+    ode = Eqn(f(t).diff(t), t - f(t))
+    assert dsolve(ode) == Eqn(f(t), symbols('C1')*exp(-t) + t - 1)
+    assert dsolve(ode.lhs - ode.rhs) == dsolve(ode)
+    assert dsolve(ode, ics={f(0): 1}) == Eqn(f(t), t - 1 + 2*exp(-t))
+    key = (ode.lhs - ode.rhs, None, None, None, None, 6, 0)
+    assert key in _ode_classification_cache
+    # a specific hint completes the cached classification
+    assert dsolve(ode, hint='1st_linear').rhs.equals(dsolve(ode).rhs)
+    assert _ode_classification_cache[key][3] is True
+    raises(ValueError, lambda: dsolve(ode, hint='separable'))
+    assert dsolve(Eqn(f(t).diff(t)**2, f(t)**2)) == FiniteSet(
+        Eqn(f(t), symbols('C1')*exp(t)), Eqn(f(t), symbols('C1')*exp(-t)))
+    assert isinstance(dsolve(ode, hint='all')['1st_linear'], Equation)
+    sol = dsolve([Eqn(f(t).diff(t), g(t)), Eqn(g(t).diff(t), f(t))])
+    assert all(isinstance(k, Equation) for k in sol)
+    # the hints race in parallel and a solution without integrals wins
+    ode2 = Eqn(f(t).diff(t, 2) + 2*f(t).diff(t) + f(t), t*exp(t))
+    par = dsolve(ode2, workers=2)
+    assert par.rhs.equals(dsolve(ode2).rhs)
+    assert not par.has(Integral)
+    # without sympy's private ODE functions the plain dsolve() is used
+    _ode_classification_cache.clear()
+    monkeypatch.setitem(sys.modules, 'sympy.solvers.deutils', None)
+    assert dsolve(ode, ics={f(0): 1}) == Eqn(f(t), t - 1 + 2*exp(-t))
+    assert dsolve(ode2, workers=2).rhs.equals(par.rhs)
+    assert not _ode_classification_cache
@@ -0,0 +1,69 @@
+from sympy import symbols, Equation, Eqn, sin, cos, simplify, expand, \
+    Float, S
+from algebra_with_sympy.arrays import EquationArray
+
+from pytest import raises
+
+
+def test_template_array():
+    a, b, x = symbols('a b x')
+    calls = []
+
+    def counted(expr):
+        calls.append(expr)
+        return simplify(expr)
+
+    template = Eqn(a*(sin(x)**2 + cos(x)**2), b*x)
+    arr = EquationArray(template, {a: range(1000), b: range(1000)})
+    assert len(arr) == 1000
+    done = arr.apply(counted)
+    # the symbolic work is done once for the whole array
+    assert len(calls) == 2
+    assert done.template == Equation(a, b*x)
+    assert done[7] == Equation(7, 7*x)
+    assert done[-1] == Equation(999, 999*x)
+    assert list(done[2:4]) == [Equation(2, 2*x), Equation(3, 3*x)]
+    raises(IndexError, lambda: done[1000])
+    assert done.dorhs.subs(x, 2).rhs[:3] == (0, 2, 4)
+    # substituting for a parameter works on the individual equations
+    small = done[:3]
+    assert small.subs(a, 5).equations == [Equation(0, 0), Equation(1, x),
+                                          Equation(2, 2*x)]
+    assert small.subs(x, a).template is None
+    assert small.subs(x, 1).check() == [True, True, True]
+    assert EquationArray(Eqn(x, a), {a: [1, x]}).check() == [
+        Eqn(x, 1).check(), True]
+    vals = small.evalf(3, subs={x: S(1)/3})
+    assert all(abs(k.rhs - i/S(3)) < 1e-3 for i, k in enumerate(vals))
+    raises(ValueError, lambda: EquationArray(template, {a: [1], b: [1, 2]}))
+    raises(TypeError, lambda: EquationArray([template], {a: [1]}))
+
+
+def test_explicit_array():
+    a, x = symbols('a x')
+    eqs = [Eqn((x + 1)**2, a), Eqn((x + 2)**2, a), Eqn((x + 1)**2, 2*a)]
+    arr = EquationArray(eqs)
+    assert arr.template is None
+    calls = []
+
+    def counted(expr):
+        calls.append(expr)
+        return expand(expr)
+
+    done = arr.apply(counted)
+    # repeated sides are only transformed once
+    assert len(calls) == 4
+    assert done.equations == [k.apply(expand) for k in eqs]
+    assert arr.applylhs(expand).rhs == (a, a, 2*a)
+    assert arr.do.expand(workers=2).equations == done.equations
+    assert arr.apply(expand, workers=2).equations == done.equations
+    assert arr.subs(a, 1).rhs == (1, 1, 2)
+    assert arr.subs(Eqn(a, 1)).equations == arr.subs(a, 1).equations
+    assert arr.subs(Eqn(a, 1), Eqn(x, 2)).equations == [
+        k.subs(Eqn(a, 1), Eqn(x, 2)) for k in eqs]
+    assert arr.evalf(5, subs={a: 2, x: 1})[1] == Equation(Float(9, 5),
+                                                            Float(2, 5))
+    assert arr.check() == [k.check() for k in eqs]
+    raises(TypeError, lambda: EquationArray([x]))
+    raises(ValueError, lambda: arr.apply(expand, side='top'))
+    assert str(arr[:1]) == '[(x + 1)**2 = a]'
@@ -0,0 +1,57 @@
+from sympy import symbols, Equation, Eqn, Abs, Piecewise, FiniteSet
+from algebra_with_sympy.algebraic_equation import solve, algwsym_config
+from algebra_with_sympy.cases import split_cases, _feasible, _solve_split
+
+from pytest import raises
+
+
+def test_split_cases():
+    x, y = symbols('x y', real=True)
+    z = symbols('z')
+    assert _feasible([x >= 1, 2*x - 1 < 0]) is False
+    assert _feasible([x + y >= 0, x + y < 0]) is False
+    assert _feasible([x >= 0, x <= 0]) is True
+    assert _feasible([x**2 >= 4, x < 1]) is True
+    eq = Eqn(Abs(x - 1) + Abs(x - 2) + Abs(x - 3) + Abs(x - 4), 10)
+    # only the 5 orderings of x among 1, 2, 3, 4 survive out of 16
+    assert len(split_cases(eq)) == 5
+    # nested and Piecewise
+    branches = split_cases(Eqn(Abs(Abs(x) - 1), Piecewise((y, y > 0),
+                                                          (0, True))))
+    assert len(branches) == 8
+    assert all(not k[0][0].has(Abs, Piecewise) for k in branches)
+    # nothing to split for non-real arguments
+    assert split_cases(Eqn(Abs(z), 1)) == [([Eqn(Abs(z), 1)], [])]
+    assert _solve_split([Abs(z) - 1], (z,), {}) is None
+
+
+def test_solve_split_cases():
+    algwsym_config.output.solve_to_list = False
+    x, y, z = symbols('x y z', real=True)
+    a = symbols('a', positive=True)
+    eqs = (Eqn(Abs(2*x + y), 3), Eqn(Abs(x + 2*y), 3))
+    expected = solve(eqs)
+    assert solve(eqs, split_cases=True) == expected
+    assert solve(eqs, split_cases=True, workers=2) == expected
+    eq = Eqn(Abs(x - 1) + Abs(x - 2) + Abs(x - 3) + Abs(x - 4) +
+             Abs(x - 5), 10)
+    assert solve(eq, x, split_cases=True) == FiniteSet(Equation(x, 1),
+                                                       Equation(x, 5))
+    eqs = [Eqn(Abs(x - 1) + Abs(y - 2) + Abs(z), 6), Eqn(x + y, z),
+           Eqn(Abs(x - y), 1)]
+    assert solve(eqs, [x, y, z], split_cases=True) == solve(eqs, [x, y, z])
+    pw = Eqn(Piecewise((x**2, x < 0), (2*x, True)), 4)
+    assert solve(pw, x, split_cases=True) == FiniteSet(Equation(x, -2),
+                                                       Equation(x, 2))
+    # parametric conditions fall back to solving without splitting
+    assert solve(Eqn(Abs(x), a), x, split_cases=True) == solve(
+        Eqn(Abs(x), a), x)
+    # so do pieces with a whole interval of solutions: here 0 = 0 holds
+    # for 1 <= x < 2, which cannot be returned as isolated solutions
+    eq = Eqn(Abs(x - 1) + Abs(x - 2), 1)
+    assert _solve_split([eq.lhs - eq.rhs], (x,), {}) is None
+    raises(NotImplementedError, lambda: solve(eq, x, split_cases=True))
+    assert _solve_split([eq.lhs - eq.rhs, y - 1], (x, y), {}) is None
+    assert solve(Eqn(Abs(x - 1) + Abs(x - 2), 3), x,
+                 split_cases=True) == FiniteSet(Equation(x, 0),
+                                                Equation(x, 3))
@@ -0,0 +1,59 @@
+from sympy import symbols, Eqn, sqrt, FiniteSet
+from algebra_with_sympy.algebraic_equation import solve, algwsym_config
+from algebra_with_sympy.continuation import ContinuationTracker, \
+    track_solutions, _tracker_cache
+
+from pytest import raises, importorskip
+
+
+def test_track_solutions():
+    np = importorskip('numpy')
+    algwsym_config.output.solve_to_list = False
+    x, y, p = symbols('x y p')
+    # follows both branches of a square root and stops at the fold
+    ps = np.linspace(4, -1, 501)
+    result = track_solutions(Eqn(x**2, p), [x], p, ps,
+                             start=solve(Eqn(x**2, p), x))
+    assert result.paths.shape == (2, 501, 1)
+    alive = ps > 1e-3
+    assert np.allclose(np.sort(result.paths[:, alive, 0], axis=0),
+                       [-np.sqrt(ps[alive]), np.sqrt(ps[alive])])
+    assert np.isnan(result.paths[:, ps < 0]).all()
+    turns = [k for k in result.events if k[0] == 'turning_point']
+    assert len(turns) == 2 and all(abs(k[2]) < 1e-4 for k in turns)
+    # a dense sweep costs about one or two Newton iterations per point
+    ps = np.linspace(-1, 1, 10000)
+    result = track_solutions(Eqn(x**3 - x, p), [x], p, ps)
+    assert result.newton_iterations < 2*len(ps)
+    assert [k[0] for k in result.events] == ['turning_point']
+    assert abs(result.events[0][2] - 2/(3*np.sqrt(3))) < 1e-6
+    # crossing branches are followed through the crossing
+    result = track_solutions(Eqn(x**2, p*x), [x], p, np.linspace(-1, 1, 101),
+                             start=[[-1.0], [0.0]])
+    assert result.events == [('collision', (0, 1), 0.0)]
+    assert np.allclose(result.paths[:, -1, 0], [1, 0])
+    # systems, with dicts as starting points
+    result = track_solutions([Eqn(x**2 + y**2, 1), Eqn(y, p*x)], [x, y], p,
+                             np.linspace(0, 10, 50), start={x: 1, y: 0})
+    end = result.branch(0)
+    assert np.allclose(end[x]**2 + end[y]**2, 1)
+    assert np.allclose(end[y], np.linspace(0, 10, 50)*end[x])
+    # starting values may depend on the parameter
+    result = track_solutions(Eqn(x**2, p), [x], p, [1, 2],
+                             start=FiniteSet(Eqn(x, sqrt(p))))
+    assert np.allclose(result.paths[0, :, 0], [1, np.sqrt(2)])
+
+
+def test_continuation_tracker():
+    importorskip('numpy')
+    x, p, q = symbols('x p q')
+    tracker = ContinuationTracker(Eqn(x**2, p), [x], p)
+    # the compiled functions are shared by trackers for the same system
+    assert ContinuationTracker(Eqn(x**2, p), x, p)._residual_func is \
+        tracker._residual_func
+    assert len(_tracker_cache) >= 1
+    result = tracker.track([1, 2], [[5.0]], max_iter=1)
+    assert result.events == [('failed', 0, 1.0)]
+    raises(ValueError, lambda: ContinuationTracker(Eqn(x**2, p*q), [x], p))
+    raises(ValueError, lambda: ContinuationTracker([Eqn(x, p)], [x, q], p))
+    raises(ValueError, lambda: tracker.track([-1, 0], None))
@@ -0,0 +1,112 @@
+from sympy import symbols, Symbol, Eqn, exp, sqrt, Float, sin
+from sympy.physics.units import meter, kilometer, second, hour, joule, \
+    mole, kelvin, liter, atmosphere, kilogram, pascal, convert_to, gram
+from algebra_with_sympy.algebraic_equation import units, solve
+from algebra_with_sympy.dimensions import UnitTable, evalf_units, \
+    lambdify_units, dimension_mismatches, dimensionally_consistent
+
+from pytest import raises
+
+
+def test_unit_table():
+    T = UnitTable.for_system('SI')
+    assert UnitTable.for_system('SI') is T
+    assert T.lookup(kilometer) == (1000.0, (0, 0, 1, 0, 0, 0, 0))
+    assert T.lookup(kilogram) == (1.0, (0, 0, 0, 0, 1, 0, 0))
+    scale, dims = T.lookup(joule)
+    assert scale == 1.0
+    assert T.base_unit_expr(dims) == kilogram*meter**2/second**2
+    assert T.lookup(Symbol('km')) is None
+    units('km hr')
+    import __main__ as shell
+    assert T.lookup(shell.km) == T.lookup(kilometer)
+    assert T.lookup(shell.hr) is None
+    T2 = UnitTable('SI', aliases={shell.hr: hour})
+    assert T2.lookup(shell.hr) == (3600.0, (0, 0, 0, 0, 0, 0, 1))
+    # names follow the sympy.physics.units module: g is the gram, not the
+    # acceleration due to gravity, and h the hour, not Planck's constant
+    units('g h s I_P')
+    assert T.lookup(shell.g) == T.lookup(gram) == \
+        (0.001, (0, 0, 0, 0, 1, 0, 0))
+    assert T.lookup(shell.h) == T.lookup(hour)
+    assert T.lookup(shell.s) == T.lookup(second)
+    # abbreviations shared by several quantities are rejected
+    raises(ValueError, lambda: T.lookup(shell.I_P))
+    num, dims = T.split(3*kilometer/hour)
+    assert abs(num - 3000/3600) < 1e-15
+    assert dims == (0, 0, 1, 0, 0, 0, -1)
+    raises(ValueError, lambda: T.split(meter + second))
+    raises(ValueError, lambda: T.split(exp(meter)))
+    raises(ValueError, lambda: T.split(sqrt(meter)))
+    assert T.split(sqrt(meter**2))[1] == T.lookup(meter)[1]
+
+
+def test_evalf_units():
+    p, V, n, R, T = symbols('p V n R T')
+    values = {n: 1*mole, R: 8.314*joule/mole/kelvin, T: 273*kelvin,
+              V: 22.4*liter}
+    eq = Eqn(p, n*R*T/V)
+    result = evalf_units(eq, subs=values, to=atmosphere)
+    expected = convert_to(eq.rhs.subs(values), atmosphere)
+    assert result.lhs == p
+    assert abs(result.rhs/expected - 1) < 1e-14
+    result = evalf_units(eq, subs=values)
+    assert abs(result.rhs/convert_to(expected, pascal)*pascal/(
+        kilogram/meter/second**2) - 1) < 1e-14
+    assert evalf_units(3*kilometer, to=meter) == Float(3000)*meter
+    raises(ValueError, lambda: evalf_units(Eqn(meter, second)))
+    raises(ValueError, lambda: evalf_units(meter, to=second))
+    values[p] = 1*atmosphere
+    result = evalf_units(Eqn(p*V, n*R*T), 5, subs=values, to=joule)
+    assert abs(result.lhs/result.rhs - 1) < 1e-4
+
+
+def test_lambdify_units():
+    p, V, n, T = symbols('p V n T')
+    eq = Eqn(p, n*8.314*joule/mole/kelvin*T/V)
+    f = lambdify_units((n, T, V), eq, to=atmosphere,
+                       arg_units={n: mole, T: kelvin, V: liter})
+    assert abs(f(1, 273, 22.4) - 1.0000185048) < 1e-9
+    g = lambdify_units((n, T, V), eq, arg_units={n: mole, T: kelvin,
+                                                 V: meter**3})
+    assert abs(g(1, 273, 1) - 8.314*273) < 1e-9
+    raises(ValueError, lambda: lambdify_units((n, T, V), eq,
+                                              side='both'))
+
+
+def test_dimension_mismatches():
+    x, v, t = symbols('x v t')
+    su = {x: meter, v: meter/second, t: second}
+    assert dimension_mismatches(Eqn(x, v*t), su) == []
+    assert dimensionally_consistent(Eqn(x, v*t), su)
+    assert dimension_mismatches(Eqn(x, v*t + v), su) == [
+        (v*t + v, [meter/second, meter])]
+    assert dimension_mismatches(Eqn(x, v*t*kilogram), su) == [
+        (Eqn(x, v*t*kilogram), [meter, kilogram*meter])]
+    assert dimension_mismatches(Eqn(x, sin(v)), su) == [
+        (sin(v), [meter/second]), (Eqn(x, sin(v)), [meter, 1])]
+    assert dimension_mismatches(v**t, su) == [(v**t, [second])]
+    assert dimension_mismatches(sqrt(x), su) == [(sqrt(x), [meter])]
+    assert dimensionally_consistent(sqrt(x**2), su)
+    # symbols without units are compatible with anything unless strict
+    assert dimensionally_consistent(Eqn(x*kilogram, v*t))
+    assert not dimensionally_consistent(Eqn(x*kilogram, v*t), strict=True)
+    # zero sides and lists of equations
+    assert dimensionally_consistent(Eqn(x - v*t, 0), su)
+    assert not dimensionally_consistent([Eqn(x, v*t), Eqn(x, v)], su)
+    # units declared with units()
+    units('m s')
+    import __main__ as shell
+    assert not dimensionally_consistent(Eqn(3*shell.m, 2*shell.s))
+
+
+def test_dimension_guards():
+    x, v, t = symbols('x v t')
+    su = {x: meter, v: meter/second, t: second}
+    assert Eqn(3*meter, 2*second).check(dimensions=True) == False
+    assert Eqn(x, v).check(dimensions=su) == False
+    assert Eqn(x, 2*x - x).check(dimensions=su) == True
+    assert Eqn(x, v).check() not in (True, False)
+    raises(ValueError, lambda: solve(Eqn(x, v*t + v), x,
+                                     check_dimensions=su))
+    assert len(solve(Eqn(x, v*t), t, check_dimensions=su)) == 1
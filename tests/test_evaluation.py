@@ -0,0 +1,223 @@
+from sympy import symbols, Equation, Eqn, FiniteSet, sin, cos, sqrt, S, \
+    exp, pi, Float, Function
+from algebra_with_sympy.algebraic_equation import solve, algwsym_config
+from algebra_with_sympy.evaluation import lambdify, sweep, EvaluationPlan, \
+    EvaluatorCache, _compiled_cache, evalf_batch, _evalf_batch_serial, \
+    lambdify_solutions
+
+from pytest import raises, importorskip
+
+
+def test_lambdify():
+    a, b, c, x = symbols('a b c x')
+    eq = Eqn(a*b, c)
+    f = lambdify((a, b, c), eq)
+    assert f(2, 3, 5) == 1
+    # cached
+    assert lambdify((a, b, c), eq) is f
+    assert lambdify([a, b, c], eq) is f
+    assert lambdify((c, b, a), eq) is not f
+    assert lambdify((c, b, a), eq)(2, 3, 5) == 13
+    assert lambdify((a, b, c), eq, side='lhs')(2, 3, 5) == 6
+    assert lambdify((a, b, c), eq, side='rhs')(2, 3, 5) == 5
+    assert lambdify((b, c), eq, solve_for=a)(2, 5) == 2.5
+    lo, hi = lambdify(c, Eqn(x**2, c), solve_for=x)(4)
+    assert (lo, hi) == (-2, 2)
+    raises(ValueError, lambda: lambdify((a, b, c), eq, side='both'))
+    raises(ValueError, lambda: lambdify(a, Eqn(sin(x), sqrt(-1)),
+                                        solve_for=c))
+    # non-equations go straight to sympy
+    assert lambdify(a, a + 1)(1) == 2
+
+
+def test_lambdify_numpy():
+    np = importorskip('numpy')
+    a, b, c = symbols('a b c')
+    f = lambdify((a, b, c), Eqn(a*b, c))
+    av = np.linspace(0, 1, 1001)
+    assert np.allclose(f(av, 2.0, av), av)
+
+
+def test_sweep(tmp_path):
+    np = importorskip('numpy')
+    algwsym_config.output.solve_to_list = False
+    a, b, c, x = symbols('a b c x')
+    params = {a: np.arange(3.0), b: np.arange(5.0)}
+    chunks = list(sweep(Eqn(c, a*b), params, chunksize=4, solve_for=c))
+    assert [k[0] for k in chunks] == [slice(0, 4), slice(4, 8),
+                                      slice(8, 12), slice(12, 15)]
+    flat = np.concatenate([k[1] for k in chunks])
+    assert np.array_equal(flat.reshape(3, 5), np.outer(np.arange(3.0),
+                                                       np.arange(5.0)))
+    # constant results are broadcast to the chunk
+    chunks = list(sweep(Eqn(c, 2), {a: [1, 2, 3]}, solve_for=c))
+    assert np.array_equal(chunks[0][1], [2, 2, 2])
+    # memory-mapped output with one row per solution branch
+    fname = str(tmp_path / 'sweep.npy')
+    result = sweep(Eqn(x**2, a*b), params, chunksize=7, solve_for=x,
+                   out=fname)
+    assert result.shape == (2, 3, 5)
+    saved = np.load(fname)
+    assert np.allclose(saved[1], np.sqrt(np.outer(np.arange(3.0),
+                                                  np.arange(5.0))))
+    assert np.allclose(saved[0], -saved[1])
+    # solution sets
+    solns = solve(Eqn(x**2, a), x)
+    result = sweep(solns, {a: np.arange(4.0)}, out=fname)
+    assert np.allclose(np.sort(result, axis=0)[1], np.sqrt(np.arange(4.0)))
+    # an empty grid gives an empty output file
+    result = sweep(Eqn(x**2, a*b), {a: [], b: [1.0, 2.0]}, solve_for=x,
+                   out=fname)
+    assert result.shape == (2, 0, 2)
+    assert np.load(fname).shape == (2, 0, 2)
+    assert list(sweep(Eqn(c, a*b), {a: [], b: [1.0]}, solve_for=c)) == []
+
+
+def test_evaluation_plan():
+    algwsym_config.output.solve_to_list = False
+    a, b, x = symbols('a b x')
+    solns = solve(Eqn(x**2 + a*x, b), x)
+    plan = EvaluationPlan(solns)
+    assert len(plan.equations) == 2
+    assert plan.ops_after < plan.ops_before
+    assert 0 < plan.savings < 1
+    assert plan.subs({a: 1, b: 2}) == FiniteSet(Equation(x, -2),
+                                                Equation(x, 1))
+    assert plan.subs(a, 1) == FiniteSet(
+        Equation(x, -sqrt(4*b + 1)/2 - S(1)/2),
+        Equation(x, sqrt(4*b + 1)/2 - S(1)/2))
+    vals = plan.evalf(20, subs={a: 1, b: 3})
+    assert {k.rhs for k in vals} == {k.rhs for k in solns.subs({a: 1,
+                                                                b: 3}).evalf(
+        20)}
+    rhs = plan.lambdify((a, b), side='rhs')
+    assert sorted(rhs(1, 2)) == [-2, 1]
+    assert plan.lambdify((a, b, x), side='residual')(1, 2, 1) == [3, 0]
+    raises(ValueError, lambda: plan.lambdify((a, b), side='all'))
+    # nested solution sets keep their structure
+    nested = solve([Eqn(x**2 + b, a), Eqn(x - b, a**2)], [x, b])
+    assert EvaluationPlan(nested).subs(a, 2) == nested.subs(a, 2)
+    # lists of equations sharing work between lhs and rhs
+    eq = Eqn(sin(a + b)**2, cos(a + b))
+    plan = EvaluationPlan([eq, 2*eq])
+    assert plan.replacements[0] == (symbols('x0'), a + b)
+    both = plan.lambdify((a, b))(1, 2)
+    assert len(both) == 2 and len(both[0]) == 2
+    assert abs(both[1][1] - 2*float(cos(3))) < 1e-12
+    vals = plan.evalf(30, subs={a: 1, b: 2})
+    assert abs(vals[1].lhs - 2*sin(3)**2) < 1e-25
+    assert abs(vals[1].rhs - 2*cos(3)) < 1e-25
+
+
+def test_evaluator_cache(tmp_path):
+    import os
+    a, b, x = symbols('a b x')
+    eq = Eqn(x**2 + a*x, b)
+    algwsym_config.numerics.compile_cache_dir = str(tmp_path)
+    try:
+        f = lambdify((a, b), eq, solve_for=x)
+        assert len(os.listdir(tmp_path)) == 2
+        # a new session only finds the entry on disk
+        _compiled_cache.clear()
+        g = lambdify((a, b), eq, solve_for=x)
+        assert g is not f
+        assert g.__code__.co_filename.startswith('<algwsym-cached-')
+        assert g(1, 2) == f(1, 2)
+        # stale bytecode is regenerated from the source
+        cache = EvaluatorCache(str(tmp_path))
+        key = cache.key(eq, (a, b), 'residual', x)
+        srcpath, codepath = cache._paths(key)
+        with open(codepath, 'wb') as fh:
+            fh.write(b'garbage')
+        assert cache.load(key)(1, 2) == f(1, 2)
+        assert cache.load(cache.key(eq, (b, a), 'residual', x)) is None
+        # a truncated entry (e.g. from a crashed writer) is a cache miss
+        # and is removed
+        with open(srcpath) as fh:
+            source = fh.read()
+        with open(srcpath, 'w') as fh:
+            fh.write(source[:len(source)//2])
+        os.remove(codepath)
+        assert cache.load(key) is None
+        assert not os.path.exists(srcpath)
+        _compiled_cache.clear()
+        assert lambdify((a, b), eq, solve_for=x)(1, 2) == f(1, 2)
+        assert os.path.exists(srcpath)
+        assert not [k for k in os.listdir(tmp_path) if k.endswith('.tmp')]
+    finally:
+        algwsym_config.numerics.compile_cache_dir = None
+    _compiled_cache.clear()
+    cache.max_size = os.path.getsize(srcpath)
+    cache.evict()
+    assert cache.size <= cache.max_size
+    cache.clear()
+    assert cache.size == 0
+
+
+def test_evalf_batch():
+    algwsym_config.output.solve_to_list = False
+    a, x = symbols('a x')
+    solns = solve(Eqn(x**2, a), x)
+    assert evalf_batch(solns, 30, subs={a: 2}) == FiniteSet(
+        Equation(x, -sqrt(2).evalf(30)), Equation(x, sqrt(2).evalf(30)))
+    # a shared subexpression is evaluated once for the whole batch, where
+    # evaluating the equations one by one evaluates it for every equation
+    calls = []
+
+    class counted(Function):
+        def _eval_evalf(self, prec):
+            calls.append(prec)
+            return exp(self.args[0])._eval_evalf(prec)
+    eqns = [Eqn(x, counted(a)**k + k*sqrt(a)) for k in range(1, 21)]
+    expected = [k.evalf(50, subs={a: 2}) for k in eqns]
+    assert len(calls) == 20
+    del calls[:]
+    results = _evalf_batch_serial(eqns, 50, {a: S(2)}, 10, 500)
+    assert len(calls) == 1
+    assert all(abs(r.rhs/e.rhs - 1) < 1e-48 for r, e in zip(results,
+                                                            expected))
+    # the shared subexpression loses accuracy by cancellation only in the
+    # second equation, where evalf raises the working precision
+    big = exp(pi*sqrt(163))
+    eqns = [Eqn(x, big), Eqn(x, big - 640320**3 - 744), Eqn(x, sqrt(a))]
+    results = _evalf_batch_serial(eqns, 15, {a: S(2)}, 10, 160)
+    assert results == [k.evalf(15, subs={a: 2}) for k in eqns]
+    results = evalf_batch(eqns, 15, subs={a: 2})
+    assert isinstance(results, list)
+    assert abs(results[1].rhs/Float('-7.49927402801814e-13') - 1) < 1e-14
+    assert evalf_batch(eqns, 15, subs={a: 2}, workers=2) == results
+    # symbolic leftovers are evaluated as far as possible
+    assert evalf_batch(Eqn(x, pi*a), 5) == Equation(x, pi.evalf(5)*a)
+
+
+def test_lambdify_solutions():
+    np = importorskip('numpy')
+    algwsym_config.output.solve_to_list = False
+    a, b, x, y = symbols('a b x y')
+    solns = solve(Eqn(x**2 + a*x, b), x)
+    f = lambdify_solutions((a, b), solns)
+    assert lambdify_solutions((a, b), solns) is f
+    bs = np.linspace(-3, 3, 7)
+    vals = f(1, bs)
+    assert vals.shape == (2, 7)
+    # complex roots for b < -1/4 are masked
+    assert np.isnan(vals[:, bs < -0.25]).all()
+    expected = np.array([[float(k.rhs.subs({a: 1, b: bv})) for bv in bs[3:]]
+                         for k in solns])
+    assert np.allclose(np.sort(vals[:, 3:], axis=0),
+                       np.sort(expected, axis=0))
+    raw = lambdify_solutions((a, b), solns, mask=False)(1.0 + 0j, -1.0)
+    assert np.iscomplexobj(raw) and abs(raw[0].imag) > 0
+    # spurious branches removed by checking the equations
+    eq = Eqn(sqrt(x + 2), x)
+    squared = FiniteSet(Eqn(x, -1), Eqn(x, 2))
+    g = lambdify_solutions(a, squared, check=eq)
+    assert np.isnan(g(0)[0]) and g(0)[1] == 2
+    # systems: branch by unknown by sample
+    sys_solns = solve([Eqn(x + y, a), Eqn(x*y, b)], [x, y])
+    h = lambdify_solutions((a, b), sys_solns, unknowns=[x, y])
+    out = h([3, 5], [2, 6])
+    assert out.shape == (2, 2, 2)
+    assert np.allclose(np.sort(out[:, 0, 0]), [1, 2])
+    assert np.allclose(out[:, 0, :] + out[:, 1, :], [[3, 5], [3, 5]])
+    raises(ValueError, lambda: lambdify_solutions(a, FiniteSet()))
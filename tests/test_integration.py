@@ -0,0 +1,51 @@
+from sympy import symbols, Eqn, Integral, exp, sin, oo, sqrt, pi
+from pytest import raises
+from algebra_with_sympy import integration
+from algebra_with_sympy.integration import race_integrate, _integral_cache
+
+
+def test_race_integrate(monkeypatch):
+    a, b, c, x = symbols('a b c x')
+    q = Eqn(a*c, b/c)
+    assert race_integrate(q, b, side='rhs') == b**2/(2*c)
+    assert race_integrate(q, b, side='lhs') == a*b*c
+    raises(ValueError, lambda: race_integrate(q, b))
+    assert q.apply(race_integrate, b) == Eqn(a*b*c, b**2/(2*c))
+    assert race_integrate(exp(-x**2), (x, 0, oo)) == sqrt(pi)/2
+    # repeated integrations come from the cache
+    key = (x*sin(x), (x,), ('manual', 'risch', 'meijerg', 'heurisch'))
+    result = race_integrate(x*sin(x), x)
+    assert _integral_cache[key] == result
+
+    def no_race(*args):
+        raise AssertionError('the integrators were run again')
+    monkeypatch.setattr(integration, '_race', no_race)
+    assert race_integrate(x*sin(x), x) == result
+
+
+def test_race_integrate_timeout():
+    x = symbols('x')
+    # no algorithm finishes: the unevaluated integral is returned uncached
+    f = exp(sin(exp(x)))/(1 + x**7 + exp(x))
+    result = race_integrate(f, x, timeout=0.5)
+    assert result == Integral(f, x)
+    assert (f, (x,), ('manual', 'risch', 'meijerg', 'heurisch')) not in \
+        _integral_cache
+
+
+def test_race_integrate_quick(monkeypatch):
+    x = symbols('x')
+    calls = []
+    race = integration._race
+
+    def counted(*args):
+        calls.append(args)
+        return race(*args)
+    monkeypatch.setattr(integration, '_race', counted)
+    # simple integrals are done in this process without starting workers
+    _integral_cache.clear()
+    assert race_integrate(x**3, x) == x**4/4
+    assert not calls
+    _integral_cache.clear()
+    assert race_integrate(x**3, x, quick=0) == x**4/4
+    assert len(calls) == 1
@@ -0,0 +1,61 @@
+from sympy import symbols, Equation, Matrix, ImmutableMatrix, FiniteSet, \
+    Rational
+from sympy.polys.matrices import DomainMatrix
+from algebra_with_sympy.algebraic_equation import algwsym_config
+from algebra_with_sympy.matrices import MatrixEquation
+
+from pytest import raises
+
+
+def test_matrix_equation():
+    algwsym_config.output.solve_to_list = False
+    a, x, y = symbols('a x y')
+    A = Matrix([[1, 2], [3, 4]])
+    X = Matrix([x, y])
+    b = Matrix([5, 6])
+    meq = MatrixEquation(A*X, b)
+    assert str(meq.domain) == 'ZZ[x,y]'
+    assert meq.shape == (2, 1)
+    # conversions
+    assert meq.to_equations() == [Equation(x + 2*y, 5),
+                                  Equation(3*x + 4*y, 6)]
+    assert MatrixEquation.from_equations(meq.to_equations()) == meq
+    eq = meq.as_Equation()
+    assert eq == Equation(ImmutableMatrix(A*X), ImmutableMatrix(b))
+    assert MatrixEquation(eq) == meq
+    assert MatrixEquation(meq) == meq
+    assert MatrixEquation(DomainMatrix.from_Matrix(A*X), [[5], [6]]) == meq
+    raises(ValueError, lambda: MatrixEquation(A, b))
+    raises(TypeError, lambda: MatrixEquation(A))
+    # row operations do not modify the original
+    assert meq.row_swap(0, 1).lhs == Matrix([3*x + 4*y, x + 2*y])
+    assert meq.row_scale(1, Rational(1, 2)).rhs == Matrix([5, 3])
+    assert meq.row_scale(0, a).lhs == Matrix([a*x + 2*a*y, 3*x + 4*y])
+    raises(ValueError, lambda: meq.row_scale(0, 0))
+    assert meq.row_add(1, 0, -3).to_equations()[1] == Equation(-2*y, -9)
+    assert meq.row_add(0, 1, 0) == meq
+    assert meq == MatrixEquation(A*X, b)
+    # arithmetic with matrices, scalars and other matrix equations
+    assert (A*meq).lhs == A*A*X
+    assert (meq*2).rhs == 2*b
+    assert (a*meq).rhs == a*b
+    assert (meq + meq) == 2*meq
+    assert (meq - b).rhs == Matrix([0, 0])
+    assert (-meq).lhs == -A*X
+    assert meq.T.shape == (1, 2)
+    assert meq.subs(x, 1).lhs == Matrix([1 + 2*y, 3 + 4*y])
+    # inverses and elimination
+    assert meq.left_divide(A) == MatrixEquation(X, A.inv()*b)
+    raises(ValueError, lambda: meq.left_divide(Matrix([[1, 2]])))
+    assert meq.eliminate(x, y) == MatrixEquation(X, A.inv()*b)
+    assert meq.solve(x, y) == FiniteSet(Equation(x, -4),
+                                        Equation(y, Rational(9, 2)))
+    sym = MatrixEquation(Matrix([[a, 1], [1, a]])*X, Matrix([1, 0]))
+    assert sym.left_divide(Matrix([[a, 1], [1, a]])).rhs.applyfunc(
+        lambda e: e.factor()) == Matrix([a/((a - 1)*(a + 1)),
+                                         -1/((a - 1)*(a + 1))])
+    # underdetermined and inconsistent systems
+    under = MatrixEquation(Matrix([x + y]), Matrix([1]))
+    assert under.solve(x, y) == FiniteSet(Equation(x, 1 - y))
+    bad = MatrixEquation(Matrix([x + y, x + y]), Matrix([1, 2]))
+    assert bad.solve(x, y) == FiniteSet()
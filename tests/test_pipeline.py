@@ -0,0 +1,55 @@
+from sympy import symbols, Equation, Eqn, factor, expand, sin, cos
+from algebra_with_sympy.pipeline import EquationPipeline, _step_cache
+
+from pytest import raises
+
+
+def test_pipeline():
+    a, b, c, x = symbols('a b c x')
+    poly = Eqn(a*x**2 + b*x + c*x**2, a*x**3 + b*x**3 + c*x)
+    p = poly.lazy.do.expand().do.collect(x).dorhs.factor()
+    assert isinstance(p, EquationPipeline)
+    assert len(p.steps) == 3
+    assert p.compute() == poly.do.expand().do.collect(x).dorhs.factor()
+
+    def addsquare(expr):
+        return expr + expr**2
+
+    eq = Eqn(a, b/c)
+    assert eq.lazy.apply(addsquare).applylhs(factor).applyrhs(
+        expand).compute() == eq.apply(addsquare).applylhs(
+        factor).applyrhs(expand)
+    assert eq.lazy.apply(addsquare, side='rhs').compute() == \
+        eq.apply(addsquare, side='rhs')
+    raises(ValueError, lambda: eq.lazy.apply(addsquare, side='middle'))
+    raises(AttributeError, lambda: eq.lazy.do.nonsense().compute())
+    # nothing is computed before compute()
+    assert eq.lazy.do.nonsense().steps[0].name == 'nonsense'
+
+
+def test_pipeline_fusion():
+    x, y = symbols('x y')
+    calls = []
+
+    def counted(expr):
+        calls.append(expr)
+        return expr.expand()
+
+    eq = Eqn((x + y)**2, (x - y)**2)
+    p = eq.lazy.do.expand().do.expand().dolhs.factor()
+    assert [str(k) for k in p._chain('lhs')] == ['expand(both)',
+                                                 'factor(lhs)']
+    assert p.compute() == Equation((x + y)**2, x**2 - 2*x*y + y**2)
+    # non-idempotent steps are never dropped
+    assert len(eq.lazy.apply(counted).apply(counted)._chain('rhs')) == 2
+    # repeated steps come from the cache
+    _step_cache.clear()
+    calls.clear()
+    eq = Eqn(sin(x)**2 + cos(x)**2, sin(x)**2 + cos(x)**2)
+    assert eq.lazy.apply(counted).dorhs.simplify().compute() == \
+        Equation(sin(x)**2 + cos(x)**2, 1)
+    assert len(calls) == 1
+    eq.lazy.apply(counted).compute()
+    assert len(calls) == 1
+    # unhashable arguments are fine but are not cached
+    assert eq.lazy.do.subs([(x, 0)]).compute() == Equation(1, 1)
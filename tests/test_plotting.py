@@ -0,0 +1,92 @@
+from sympy import symbols, Eqn, sin, sqrt, tan, exp
+from algebra_with_sympy.evaluation import _compiled_cache
+from algebra_with_sympy.plotting import sample_equation, sample_implicit, \
+    plot_equation
+
+from pytest import importorskip, raises
+
+
+def test_sample_equation():
+    np = importorskip('numpy')
+    x, y = symbols('x y')
+    # points concentrate where the curve bends
+    xs, ys = sample_equation(Eqn(y, exp(-100*x**2)), x, -1, 1)
+    assert len(xs) < 500
+    fine = np.linspace(-1, 1, 20001)
+    assert np.abs(np.interp(fine, xs, ys) - np.exp(-100*fine**2)).max() < \
+        5e-3
+    steps = np.diff(xs)
+    assert steps[np.abs(xs[:-1]) < 0.2].mean() < steps.mean()
+    # one gap per pole and none elsewhere
+    xs, ys = sample_equation(Eqn(y, tan(x)), x, -3, 3)
+    assert np.isnan(xs).sum() == 2
+    assert np.isnan(sample_equation(Eqn(y, sin(x)), x, -3, 3)[1]).sum() == 0
+    # the edge of the domain is located closely
+    xs, ys = sample_equation(Eqn(y, sqrt(x)), x, -1, 1)
+    assert np.nanmin(xs[np.isfinite(ys)]) < 1e-3
+    # several branches are refined together
+    xs, ys = sample_equation(Eqn(x**2 + y**2, 1), x, -2, 2, solve_for=y)
+    assert ys.shape == (2, len(xs))
+    inside = np.isfinite(ys).all(axis=0)
+    assert inside.sum() > 10 and np.abs(xs[inside]).max() <= 1
+    assert np.allclose(ys[:, inside]**2 + xs[inside]**2, 1)
+    # the compiled function is cached and reused for new ranges
+    eq = Eqn(y, x**3)
+    sample_equation(eq, x, 0, 1)
+    size = len(_compiled_cache)
+    xs, ys = sample_equation(eq, x, 5, 10, max_depth=0)
+    assert len(_compiled_cache) == size and xs[0] == 5
+    xs, ys = sample_equation(eq, x, 0, 1, tol=1e-6, max_points=70)
+    assert len(xs) == 70
+    # so is that of a plain expression
+    size = len(_compiled_cache)
+    sample_equation(x**3 + 1, x, 0, 1)
+    assert len(_compiled_cache) == size + 1
+    xs, ys = sample_equation(x**3 + 1, x, 5, 10, max_depth=0)
+    assert len(_compiled_cache) == size + 1 and ys[0] == 126
+
+
+def test_sample_implicit():
+    np = importorskip('numpy')
+    x, y = symbols('x y')
+    segments = sample_implicit(Eqn(x**2 + 4*y**2, 4), x, y, (-3, 3),
+                               (-3, 3))
+    assert segments.shape[1:] == (2, 2)
+    pts = segments.reshape(-1, 2)
+    assert np.abs(pts[:, 0]**2 + 4*pts[:, 1]**2 - 4).max() < 1e-3
+    # the whole curve is covered
+    angles = np.arctan2(2*pts[:, 1], pts[:, 0])
+    assert np.diff(np.sort(angles)).max() < 0.05
+    # crossing lines (saddle cells) and hyperbolas through poles
+    cross = sample_implicit(Eqn(x**2, y**2), x, y, (-1, 1), (-1, 1))
+    assert np.allclose(np.abs(cross[..., 0]), np.abs(cross[..., 1]))
+    hyperbola = sample_implicit(Eqn(y, 1/x), x, y, (-2, 2), (-2, 2))
+    mid = hyperbola.mean(axis=1)
+    assert np.abs(mid[:, 0]*mid[:, 1] - 1).max() < 1e-3
+    assert len(sample_implicit(Eqn(1/x, 0), x, y, (-1, 1), (-1, 1))) == 0
+    assert len(sample_implicit(x**2 + y**2 + 1, x, y, (-1, 1),
+                               (-1, 1))) == 0
+
+
+def test_plot_equation():
+    importorskip('matplotlib')
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    x, y = symbols('x y')
+    fig, ax = plt.subplots()
+    assert plot_equation(Eqn(y, tan(x)), (x, -3, 3), ax=ax, tol=1e-2) is ax
+    assert len(ax.lines) == 1
+    plot_equation(Eqn(x**2 + y**2, 1), (x, -2, 2), (y, -2, 2), ax=ax)
+    assert len(ax.collections) == 1
+    plt.close(fig)
+
+
+def test_plot_equation_options():
+    x, y = symbols('x y')
+    # options of the other sampler are rejected before anything is drawn
+    with raises(TypeError):
+        plot_equation(Eqn(x**2 + y**2, 1), (x, -2, 2), (y, -2, 2), tol=1e-2)
+    with raises(TypeError):
+        plot_equation(Eqn(x**2 + y**2, 1), (x, -2, 2), (y, -2, 2),
+                      solve_for=y)
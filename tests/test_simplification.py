@@ -0,0 +1,72 @@
+from sympy import symbols, Equation, Eqn, sin, cos, exp, log, sqrt, \
+    FiniteSet, simplify, count_ops
+from algebra_with_sympy.algebraic_equation import solve, algwsym_config
+from algebra_with_sympy.simplification import budget_simplify, \
+    _simplify_cache, _features, _strategies
+from pytest import skip
+
+
+def test_features():
+    x, y = symbols('x y')
+    assert _features(sin(x)*exp(x)/(x + 1)) == {'trig', 'exp', 'rational'}
+    assert _features(sqrt(x) + log(y)) == {'power', 'log'}
+    assert _strategies(set()) == ['factor', 'expand']
+    assert _strategies({'trig', 'exp'})[:2] == ['trigsimp', 'exptrigsimp']
+
+
+def test_budget_simplify():
+    algwsym_config.output.solve_to_list = False
+    x, y = symbols('x y')
+    _simplify_cache.clear()
+    eq = Eqn(sin(x)**2 + cos(x)**2 + (x**2 - 1)/(x - 1), exp(x)*exp(y))
+    assert budget_simplify(eq) == Equation(x + 2, exp(x + y))
+    # simplified terms are remembered and reused even with no time left
+    assert _simplify_cache[((x**2 - 1)/(x - 1), (150, count_ops))] == x + 1
+    assert budget_simplify(eq, timeout=0) == Equation(x + 2, exp(x + y))
+    assert budget_simplify(y*eq.lhs, timeout=0) == y*(x + 2)
+    # without any time nothing new is tried or remembered
+    expr = (x**3 - 1)/(x - 1)
+    assert budget_simplify(expr, timeout=0) == expr
+    assert not [k for k in _simplify_cache if k[0] == expr]
+    assert budget_simplify(expr, max_ops=0) == x**2 + x + 1
+    assert budget_simplify(log(x) + log(y)) == log(x) + log(y)
+    # collections of equations
+    a = symbols('a')
+    solns = solve(Eqn(x**2, a*(sin(y)**2 + cos(y)**2)), x)
+    assert budget_simplify(solns) == FiniteSet(Equation(x, -sqrt(a)),
+                                               Equation(x, sqrt(a)))
+    assert budget_simplify([eq, 2*eq])[1] == Equation(2*x + 4,
+                                                      2*exp(x + y))
+    assert budget_simplify(eq) == simplify(eq)
+    # results are only reused for the same options
+    expr = (x + 1)**2
+    assert budget_simplify(expr) == expr
+
+    def longest(e):
+        return -count_ops(e)
+    longer = budget_simplify(expr, measure=longest)
+    assert count_ops(longer) > count_ops(expr)
+    assert budget_simplify(expr) == expr
+    _simplify_cache.clear()
+    assert budget_simplify(expr, measure=longest) == longer
+
+
+def test_budget_simplify_interrupts_simplify(monkeypatch):
+    import sympy
+    import time
+    from algebra_with_sympy.evaluation import _can_interrupt
+    if not _can_interrupt():
+        skip('SIGALRM is not available')
+    x = symbols('x')
+    _simplify_cache.clear()
+
+    def slow(expr, **kwargs):
+        time.sleep(30)
+        return expr
+    monkeypatch.setattr(sympy, 'simplify', slow)
+    expr = (x**2 - 1)/(x - 1)
+    start = time.perf_counter()
+    # the last step runs out of time: the best form so far is returned
+    assert budget_simplify(expr, timeout=0.5) == x + 1
+    assert time.perf_counter() - start < 5
+    assert not [k for k in _simplify_cache if k[0] == expr]
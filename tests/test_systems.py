@@ -0,0 +1,247 @@
+from sympy import S, symbols, Equation, Eqn, FiniteSet, sqrt, Function, sin, \
+    cos, exp, Matrix, lambdify, groebner
+from algebra_with_sympy.algebraic_equation import algwsym_config
+from algebra_with_sympy.systems import EquationIdeal, eliminate, \
+    _ideal_cache, EquationSystem, SubstitutionPlan, bulk_subs, jacobian, \
+    hessian, _Derivatives, sensitivities
+
+from pytest import raises
+
+
+def test_equation_ideal():
+    algwsym_config.output.solve_to_list = False
+    x, y = symbols('x y')
+    ideal = EquationIdeal([Eqn(x**2 + y**2, 1), Eqn(x, y)])
+    assert ideal.gens == (x, y)
+    assert ideal.contains(Eqn(2*y**2, 1))
+    assert not ideal.contains(Eqn(y, 1))
+    assert ideal.reduce(Eqn(x**3, 0)) == Equation(y/2, 0)
+    assert ideal.eliminate(x) == FiniteSet(Equation(2*y**2 - 1, 0))
+    assert ((x, y), 'grevlex') in ideal._bases
+    G = ideal.basis(order='lex')
+    assert ideal.basis(order='lex') is G
+    assert ideal.solve() == FiniteSet(
+        FiniteSet(Equation(x, -sqrt(2)/2), Equation(y, -sqrt(2)/2)),
+        FiniteSet(Equation(x, sqrt(2)/2), Equation(y, sqrt(2)/2)))
+
+
+def test_equation_ideal_basis_reuse(monkeypatch):
+    import algebra_with_sympy.systems as systems
+    algwsym_config.output.solve_to_list = False
+    x, y, z = symbols('x y z')
+    system = [Eqn(x**2 + y**2 + z**2, 4), Eqn(x*y*z, 1), Eqn(x + y**2, z**3)]
+    seeds = []
+
+    def counting_groebner(F, *gens, **args):
+        seeds.append(list(F))
+        return groebner(F, *gens, **args)
+    monkeypatch.setattr(systems, 'groebner', counting_groebner)
+    ideal = EquationIdeal(system)
+    elims = [ideal.eliminate(k) for k in (x, y, z)]
+    assert ideal.contains(system[0])
+    # the equations themselves are used only once, for the grevlex basis
+    exprs = [k.lhs - k.rhs for k in system]
+    assert [k == exprs for k in seeds] == [True, False, False, False]
+    for k, elim in zip((x, y, z), elims):
+        rest = [j for j in (x, y, z) if j != k]
+        expected = groebner(exprs, k, *rest, order='lex').exprs
+        assert elim == FiniteSet(*[Equation(j, 0) for j in expected
+                                   if not j.has(k)])
+    # positive-dimensional ideals are seeded with the grevlex basis
+    ideal = EquationIdeal([Eqn(x, y**2)])
+    assert ideal.eliminate(y) == FiniteSet()
+    assert ideal.eliminate(x) == FiniteSet()
+
+
+def test_eliminate():
+    algwsym_config.output.solve_to_list = False
+    x, y, t = symbols('x y t')
+    system = [Eqn(x, t**2), Eqn(y, t**3)]
+    assert eliminate(system, t) == FiniteSet(Equation(x**3 - y**2, 0))
+    # same system in a different order reuses the cached ideal
+    ncached = len(_ideal_cache)
+    assert eliminate(system[::-1], [t]) == FiniteSet(
+        Equation(x**3 - y**2, 0))
+    assert len(_ideal_cache) == ncached
+    # expressions are accepted as expr = 0
+    assert eliminate([x - t**2, y - t**3], t) == FiniteSet(
+        Equation(x**3 - y**2, 0))
+    algwsym_config.output.solve_to_list = True
+    assert eliminate(system, t) == [Equation(x**3 - y**2, 0)]
+    algwsym_config.output.solve_to_list = False
+
+
+def test_equation_system():
+    algwsym_config.output.solve_to_list = False
+    a, b, c, x = symbols('a b c x')
+    eq1 = Eqn(a, b + c)
+    eq2 = Eqn(x, 2*a)
+    S = EquationSystem([eq1, eq2, Eqn(b + c, a), Eqn(a - b - c, 0)])
+    assert len(S) == 2
+    assert S.equations == [eq1, eq2]
+    assert S[1] == eq2
+    assert Eqn(2*a, x) in S
+    assert S.free_symbols == {a, b, c, x}
+    assert S.equations_with(x) == [eq2]
+    assert S.equations_with(a) == [eq1, eq2]
+    assert not S.add(eq1.reversed)
+    # untouched members are carried over as the same objects
+    T = S.subs(x, 4)
+    assert T.equations == [eq1, Equation(4, 2*a)]
+    assert T[0] is eq1
+    assert S.subs({b: 1}).equations == [Equation(a, c + 1), eq2]
+    assert S.subs(Eqn(a, 3)).equations == [Equation(3, b + c),
+                                           Equation(x, 6)]
+    assert S.apply(lambda e: 2*e, symbols=x).equations == [
+        eq1, Equation(2*x, 4*a)]
+    assert S.dorhs.subs(a, 2).equations == [eq1, Equation(x, 4)]
+    # .do.subs skips members without the symbol; other operations visit all
+    assert S.do.subs(x, 4)[0] is eq1
+    assert S.do.diff(x).equations == [Equation(0, 0), Equation(1, 0)]
+    assert S.solve(x, a) == FiniteSet(Equation(a, b + c),
+                                      Equation(x, 2*b + 2*c))
+    assert S.subsystem(x) == EquationSystem([eq2])
+    # the index of a derived system is updated only for changed members
+    # and does not alter the index of the original
+    T = S.subs(x, 4)
+    assert T._index == EquationSystem(T.equations)._index
+    assert x not in T.free_symbols and x in S.free_symbols
+    assert T._index[b] is S._index[b]
+    # members that become equivalent are merged
+    assert S.subs(x, a).equations == [eq1, Equation(a, 2*a)]
+    assert len(EquationSystem([eq1, Eqn(x, b + c)]).subs(x, a)) == 1
+    S.remove(Eqn(x, 2*a))
+    assert len(S) == 1
+    assert S.free_symbols == {a, b, c}
+    raises(KeyError, lambda: S.remove(eq2))
+
+
+def test_substitution_plan():
+    algwsym_config.output.solve_to_list = False
+    a, b, c, x, y = symbols('a b c x y')
+    f = Function('f')
+    defs = [Eqn(b, a + 1), Eqn(a, 2*c), Eqn(f(x), sin(b))]
+    plan = SubstitutionPlan(defs)
+    assert plan.order.index(a) < plan.order.index(b) < plan.order.index(f(x))
+    assert plan.mapping[f(x)] == sin(2*c + 1)
+    target = Eqn(y, f(x) + a*b)
+    expected = target
+    for k in range(3):
+        expected = expected.subs(*defs)
+    assert plan.apply(target) == expected
+    assert plan.apply(x + a) == x + 2*c
+    assert SubstitutionPlan({a: 1, b: a}).mapping == {a: 1, b: 1}
+    assert SubstitutionPlan([(a, 1)]).apply(Eqn(x, a)) == Equation(x, 1)
+    # long chains of definitions into many targets
+    syms = symbols('s0:300')
+    defs = [Eqn(syms[k], syms[k + 1] + 1) for k in range(299)]
+    targets = [Eqn(x, syms[k]*y) for k in range(300)]
+    plan = SubstitutionPlan(reversed(defs))
+    results = plan.apply(targets)
+    assert results[0] == Equation(x, (syms[-1] + 299)*y)
+    assert results[-1] == targets[-1]
+    assert plan.apply(targets[:50], workers=2) == results[:50]
+    # structure of solve() results and systems is kept
+    solns = FiniteSet(Equation(x, a), Equation(x, -a))
+    assert bulk_subs(solns, {a: 2*c}) == FiniteSet(Equation(x, 2*c),
+                                                   Equation(x, -2*c))
+    assert bulk_subs(EquationSystem([Eqn(x, a)]), [Eqn(a, 1)]) == [
+        Equation(x, 1)]
+    assert bulk_subs((k for k in [x + a, Eqn(y, b)]), {b: a, a: 0}) == [
+        x, Equation(y, 0)]
+    raises(ValueError, lambda: SubstitutionPlan([Eqn(a, b), Eqn(b, a + 1)]))
+    # bound variables are left alone, as with subs
+    from sympy import Integral, Derivative, Subs
+    integral = Eqn(y, Integral(x**2, (x, 0, a)))
+    assert bulk_subs([integral], [Eqn(x, 2)]) == [integral]
+    assert bulk_subs([integral], [Eqn(x, 2)]) == [integral.subs(x, 2)]
+    derivative = Eqn(y, Derivative(f(x), x) + x)
+    assert bulk_subs([derivative], [Eqn(x, 2)], workers=2) == [
+        Equation(y, Subs(Derivative(f(x), x), x, 2) + 2)]
+    assert bulk_subs(derivative, {x: 2}) == derivative.subs(x, 2)
+
+
+def test_jacobian_hessian():
+    from sympy import hessian as sympy_hessian
+    x, y, z, a = symbols('x y z a')
+    f = Function('f')
+    shared = exp(sin(x*y) + z)
+    eqs = [Eqn(shared*x, a), Eqn(shared + cos(z), y**2), Eqn(f(x, y), 1),
+           Eqn(sqrt(z), a)]
+    syms = [x, y, z]
+    J = jacobian(eqs, syms)
+    dense = Matrix([k.lhs - k.rhs for k in eqs]).jacobian(syms)
+    assert (J - dense).applyfunc(lambda e: e.simplify()).is_zero_matrix
+    assert set(J.todok()) == {(0, 0), (0, 1), (0, 2), (1, 0), (1, 1),
+                              (1, 2), (2, 0), (2, 1), (3, 2)}
+    assert jacobian(Eqn(x, 2*y), y) == Matrix([[-2]])
+    assert jacobian(EquationSystem(eqs[:1]), syms) == J[0, :]
+    # the shared subexpression is differentiated once per symbol
+    d = _Derivatives()
+    d.diff(eqs[0].lhs, x)
+    d.diff(eqs[1].lhs, x)
+    assert sum(1 for k in d._cache if k[0] == shared) == 1
+    # usable for numerical evaluation
+    fJ = lambdify((x, y, z), jacobian(eqs[1:2], syms))
+    values = fJ(0, 1, 0)
+    if hasattr(values, 'toarray'):
+        # scipy.sparse when SciPy is installed
+        values = values.toarray()
+    assert abs(values[0][1] + 2) < 1e-15
+    H = hessian(eqs[0], syms)
+    dense = sympy_hessian(eqs[0].lhs - eqs[0].rhs, syms)
+    assert (H - dense).applyfunc(lambda e: e.simplify()).is_zero_matrix
+    assert H.is_symmetric()
+    # derivatives with respect to functions, as in Euler-Lagrange equations
+    t = symbols('t')
+    assert jacobian([Eqn(f(t)**2, 1)], [f(t)]) == Matrix([[2*f(t)]])
+    J = jacobian([Eqn(x*sin(f(t)), f(t)**y)], [f(t), x])
+    dense = Matrix([x*sin(f(t)) - f(t)**y]).jacobian([f(t), x])
+    assert (J - dense).applyfunc(lambda e: e.simplify()).is_zero_matrix
+    assert hessian(Eqn(x*f(t)**3, 0), [f(t), x]) == Matrix(
+        [[6*x*f(t), 3*f(t)**2], [3*f(t)**2, 0]])
+    Hs = hessian(eqs, syms)
+    assert len(Hs) == 4 and Hs[0] == H
+    assert Hs[3].todok() == {(2, 2): -z**(-S(3)/2)/4}
+    # functions with their own derivative rules are left to them
+    from sympy import Abs, sign, arg, diff
+    r = symbols('r', real=True)
+    for expr, var in [(Abs(x), x), (sign(r), r), (arg(x), x),
+                      (Abs(sin(r)), r), (sign(x*y), x)]:
+        assert jacobian([Eqn(expr, 0)], [var])[0, 0] == diff(expr, var)
+    # everything else goes to sympy
+    assert hessian(x**2*y, [x, y]) == sympy_hessian(x**2*y, [x, y])
+    raises(ValueError, lambda: hessian(eqs[0], syms, constraints=[x]))
+
+
+def test_sensitivities():
+    import numpy
+    from algebra_with_sympy.algebraic_equation import solve
+    algwsym_config.output.solve_to_list = False
+    x, y, a, b = symbols('x y a b', positive=True)
+    eqs = [Eqn(x + y, a), Eqn(x*y**2, b)]
+    S_ = sensitivities(eqs, [x, y], [a, b])
+    assert S_.shape == (2, 2)
+    # agrees with differentiating a closed-form solution
+    p = symbols('p', positive=True)
+    line = [Eqn(x + 2*y, a), Eqn(x - y, b*p)]
+    soln = solve(line, [x, y])
+    dx = [k for k in soln if k.lhs == x][0].rhs
+    sens = sensitivities(line, [x, y], [a, b, p])
+    assert sens[0, 0] == dx.diff(a) and sens[0, 2] == dx.diff(p)
+    # at a solution point
+    assert sensitivities(line, [x, y], [a], at=soln) == \
+        Matrix([dx.diff(a), (a - dx).diff(a)/2])
+    at = sensitivities(eqs, [x, y], [a, b], at={x: 2, y: 1})
+    assert at == S_.subs({x: 2, y: 1})
+    # compiled and vectorized
+    f = sensitivities(eqs, [x, y], [a, b], numeric=True)
+    xs = numpy.array([1.0, 2.0, 3.0])
+    result = f(xs, 1.0, 0, 0)
+    assert result.shape == (3, 2, 2)
+    for k, xv in enumerate(xs):
+        expected = numpy.array(S_.subs({x: xv, y: 1}), dtype=float)
+        assert numpy.allclose(result[k], expected)
+    raises(ValueError, lambda: sensitivities(eqs, [x], [a]))
+    raises(ValueError, lambda: sensitivities(eqs, [x, y], [a],
+                                             at=[Eqn(x, 1), Eqn(x, 2)]))